@@ -27,24 +27,49 @@
 # ****************************************************************************************************
 
 import errno
-import json
 import os
-from collections import OrderedDict
+import threading
+from collections import OrderedDict, deque
 from datetime import datetime
-from time import sleep, time
-from typing import List, Union
+from time import perf_counter, sleep
+from typing import TYPE_CHECKING, Dict, List, Union
 from urllib.parse import urljoin
 
-import requests
-from requests_toolbelt import MultipartEncoder
-
+from alfalfa_client.aliases import AliasCache
 from alfalfa_client.lib import (
     AlfalfaAPIException,
+    AlfalfaBatchException,
+    AlfalfaCircuitOpenException,
     AlfalfaClientException,
-    AlfalfaException,
-    parallelize,
-    prepare_model
+    UploadMetrics,
+    default_pool_size,
+    package_model,
+    parallel_map,
+    parallelize
+)
+from alfalfa_client.lockstep import LockstepEngine, StepResult
+from alfalfa_client.metrics import (
+    RequestHook,
+    RequestRecord,
+    body_size,
+    endpoint_template
+)
+from alfalfa_client.model_cache import (
+    ModelCache,
+    hash_model,
+    shared_model_cache
 )
+from alfalfa_client.models import Run
+from alfalfa_client.points import PointCache, PointHandle, values_equal
+from alfalfa_client.retry import RetryPolicy, request_not_sent
+from alfalfa_client.serialization import JSONCodec, get_codec
+from alfalfa_client.sim_time import SimTimeTracker
+from alfalfa_client.waiter import RunWaiter
+
+if TYPE_CHECKING:
+    from concurrent.futures import Executor
+
+    import requests
 
 ModelID = str
 RunID = str
@@ -53,11 +78,44 @@ RunID = str
 class AlfalfaClient:
     """AlfalfaClient is a wrapper for the Alfalfa REST API"""
 
-    def __init__(self, host: str = 'http://localhost', api_version: str = 'v2'):
+    def __init__(self, host: str = 'http://localhost', api_version: str = 'v2', pool_size: int = None,
+                 max_workers: int = None, executor: "Executor" = None, max_concurrency: int = None,
+                 point_cache_size: int = 256, point_cache_ttl: float = None, upload_compression_level: int = 6,
+                 dedupe_uploads: bool = True, model_cache: ModelCache = None, retry_policy: RetryPolicy = None,
+                 track_changes: bool = False, change_tolerance: float = 0, json_codec: Union[str, JSONCodec] = None,
+                 sim_time_check_interval: int = None, alias_ttl: float = 0):
         """Create a new alfalfa client instance
 
         :param host: url for host of alfalfa web server
         :param api_version: version of alfalfa api to use (probably don't change this)
+        :param pool_size: number of keep-alive connections to hold open to the host,
+                          defaults to the number of threads used by list calls
+        :param max_workers: number of threads in the executor used by list calls
+        :param executor: executor to use for list calls instead of one owned by the client,
+                         it will not be shut down by `close()`
+        :param max_concurrency: maximum number of items of a single list call in flight at once
+        :param point_cache_size: maximum number of runs to cache point names and ids for
+        :param point_cache_ttl: seconds before cached points of a run are refetched, never if None
+        :param upload_compression_level: zlib compression level used when zipping model folders for upload
+        :param dedupe_uploads: skip uploading models whose content has already been uploaded by `submit`
+        :param model_cache: index of uploaded models, defaults to the one stored in the user's cache
+                            directory, shared by every client in the process
+        :param retry_policy: policy for retrying failed requests, defaults to `RetryPolicy()`,
+                             use `RetryPolicy(max_attempts=1)` to disable retries
+        :param track_changes: remember the last values written to and read from each run, so
+                              `set_inputs` only sends changed values and `get_outputs` can
+                              return only changed outputs
+        :param change_tolerance: maximum absolute difference for numeric values to count as unchanged
+        :param json_codec: codec used to encode request bodies and decode responses, or the name of one
+                           ("msgspec", "orjson" or "json"), defaults to the fastest installed
+        :param sim_time_check_interval: predict the sim time of runs started with `external_clock=True`
+                                        after each advance and only read it from the server every this
+                                        many advances, always read it from the server if None
+        :param alias_ttl: seconds the run id of an alias is cached for, not cached if 0. Calls addressing
+                          a run by a cached alias are sent to the run id directly, so if the alias is
+                          pointed at another run which still exists, calls keep going to the old run
+                          until the entry expires. Only enable this if aliases are not moved while in
+                          use, or call `aliases.invalidate()` after moving one.
         """
         self.host = host.rstrip('/')
         self.haystack_filter = self.host + '/haystack/read?filter='
@@ -68,27 +126,185 @@ class AlfalfaClient:
 
         self.host = host
         self.api_version = api_version
-        self.point_translation_map = {}
+        self.upload_compression_level = upload_compression_level
+        self.upload_metrics = deque(maxlen=100)
+        self.dedupe_uploads = dedupe_uploads
+        self._model_cache = model_cache
+        self.points = PointCache(self._fetch_points, max_runs=point_cache_size, ttl=point_cache_ttl)
+        self.aliases = AliasCache(self._fetch_alias, ttl=alias_ttl)
+
+        self.max_workers = max_workers if max_workers is not None else default_pool_size()
+        self.max_concurrency = max_concurrency
+        self.pool_size = pool_size if pool_size is not None else min(self.max_workers, max_concurrency or self.max_workers)
+        self._session = None
+        self._session_lock = threading.Lock()
+
+        self._executor = executor
+        self._owns_executor = executor is None
+        self._executor_lock = threading.Lock()
+        self._request_hooks = ()
+        self.retry_policy = retry_policy if retry_policy is not None else RetryPolicy()
+        self.track_changes = track_changes
+        self.change_tolerance = change_tolerance
+        self.codec = get_codec(json_codec)
+
+        self.lockstep = LockstepEngine(self)
+        self.waiter = RunWaiter(self)
+        self.sim_time = SimTimeTracker(self, sim_time_check_interval)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
 
     @property
     def url(self):
         return urljoin(self.host, f"api/{self.api_version}/")
 
-    def _request(self, endpoint: str, method="POST", parameters=None) -> requests.Response:
-        if parameters:
-            response = requests.request(method=method, url=self.url + endpoint, json=parameters, headers={"Content-Type": "application/json"})
-        else:
-            response = requests.request(method=method, url=self.url + endpoint)
+    @property
+    def session(self) -> "requests.Session":
+        """Session shared by all requests made by this client
 
-        if response.status_code >= 400:
+        Connections are kept alive and pooled so consecutive calls (and calls made
+        from the threads of list calls) reuse them instead of reconnecting.
+        """
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    import requests
+                    from requests.adapters import HTTPAdapter
+
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+                    session.mount('http://', adapter)
+                    session.mount('https://', adapter)
+                    self._session = session
+        return self._session
+
+    @property
+    def model_cache(self) -> ModelCache:
+        """Index of models uploaded by `submit`, loaded on first use"""
+        if self._model_cache is None:
+            self._model_cache = shared_model_cache()
+        return self._model_cache
+
+    @property
+    def executor(self) -> "Executor":
+        """Executor which runs the calls of list operations
+
+        Created on first use and kept for the lifetime of the client unless one was provided.
+        """
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    from concurrent.futures import ThreadPoolExecutor
+
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="alfalfa-client")
+        return self._executor
+
+    def close(self) -> None:
+        """Close all pooled connections and threads held by the client
+
+        The client can still be used afterwards, new pools will be opened on the next request.
+        """
+        self.waiter.close()
+        with self._session_lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+        if self._owns_executor:
+            with self._executor_lock:
+                if self._executor is not None:
+                    self._executor.shutdown()
+                    self._executor = None
+
+    def add_request_hook(self, hook: RequestHook) -> None:
+        """Register a hook to observe every request made by the client
+
+        :param hook: hook, e.g. a `RequestMetrics` instance
+        """
+        self._request_hooks = self._request_hooks + (hook,)
+
+    def remove_request_hook(self, hook: RequestHook) -> None:
+        """Unregister a hook
+
+        :param hook: hook previously registered with `add_request_hook`
+        """
+        self._request_hooks = tuple(registered for registered in self._request_hooks if registered is not hook)
+
+    def _send(self, method: str, url: str, endpoint: str, **kwargs) -> "requests.Response":
+        from requests.exceptions import RequestException
+
+        policy = self.retry_policy
+        template = endpoint_template(endpoint)
+        replayable = not hasattr(kwargs.get("data"), "read")
+        policy.budget.deposit()
+        attempt = 1
+        while True:
+            if not policy.circuit_breaker.allow():
+                raise AlfalfaCircuitOpenException(f"Not sending {method} {template}, the alfalfa server at {self.host} appears to be down")
             try:
-                raise AlfalfaAPIException(response)
-            except json.JSONDecodeError:
-                pass
-        response.raise_for_status()
+                response = self._send_attempt(method, url, template, attempt, **kwargs)
+            except RequestException as e:
+                policy.circuit_breaker.record_failure()
+                if (replayable or request_not_sent(e)) and policy.should_retry(attempt, method, template, error=e):
+                    sleep(policy.delay(attempt))
+                    attempt += 1
+                    continue
+                raise
+
+            if response.status_code >= 500:
+                policy.circuit_breaker.record_failure()
+            else:
+                policy.circuit_breaker.record_success()
+            if response.status_code >= 400 and replayable and policy.should_retry(attempt, method, template, status_code=response.status_code):
+                sleep(policy.delay(attempt, response.headers.get("Retry-After")))
+                attempt += 1
+                continue
+            return response
+
+    def _send_attempt(self, method: str, url: str, template: str, attempt: int, **kwargs) -> "requests.Response":
+        hooks = self._request_hooks
+        if not hooks:
+            return self.session.request(method=method, url=url, **kwargs)
+
+        for hook in hooks:
+            hook.request_started(template, method)
+        start = perf_counter()
+        try:
+            response = self.session.request(method=method, url=url, **kwargs)
+        except Exception as e:
+            record = RequestRecord(template, method, None, perf_counter() - start, error=e, attempt=attempt)
+            for hook in hooks:
+                hook.request_finished(record)
+            raise
+        record = RequestRecord(template, method, response.status_code, perf_counter() - start,
+                               request_bytes=body_size(response.request.body), response_bytes=len(response.content),
+                               attempt=attempt)
+        for hook in hooks:
+            hook.request_finished(record)
+        return response
+
+    def _request(self, endpoint: str, method="POST", parameters=None) -> "requests.Response":
+        resolved = self.aliases.resolve(endpoint)
+        response = self._send_request(resolved, method, parameters)
+        if response.status_code == 404 and resolved is not endpoint:
+            # The alias may have been moved to another run, let the server resolve it
+            self.aliases.invalidate(endpoint.split("/", 2)[1])
+            response = self._send_request(endpoint, method, parameters)
+
+        if response.status_code >= 400:
+            raise AlfalfaAPIException(response)
 
         return response
 
+    def _send_request(self, endpoint: str, method: str, parameters) -> "requests.Response":
+        if parameters:
+            return self._send(method, self.url + endpoint, endpoint, data=self.codec.dumps(parameters),
+                              headers={"Content-Type": "application/json"})
+        return self._send(method, self.url + endpoint, endpoint)
+
     @parallelize
     def status(self, run_id: Union[RunID, List[RunID]]) -> str:
         """Get status of run
@@ -96,8 +312,8 @@ class AlfalfaClient:
         :param run_id: id of run or list of ids
         :returns: status of run
         """
-        response = self._request(f"runs/{run_id}", method="GET").json()
-        return response["payload"]["status"]
+        response = self._request(f"runs/{run_id}", method="GET")
+        return self.codec.decode_run(response.content, run_id).status
 
     @parallelize
     def get_error_log(self, run_id: Union[RunID, List[RunID]]) -> str:
@@ -106,94 +322,138 @@ class AlfalfaClient:
         :param run_id: id of run or list of ids
         :returns: error log from run
         """
-        response = self._request(f"runs/{run_id}", method="GET").json()
-        return response["payload"]["errorLog"]
+        response = self._request(f"runs/{run_id}", method="GET")
+        return self.codec.decode_run(response.content, run_id).error_log
 
-    @parallelize
     def wait(self, run_id: Union[RunID, List[RunID]], desired_status: str, timeout: float = 600) -> None:
         """Wait for a run to have a certain status or timeout with error
 
+        All runs are polled by the client's shared `RunWaiter`, starting quickly and
+        backing off while their status does not change.
+
         :param run_id: id of run or list of ids
         :param desired_status: status to wait for
         :param timeout: timeout length in seconds
         """
-
-        start_time = time()
-        previous_status = None
-        current_status = None
-        while time() - timeout < start_time:
-            try:
-                current_status = self.status(run_id)
-            except AlfalfaAPIException as e:
-                if e.response.status_code != 404:
-                    raise e
-
-            if current_status == "ERROR":
-                error_log = self.get_error_log(run_id)
-                raise AlfalfaException(error_log)
-
-            if current_status != previous_status:
-                print("Desired status: {}\t\tCurrent status: {}".format(desired_status, current_status))
-                previous_status = current_status
-            if current_status == desired_status.upper():
-                return
-            sleep(2)
-        raise AlfalfaClientException(f"'wait' timed out waiting for status: '{desired_status}', current status: '{current_status}'")
+        def print_status(run_id: RunID, current_status: str):
+            print("Desired status: {}\t\tCurrent status: {}".format(desired_status, current_status))
+
+        if not isinstance(run_id, list):
+            self.waiter.watch(run_id, desired_status, timeout, callback=print_status).result()
+            return
+
+        futures = [self.waiter.watch(id, desired_status, timeout, callback=print_status) for id in run_id]
+        errors = {}
+        for i, future in enumerate(futures):
+            error = future.exception()
+            if error is not None:
+                errors[i] = error
+        if errors:
+            raise AlfalfaBatchException([None] * len(futures), errors)
+        return [None] * len(futures)
 
     def upload_model(self, model_path: os.PathLike) -> ModelID:
         """Upload a model to alfalfa
 
-        :param model_path: path to model file or folder or list of paths
+        Folders are zipped in memory (spilling to an anonymous temporary file for large models)
+        and streamed to the upload url. Timings of each upload are kept in `upload_metrics`.
+
+        :param model_path: path to model file or folder
 
         :returns: id of model"""
         if not os.path.exists(model_path):
             raise FileNotFoundError(errno.ENOENT, os.strerror(errno.ENOENT), model_path)
-        model_path = prepare_model(model_path)
-        filename = os.path.basename(model_path)
+        with package_model(model_path, compresslevel=self.upload_compression_level) as package:
+            payload = {'modelName': package.filename}
+
+            response = self._request('models/upload', parameters=payload)
+            response_body = self.codec.decode_payload(response.content)
+            post_url = response_body['url']
 
-        payload = {'modelName': filename}
+            model_id = response_body['modelId']
+            form_data = OrderedDict(response_body['fields'])
+            form_data['file'] = ('filename', package)
 
-        response = self._request('models/upload', parameters=payload)
-        response_body = response.json()["payload"]
-        post_url = response_body['url']
+            from requests_toolbelt import MultipartEncoder
 
-        model_id = response_body['modelId']
-        form_data = OrderedDict(response_body['fields'])
-        form_data['file'] = ('filename', open(model_path, 'rb'))
+            encoder = MultipartEncoder(fields=form_data)
+            transfer_start = perf_counter()
+            response = self._send('POST', post_url, 'upload', data=encoder, headers={'Content-Type': encoder.content_type})
+            transfer_seconds = perf_counter() - transfer_start
+            response.raise_for_status()
+            assert response.status_code == 204, "Model upload failed"
 
-        encoder = MultipartEncoder(fields=form_data)
-        response = requests.post(post_url, data=encoder, headers={'Content-Type': encoder.content_type})
-        response.raise_for_status()
-        assert response.status_code == 204, "Model upload failed"
+        self.upload_metrics.append(UploadMetrics(package.filename, package.size, package.packaging_seconds, transfer_seconds))
 
         return model_id
 
-    def create_run_from_model(self, model_id: Union[ModelID, List[ModelID]], wait_for_status: bool = True) -> RunID:
+    def create_run_from_model(self, model_id: Union[ModelID, List[ModelID]], wait_for_status: bool = True) -> Union[RunID, List[RunID]]:
         """Create a run from a model
 
+        When given a list, all runs are created concurrently and then waited on together.
+
         :param model_id: id of model to create a run from or list of ids
         :param wait_for_status: wait for model to be "READY" before returning
 
-        :returns: id of run created"""
-        response = self._request(f"models/{model_id}/createRun")
-        run_id = response.json()["payload"]["runId"]
+        :returns: id of run created or list of ids"""
+        if isinstance(model_id, list):
+            run_id = parallel_map(self.executor, self._create_run, model_id, max_concurrency=self.max_concurrency)
+        else:
+            run_id = self._create_run(model_id)
 
         if wait_for_status:
             self.wait(run_id, "ready")
 
         return run_id
 
+    def create_runs(self, model_id: ModelID, count: int, wait_for_status: bool = True) -> List[RunID]:
+        """Create many runs from one model
+
+        :param model_id: id of model to create runs from
+        :param count: number of runs to create
+        :param wait_for_status: wait for all runs to be "READY" before returning
+
+        :returns: list of ids of runs created"""
+        return self.create_run_from_model([model_id] * count, wait_for_status=wait_for_status)
+
+    def _create_run(self, model_id: ModelID) -> RunID:
+        response = self._request(f"models/{model_id}/createRun")
+        return self.codec.decode_payload(response.content)["runId"]
+
     @parallelize
     def submit(self, model_path: Union[str, List[str]], wait_for_status: bool = True) -> RunID:
         """Submit a model to alfalfa
 
+        Unless `dedupe_uploads` is disabled, a model whose content was already uploaded to
+        the host is not uploaded again, the run is created from the existing model.
+
         :param model_path: path to the model to upload or list of paths
         :param wait_for_status: wait for model to be "READY" before returning
 
         :returns: id of created run
         :rtype: str"""
 
-        model_id = self.upload_model(model_path)
+        if not self.dedupe_uploads:
+            model_id = self.upload_model(model_path)
+        else:
+            digest = hash_model(model_path)
+            with self.model_cache.lock(self.host, digest):
+                model_id = self.model_cache.get(self.host, digest)
+                if model_id is None:
+                    model_id = self.upload_model(model_path)
+                    self.model_cache.put(self.host, digest, model_id)
+            try:
+                return self.create_run_from_model(model_id, wait_for_status=wait_for_status)
+            except AlfalfaAPIException as e:
+                if e.response.status_code != 404:
+                    raise e
+            # The server no longer has the model, upload it again unless another submission already has
+            with self.model_cache.lock(self.host, digest):
+                cached_id = self.model_cache.get(self.host, digest)
+                if cached_id is None or cached_id == model_id:
+                    cached_id = self.upload_model(model_path)
+                    self.model_cache.put(self.host, digest, cached_id)
+                model_id = cached_id
 
         # After the file has been uploaded, then tell BOPTEST to process the run
         # This is done not via the haystack api, but through a REST api
@@ -224,6 +484,7 @@ class AlfalfaClient:
         response = self._request(f"runs/{run_id}/start", parameters=parameters)
 
         assert response.status_code == 204, "Got wrong status_code from alfalfa"
+        self.sim_time.started(run_id, end_datetime, external_clock)
 
         if wait_for_status:
             self.wait(run_id, "running")
@@ -239,6 +500,8 @@ class AlfalfaClient:
         response = self._request(f"runs/{run_id}/stop")
 
         assert response.status_code == 204, "Got wrong status_code from alfalfa"
+        self.points.invalidate(run_id)
+        self.sim_time.forget(run_id)
 
         if wait_for_status:
             self.wait(run_id, "complete")
@@ -249,51 +512,129 @@ class AlfalfaClient:
 
         :param run_id: id of run or list of ids"""
         self._request(f"runs/{run_id}/advance")
+        self.sim_time.advanced(run_id)
+
+    def step(self, run_ids: Union[RunID, List[RunID]], inputs_by_run: Dict[RunID, dict] = None) -> Dict[RunID, StepResult]:
+        """Write inputs, advance and read back the state of runs in lockstep
+
+        Each run is advanced independently and the call returns once all runs have stepped.
+        Latency percentiles of each phase are available from `client.lockstep.timer.summary()`.
+
+        :param run_ids: id of run or list of ids
+        :param inputs_by_run: dictionary of run id to dictionary of point names and input values
+        :returns: dictionary of run id to result holding the sim_time and outputs of the run
+        """
+        if not isinstance(run_ids, list):
+            run_ids = [run_ids]
+        return self.lockstep.step(run_ids, inputs_by_run)
+
+    @parallelize
+    def get_points(self, run_id: Union[RunID, List[RunID]]) -> Run:
+        """Get all points of run with their metadata
+
+        Points are fetched once per run and cached in `points`.
+
+        :param run_id: id of run or list of ids
+        :returns: points of run, with lookup by name, id and type
+        """
+        return self.points.run(run_id)
 
     def get_inputs(self, run_id: str) -> List[str]:
         """Get inputs of run
 
         :param run_id: id of run
         :returns: list of input names"""
-
-        response = self._request(f"runs/{run_id}/points", method="POST",
-                                 parameters={"pointTypes": ["INPUT", "BIDIRECTIONAL"]})
-        response_body = response.json()["payload"]
-        inputs = []
-        for point in response_body:
-            if point["name"] != "":
-                inputs.append(point["name"])
-        return inputs
+        return [point.name for point in self.points.run(run_id).inputs if point.name != ""]
 
     def set_inputs(self, run_id: str, inputs: dict) -> None:
         """Set inputs of run
 
+        With `track_changes` enabled only values which differ from the last value written
+        to the run by this client are sent.
+
         :param run_id: id of run
         :param inputs: dictionary of point names and input values"""
+        if self.track_changes:
+            written = self.points.index(run_id).written
+            inputs = {name: value for name, value in inputs.items()
+                      if name not in written or not values_equal(written[name], value, self.change_tolerance)}
+            if not inputs:
+                return
+
         point_writes = {}
         for name, value in inputs.items():
-            id = self._get_point_translation(run_id, name)
+            id = self.points.get_id(run_id, name)
             if id:
                 point_writes[id] = value
             else:
                 raise AlfalfaClientException(f"No Point exists with name {name}")
         self._request(f"runs/{run_id}/points/values", method="PUT", parameters={'points': point_writes})
 
-    def get_outputs(self, run_id: str) -> dict:
+        if self.track_changes:
+            self.points.index(run_id).written.update(inputs)
+
+    def get_outputs(self, run_id: str, changed_since_last_read: bool = False) -> dict:
         """Get outputs of run
 
         :param run_id: id of run
+        :param changed_since_last_read: only return outputs whose value changed since the last
+                                        time outputs of the run were read, requires `track_changes`
         :returns: dictionary of output names and values"""
+        if changed_since_last_read and not self.track_changes:
+            raise AlfalfaClientException("'changed_since_last_read' requires a client created with track_changes=True")
+
         response = self._request(f"runs/{run_id}/points/values", method="POST",
                                  parameters={"pointTypes": ["OUTPUT", "BIDIRECTIONAL"]})
-        response_body = response.json()["payload"]
+        response_body = self.codec.decode_values(response.content)
         outputs = {}
         for point, value in response_body.items():
-            name = self._get_point_translation(run_id, point)
+            name = self.points.get_name(run_id, point)
             outputs[name] = value
 
+        if self.track_changes:
+            last_read = self.points.index(run_id).read
+            if changed_since_last_read:
+                changed = {name: value for name, value in outputs.items()
+                           if name not in last_read or not values_equal(last_read[name], value, self.change_tolerance)}
+                last_read.update(changed)
+                return changed
+            last_read.update(outputs)
+
         return outputs
 
+    def get_outputs_many(self, run_ids: List[RunID]) -> Dict[RunID, dict]:
+        """Get outputs of many runs
+
+        :param run_ids: ids of runs
+        :returns: dictionary of run id to dictionary of output names and values
+        :raises AlfalfaBatchException: if reading any of the runs failed, once all runs have been read
+        """
+        run_ids = list(run_ids)
+        outputs = parallel_map(self.executor, self.get_outputs, run_ids, max_concurrency=self.max_concurrency)
+        return dict(zip(run_ids, outputs))
+
+    def set_inputs_many(self, inputs_by_run: Dict[RunID, dict]) -> None:
+        """Set inputs of many runs
+
+        :param inputs_by_run: dictionary of run id to dictionary of point names and input values
+        :raises AlfalfaBatchException: if writing to any of the runs failed, once all runs have been written
+        """
+        parallel_map(self.executor, lambda item: self.set_inputs(*item), list(dict(inputs_by_run).items()),
+                     max_concurrency=self.max_concurrency)
+
+    def compile_points(self, run_id: RunID, inputs: List[str] = (), outputs: List[str] = ()) -> PointHandle:
+        """Resolve a fixed set of input and output names of a run once
+
+        The returned handle writes and reads values as sequences in the order given here,
+        avoiding the per call name translation of `set_inputs` and `get_outputs`.
+
+        :param run_id: id of run
+        :param inputs: names of input points to write
+        :param outputs: names of output points to read
+        :returns: handle with `write(values)` and `read()` methods
+        """
+        return PointHandle(self, run_id, inputs, outputs)
+
     @parallelize
     def get_sim_time(self, run_id: Union[RunID, List[RunID]]) -> datetime:
         """Get sim_time of run
@@ -301,9 +642,7 @@ class AlfalfaClient:
         :param run_id: id of site or list of ids
         :returns: datetime of site
         """
-        response = self._request(f"runs/{run_id}/time", method="GET")
-        response_body = response.json()["payload"]
-        return datetime.strptime(response_body["time"], '%Y-%m-%d %H:%M:%S')
+        return self.sim_time.get(run_id)
 
     def set_alias(self, alias: str, run_id: RunID) -> None:
         """Set alias to point to a run_id
@@ -312,28 +651,35 @@ class AlfalfaClient:
         :param alias: alias to use"""
 
         self._request(f"aliases/{alias}", method="PUT", parameters={"runId": run_id})
+        self.aliases.put(alias, run_id)
 
     def get_alias(self, alias: str) -> RunID:
         """Get run_id from alias
 
+        Aliases are cached in `aliases` for `alias_ttl` seconds.
+
         :param alias: alias
         :returns: Id of run associated with alias"""
+        return self.aliases.get(alias)
 
+    def prefetch_aliases(self, aliases: List[str]) -> Dict[str, RunID]:
+        """Look up many aliases at once and cache them
+
+        With `alias_ttl` set, calls addressing a run by one of these aliases are then sent to the
+        run id directly.
+
+        :param aliases: aliases to look up
+        :returns: dictionary of alias to id of run
+        :raises AlfalfaBatchException: if looking up any of the aliases failed, once all have been looked up
+        """
+        aliases = list(aliases)
+        run_ids = parallel_map(self.executor, self.aliases.get, aliases, max_concurrency=self.max_concurrency)
+        return dict(zip(aliases, run_ids))
+
+    def _fetch_alias(self, alias: str) -> RunID:
         response = self._request(f"aliases/{alias}", method="GET")
-        response_body = response.json()["payload"]
-        return response_body
-
-    def _get_point_translation(self, *args):
-        if args in self.point_translation_map:
-            return self.point_translation_map[args]
-        if args not in self.point_translation_map:
-            self._fetch_points(args[0])
-        if args in self.point_translation_map:
-            return self.point_translation_map[args]
-        return None
-
-    def _fetch_points(self, run_id):
+        return self.codec.decode_payload(response.content)
+
+    def _fetch_points(self, run_id: RunID) -> List[dict]:
         response = self._request(f"runs/{run_id}/points", method="GET")
-        for point in response.json()["payload"]:
-            self.point_translation_map[(run_id, point["name"])] = point["id"]
-            self.point_translation_map[(run_id, point["id"])] = point["name"]
+        return self.codec.decode_points(response.content)
@@ -0,0 +1,133 @@
+# ****************************************************************************************************
+# :copyright (c) 2008-2021 URBANopt, Alliance for Sustainable Energy, LLC, and other contributors.
+
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without modification, are permitted
+# provided that the following conditions are met:
+
+# Redistributions of source code must retain the above copyright notice, this list of conditions
+# and the following disclaimer.
+
+# Redistributions in binary form must reproduce the above copyright notice, this list of conditions
+# and the following disclaimer in the documentation and/or other materials provided with the
+# distribution.
+
+# Neither the name of the copyright holder nor the names of its contributors may be used to endorse
+# or promote products derived from this software without specific prior written permission.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+# FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER
+# IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT
+# OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+# ****************************************************************************************************
+
+import threading
+from time import monotonic
+from typing import Callable, Dict, Optional, Tuple
+
+
+class AliasCache:
+    """Cache of the run ids aliases point to
+
+    Filled by `set_alias`, by lookups of `get_alias` and by prefetching. Entries are
+    refetched once they are older than `ttl` seconds. Only aliases in the cache are
+    resolved locally, any other id is sent to the server unchanged.
+    """
+
+    def __init__(self, fetch: Callable[[str], str], ttl: float = 60):
+        """
+        :param fetch: function returning the run id of an alias from the server
+        :param ttl: seconds an alias is cached for, never expires if None, not cached if 0
+        """
+        self.fetch = fetch
+        self.ttl = ttl
+        self._entries: Dict[str, Tuple[str, float]] = {}
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "rewrites": 0, "invalidations": 0}
+
+    def get(self, alias: str) -> str:
+        """Get the run id of an alias, fetching it if it is not cached
+
+        :param alias: alias
+        :returns: id of run the alias points to
+        """
+        run_id = self.lookup(alias)
+        if run_id is not None:
+            self._count("hits")
+            return run_id
+        self._count("misses")
+        run_id = self.fetch(alias)
+        self.put(alias, run_id)
+        return run_id
+
+    def lookup(self, alias: str) -> Optional[str]:
+        """Get the run id of an alias if it is cached
+
+        :param alias: alias or any other id
+        :returns: id of run the alias points to, None if it is not cached
+        """
+        entry = self._entries.get(alias)
+        if entry is None:
+            return None
+        if self.ttl is not None and monotonic() - entry[1] >= self.ttl:
+            with self._lock:
+                if self._entries.get(alias) is entry:
+                    del self._entries[alias]
+            return None
+        return entry[0]
+
+    def resolve(self, endpoint: str) -> str:
+        """Replace a cached alias in a `runs/{id}` endpoint with the run id
+
+        :param endpoint: endpoint relative to the api url
+        :returns: endpoint addressing the run by id
+        """
+        if not self._entries or not endpoint.startswith("runs/"):
+            return endpoint
+        parts = endpoint.split("/", 2)
+        run_id = self.lookup(parts[1])
+        if run_id is None:
+            return endpoint
+        self._count("rewrites")
+        parts[1] = run_id
+        return "/".join(parts)
+
+    def put(self, alias: str, run_id: str) -> None:
+        """Cache the run id of an alias
+
+        :param alias: alias
+        :param run_id: id of run the alias points to
+        """
+        if self.ttl == 0:
+            return
+        with self._lock:
+            self._entries[alias] = (run_id, monotonic())
+
+    def invalidate(self, alias: str = None) -> None:
+        """Drop cached aliases
+
+        :param alias: alias to drop, all aliases if None
+        """
+        with self._lock:
+            self._stats["invalidations"] += 1
+            if alias is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(alias, None)
+
+    def stats(self) -> Dict[str, int]:
+        """Get cache counters
+
+        :returns: dictionary of hits, misses, rewrites, invalidations and the current number of aliases
+        """
+        with self._lock:
+            return dict(self._stats, aliases=len(self._entries))
+
+    def _count(self, counter: str) -> None:
+        with self._lock:
+            self._stats[counter] += 1
@@ -0,0 +1,393 @@
+# ****************************************************************************************************
+# :copyright (c) 2008-2021 URBANopt, Alliance for Sustainable Energy, LLC, and other contributors.
+
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without modification, are permitted
+# provided that the following conditions are met:
+
+# Redistributions of source code must retain the above copyright notice, this list of conditions
+# and the following disclaimer.
+
+# Redistributions in binary form must reproduce the above copyright notice, this list of conditions
+# and the following disclaimer in the documentation and/or other materials provided with the
+# distribution.
+
+# Neither the name of the copyright holder nor the names of its contributors may be used to endorse
+# or promote products derived from this software without specific prior written permission.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+# FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER
+# IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT
+# OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+# ****************************************************************************************************
+
+import asyncio
+import errno
+import json
+import os
+from datetime import datetime
+from time import time
+from typing import List, Union
+from urllib.parse import urljoin
+
+import aiohttp
+
+from alfalfa_client.alfalfa_client import ModelID, RunID
+from alfalfa_client.lib import (
+    AlfalfaAPIException,
+    AlfalfaClientException,
+    AlfalfaException,
+    async_parallelize,
+    package_model
+)
+from alfalfa_client.serialization import JSONCodec, get_codec
+from alfalfa_client.sim_time import parse_sim_time
+
+
+class AsyncResponse:
+    """Completed response from the async transport
+
+    The body is read eagerly so the connection is returned to the pool immediately.
+    Exposes the parts of `requests.Response` used by the client and its exceptions.
+    """
+
+    __slots__ = ("status_code", "content", "url")
+
+    def __init__(self, status_code: int, content: bytes, url: str):
+        self.status_code = status_code
+        self.content = content
+        self.url = url
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class AsyncAlfalfaClient:
+    """AsyncAlfalfaClient is an asyncio wrapper for the Alfalfa REST API
+
+    Every public method of `AlfalfaClient` is available as a coroutine. Methods which
+    accept a list of ids schedule one coroutine per id on the running event loop.
+    """
+
+    def __init__(self, host: str = 'http://localhost', api_version: str = 'v2', max_concurrency: int = 100,
+                 initial_poll_interval: float = 0.1, max_poll_interval: float = 2, json_codec: Union[str, JSONCodec] = None):
+        """Create a new async alfalfa client instance
+
+        :param host: url for host of alfalfa web server
+        :param api_version: version of alfalfa api to use (probably don't change this)
+        :param max_concurrency: maximum number of requests in flight at once
+        :param initial_poll_interval: seconds between the first status polls of `wait`
+        :param max_poll_interval: maximum number of seconds between status polls of `wait`
+        :param json_codec: codec used to encode request bodies and decode responses, or the name of one
+                           ("msgspec", "orjson" or "json"), defaults to the fastest installed
+        """
+        self.host = host
+        self.api_version = api_version
+        self.max_concurrency = max_concurrency
+        self.initial_poll_interval = initial_poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.point_translation_map = {}
+        self.codec = get_codec(json_codec)
+
+        self._session = None
+        self._semaphore = None
+        self._points_lock = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    @property
+    def url(self):
+        return urljoin(self.host, f"api/{self.api_version}/")
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        """Session shared by all requests made by this client
+
+        Must be first accessed from within a running event loop.
+        """
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.max_concurrency)
+            self._session = aiohttp.ClientSession(connector=connector)
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._points_lock = asyncio.Lock()
+        return self._session
+
+    async def close(self) -> None:
+        """Close all pooled connections held by the client"""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def _request(self, endpoint: str, method="POST", parameters=None) -> AsyncResponse:
+        session = self.session
+        async with self._semaphore:
+            data = self.codec.dumps(parameters) if parameters else None
+            headers = {"Content-Type": "application/json"} if parameters else None
+            async with session.request(method, self.url + endpoint, data=data, headers=headers) as response:
+                result = AsyncResponse(response.status, await response.read(), str(response.url))
+
+        if result.status_code >= 400:
+            raise AlfalfaAPIException(result)
+
+        return result
+
+    @async_parallelize
+    async def status(self, run_id: Union[RunID, List[RunID]]) -> str:
+        """Get status of run
+
+        :param run_id: id of run or list of ids
+        :returns: status of run
+        """
+        response = await self._request(f"runs/{run_id}", method="GET")
+        return self.codec.decode_run(response.content, run_id).status
+
+    @async_parallelize
+    async def get_error_log(self, run_id: Union[RunID, List[RunID]]) -> str:
+        """Get error log from run
+
+        :param run_id: id of run or list of ids
+        :returns: error log from run
+        """
+        response = await self._request(f"runs/{run_id}", method="GET")
+        return self.codec.decode_run(response.content, run_id).error_log
+
+    @async_parallelize
+    async def wait(self, run_id: Union[RunID, List[RunID]], desired_status: str, timeout: float = 600) -> None:
+        """Wait for a run to have a certain status or timeout with error
+
+        Polling starts quickly and backs off while the status does not change.
+
+        :param run_id: id of run or list of ids
+        :param desired_status: status to wait for
+        :param timeout: timeout length in seconds
+        """
+
+        start_time = time()
+        interval = self.initial_poll_interval
+        previous_status = None
+        current_status = None
+        while time() - timeout < start_time:
+            try:
+                state = self.codec.decode_run((await self._request(f"runs/{run_id}", method="GET")).content, run_id)
+                current_status = state.status
+            except AlfalfaAPIException as e:
+                if e.response.status_code != 404:
+                    raise e
+
+            if current_status == "ERROR":
+                raise AlfalfaException(state.error_log)
+
+            if current_status != previous_status:
+                print("Desired status: {}\t\tCurrent status: {}".format(desired_status, current_status))
+                previous_status = current_status
+                interval = self.initial_poll_interval
+            if current_status == desired_status.upper():
+                return
+            await asyncio.sleep(interval)
+            interval = min(interval * 2, self.max_poll_interval)
+        raise AlfalfaClientException(f"'wait' timed out waiting for status: '{desired_status}', current status: '{current_status}'")
+
+    async def upload_model(self, model_path: os.PathLike) -> ModelID:
+        """Upload a model to alfalfa
+
+        :param model_path: path to model file or folder
+
+        :returns: id of model"""
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(errno.ENOENT, os.strerror(errno.ENOENT), model_path)
+        package = await asyncio.get_running_loop().run_in_executor(None, package_model, model_path)
+        with package:
+            response = await self._request('models/upload', parameters={'modelName': package.filename})
+            response_body = self.codec.decode_payload(response.content)
+            post_url = response_body['url']
+
+            model_id = response_body['modelId']
+            form_data = aiohttp.FormData()
+            for name, value in response_body['fields'].items():
+                form_data.add_field(name, value)
+            form_data.add_field('file', package.file, filename='filename')
+
+            async with self._semaphore:
+                async with self.session.post(post_url, data=form_data) as response:
+                    if response.status != 204:
+                        raise AlfalfaClientException(f"Model upload failed with status {response.status}")
+
+        return model_id
+
+    @async_parallelize
+    async def create_run_from_model(self, model_id: Union[ModelID, List[ModelID]], wait_for_status: bool = True) -> RunID:
+        """Create a run from a model
+
+        :param model_id: id of model to create a run from or list of ids
+        :param wait_for_status: wait for model to be "READY" before returning
+
+        :returns: id of run created"""
+        response = await self._request(f"models/{model_id}/createRun")
+        run_id = self.codec.decode_payload(response.content)["runId"]
+
+        if wait_for_status:
+            await self.wait(run_id, "ready")
+
+        return run_id
+
+    async def create_runs(self, model_id: ModelID, count: int, wait_for_status: bool = True) -> List[RunID]:
+        """Create many runs from one model
+
+        :param model_id: id of model to create runs from
+        :param count: number of runs to create
+        :param wait_for_status: wait for all runs to be "READY" before returning
+
+        :returns: list of ids of runs created"""
+        return await self.create_run_from_model([model_id] * count, wait_for_status=wait_for_status)
+
+    @async_parallelize
+    async def submit(self, model_path: Union[str, List[str]], wait_for_status: bool = True) -> RunID:
+        """Submit a model to alfalfa
+
+        :param model_path: path to the model to upload or list of paths
+        :param wait_for_status: wait for model to be "READY" before returning
+
+        :returns: id of created run
+        :rtype: str"""
+
+        model_id = await self.upload_model(model_path)
+        return await self.create_run_from_model(model_id, wait_for_status=wait_for_status)
+
+    @async_parallelize
+    async def start(self, run_id: Union[RunID, List[RunID]], start_datetime: datetime, end_datetime: datetime, timescale: int = 5, external_clock: bool = False, realtime: bool = False, wait_for_status: bool = True):
+        """Start one run from a model.
+
+        :param run_id: id of run or list of ids
+        :param start_datetime: time to start the model from
+        :param end_datetime: time to stop the model at (may not be honored for external_clock=True)
+        :param timescale: multiple of real time to run model at (for external_clock=False)
+        :param external_clock: run model with an external advancer
+        :param realtime: run model with timescale=1
+        :param wait_for_status: wait for model to be "RUNNING" before returning
+        """
+        parameters = {
+            'startDatetime': str(start_datetime),
+            'endDatetime': str(end_datetime),
+            'timescale': timescale,
+            'externalClock': external_clock,
+            'realtime': realtime
+        }
+
+        response = await self._request(f"runs/{run_id}/start", parameters=parameters)
+
+        assert response.status_code == 204, "Got wrong status_code from alfalfa"
+
+        if wait_for_status:
+            await self.wait(run_id, "running")
+
+    @async_parallelize
+    async def stop(self, run_id: Union[RunID, List[RunID]], wait_for_status: bool = True):
+        """Stop a run
+
+        :param run_id: id of the run or list of ids
+        :param wait_for_status: wait for the run to be "complete" before returning
+        """
+
+        response = await self._request(f"runs/{run_id}/stop")
+
+        assert response.status_code == 204, "Got wrong status_code from alfalfa"
+
+        if wait_for_status:
+            await self.wait(run_id, "complete")
+
+    @async_parallelize
+    async def advance(self, run_id: Union[RunID, List[RunID]]) -> None:
+        """Advance a run 1 timestep
+
+        :param run_id: id of run or list of ids"""
+        await self._request(f"runs/{run_id}/advance")
+
+    async def get_inputs(self, run_id: str) -> List[str]:
+        """Get inputs of run
+
+        :param run_id: id of run
+        :returns: list of input names"""
+
+        response = await self._request(f"runs/{run_id}/points", method="POST",
+                                       parameters={"pointTypes": ["INPUT", "BIDIRECTIONAL"]})
+        return [point["name"] for point in self.codec.decode_points(response.content) if point["name"] != ""]
+
+    async def set_inputs(self, run_id: str, inputs: dict) -> None:
+        """Set inputs of run
+
+        :param run_id: id of run
+        :param inputs: dictionary of point names and input values"""
+        point_writes = {}
+        for name, value in inputs.items():
+            id = await self._get_point_translation(run_id, name)
+            if id:
+                point_writes[id] = value
+            else:
+                raise AlfalfaClientException(f"No Point exists with name {name}")
+        await self._request(f"runs/{run_id}/points/values", method="PUT", parameters={'points': point_writes})
+
+    async def get_outputs(self, run_id: str) -> dict:
+        """Get outputs of run
+
+        :param run_id: id of run
+        :returns: dictionary of output names and values"""
+        response = await self._request(f"runs/{run_id}/points/values", method="POST",
+                                       parameters={"pointTypes": ["OUTPUT", "BIDIRECTIONAL"]})
+        outputs = {}
+        for point, value in self.codec.decode_values(response.content).items():
+            name = await self._get_point_translation(run_id, point)
+            outputs[name] = value
+
+        return outputs
+
+    @async_parallelize
+    async def get_sim_time(self, run_id: Union[RunID, List[RunID]]) -> datetime:
+        """Get sim_time of run
+
+        :param run_id: id of site or list of ids
+        :returns: datetime of site
+        """
+        response = await self._request(f"runs/{run_id}/time", method="GET")
+        return parse_sim_time(self.codec.decode_time(response.content))
+
+    async def set_alias(self, alias: str, run_id: RunID) -> None:
+        """Set alias to point to a run_id
+
+        :param run_id: id of run to point alias to
+        :param alias: alias to use"""
+
+        await self._request(f"aliases/{alias}", method="PUT", parameters={"runId": run_id})
+
+    async def get_alias(self, alias: str) -> RunID:
+        """Get run_id from alias
+
+        :param alias: alias
+        :returns: Id of run associated with alias"""
+
+        response = await self._request(f"aliases/{alias}", method="GET")
+        return self.codec.decode_payload(response.content)
+
+    async def _get_point_translation(self, *args):
+        if args in self.point_translation_map:
+            return self.point_translation_map[args]
+        if self._points_lock is None:
+            self._points_lock = asyncio.Lock()
+        async with self._points_lock:
+            if args not in self.point_translation_map:
+                await self._fetch_points(args[0])
+        return self.point_translation_map.get(args)
+
+    async def _fetch_points(self, run_id):
+        response = await self._request(f"runs/{run_id}/points", method="GET")
+        for point in self.codec.decode_points(response.content):
+            self.point_translation_map[(run_id, point["name"])] = point["id"]
+            self.point_translation_map[(run_id, point["id"])] = point["name"]
@@ -0,0 +1,408 @@
+# ****************************************************************************************************
+# :copyright (c) 2008-2021 URBANopt, Alliance for Sustainable Energy, LLC, and other contributors.
+
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without modification, are permitted
+# provided that the following conditions are met:
+
+# Redistributions of source code must retain the above copyright notice, this list of conditions
+# and the following disclaimer.
+
+# Redistributions in binary form must reproduce the above copyright notice, this list of conditions
+# and the following disclaimer in the documentation and/or other materials provided with the
+# distribution.
+
+# Neither the name of the copyright holder nor the names of its contributors may be used to endorse
+# or promote products derived from this software without specific prior written permission.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+# FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER
+# IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT
+# OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+# ****************************************************************************************************
+
+import argparse
+import json
+import os
+import sys
+import threading
+from datetime import datetime
+from os import PathLike
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Sequence
+
+from alfalfa_client.fleet import (
+    COMPLETE,
+    FAILED,
+    PENDING,
+    RUNNING,
+    STAGES,
+    STARTING,
+    STOPPING,
+    SUBMITTING,
+    FleetProgress,
+    FleetRun,
+    RunFleet
+)
+from alfalfa_client.lib import (
+    AlfalfaAPIException,
+    AlfalfaBatchException,
+    AlfalfaClientException
+)
+from alfalfa_client.lockstep import PhaseTimer
+from alfalfa_client.sim_time import parse_sim_time
+
+if TYPE_CHECKING:
+    from alfalfa_client.alfalfa_client import AlfalfaClient, RunID
+
+MANIFEST_FIELDS = ("model", "name", "count", "start_datetime", "end_datetime", "timescale", "external_clock",
+                   "realtime", "priority")
+
+
+def load_manifest(path: PathLike) -> List[dict]:
+    """Read the runs of a manifest
+
+    A manifest is a JSON object with a list of `runs` and `defaults` applied to every run.
+    Each run names a `model` file or folder, relative to the manifest, and may set
+    `start_datetime`, `end_datetime`, `timescale`, `external_clock`, `realtime` and
+    `priority`. A run with a `count` is repeated that many times. Runs are keyed by their
+    `name`, defaulting to the name of the model, followed by the repetition if repeated.
+
+        {
+            "defaults": {"start_datetime": "2020-01-01 00:00:00", "end_datetime": "2020-01-02 00:00:00"},
+            "runs": [
+                {"model": "models/small_office", "count": 4, "timescale": 10},
+                {"model": "models/refrig_case_osw.zip", "name": "refrig", "external_clock": true}
+            ]
+        }
+
+    :param path: path to manifest
+    :returns: keyword arguments of `RunFleet.add` for every run
+    :raises AlfalfaClientException: if the manifest cannot be read or is invalid
+    """
+    path = Path(path)
+    try:
+        manifest = json.loads(path.read_text())
+    except (OSError, ValueError) as e:
+        raise AlfalfaClientException(f"Could not read manifest '{path}': {e}") from e
+    if not isinstance(manifest, dict) or not isinstance(manifest.get("runs"), list):
+        raise AlfalfaClientException(f"Manifest '{path}' must be an object with a list of runs")
+
+    runs = []
+    keys = set()
+    for index, entry in enumerate(manifest["runs"]):
+        entry = {**manifest.get("defaults", {}), **entry}
+        unknown = sorted(set(entry) - set(MANIFEST_FIELDS))
+        if unknown:
+            raise AlfalfaClientException(f"Run {index} of manifest has unknown fields: {', '.join(unknown)}")
+        missing = [field for field in ("model", "start_datetime", "end_datetime") if field not in entry]
+        if missing:
+            raise AlfalfaClientException(f"Run {index} of manifest is missing fields: {', '.join(missing)}")
+        model_path = path.parent / entry["model"]
+        if not model_path.exists():
+            raise AlfalfaClientException(f"Model '{model_path}' of run {index} does not exist")
+        try:
+            start_datetime = parse_sim_time(entry["start_datetime"])
+            end_datetime = parse_sim_time(entry["end_datetime"])
+        except (TypeError, ValueError) as e:
+            raise AlfalfaClientException(f"Run {index} of manifest has an invalid datetime: {e}") from e
+
+        name = entry.get("name", model_path.stem)
+        count = entry.get("count", 1)
+        if not isinstance(count, int) or isinstance(count, bool) or count < 1:
+            raise AlfalfaClientException(f"Run {index} of manifest has an invalid count: {count!r}, must be a positive integer")
+        for repetition in range(count):
+            key = name if count == 1 else f"{name}-{repetition}"
+            if key in keys:
+                raise AlfalfaClientException(f"Manifest has more than one run named '{key}', give runs a unique name")
+            keys.add(key)
+            runs.append({
+                "key": key,
+                "model_path": model_path,
+                "start_datetime": start_datetime,
+                "end_datetime": end_datetime,
+                "timescale": entry.get("timescale", 5),
+                "external_clock": bool(entry.get("external_clock", False)),
+                "realtime": bool(entry.get("realtime", False)),
+                "priority": entry.get("priority", 0)
+            })
+    if not runs:
+        raise AlfalfaClientException(f"Manifest '{path}' has no runs")
+    return runs
+
+
+class FleetState:
+    """Run id and stage of every run of a manifest, saved to a file whenever a run changes
+
+    Lets a fleet that was interrupted be resumed without uploading models or creating
+    runs again. Stage durations of resumed runs are added to those already recorded.
+    """
+
+    def __init__(self, path: Optional[PathLike] = None):
+        """
+        :param path: file to load the state from if it exists and to save it to, kept in memory if None
+        :raises AlfalfaClientException: if the file exists but cannot be read
+        """
+        self.path = Path(path) if path is not None else None
+        self.runs: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+        if self.path is not None and self.path.exists():
+            try:
+                self.runs = json.loads(self.path.read_text())["runs"]
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                raise AlfalfaClientException(f"Could not read state file '{self.path}': {e}") from e
+        self._previous_durations = {key: dict(entry.get("durations", {})) for key, entry in self.runs.items()}
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            entry = self.runs.get(key)
+            return dict(entry) if entry is not None else None
+
+    def set(self, key: str, **fields) -> None:
+        """Change fields of the entry of a run and save the state"""
+        with self._lock:
+            self.runs.setdefault(key, {}).update(fields)
+            self._save()
+
+    def record(self, run: FleetRun) -> None:
+        """Save the run id, stage and stage durations of a run of the fleet
+
+        :param run: run to save
+        """
+        with self._lock:
+            durations = dict(self._previous_durations.get(run.key, {}))
+            for stage, seconds in run.stage_durations().items():
+                durations[stage] = durations.get(stage, 0.0) + seconds
+            self.runs[run.key] = {
+                "model": str(run.model_path),
+                "run_id": run.run_id,
+                "stage": run.stage,
+                "started": run.started,
+                "error": str(run.error) if run.error is not None else None,
+                "durations": durations
+            }
+            self._save()
+
+    def _save(self) -> None:
+        if self.path is None:
+            return
+        temp_path = self.path.with_name(self.path.name + ".tmp")
+        temp_path.write_text(json.dumps({"runs": self.runs}, indent=2))
+        os.replace(temp_path, self.path)
+
+
+class _StageTimer(PhaseTimer):
+    PHASES = (PENDING, SUBMITTING, STARTING, RUNNING, STOPPING)
+
+
+def advance_until_end(end_datetime: datetime, stage_timeout: float = 600) -> Callable[["AlfalfaClient", "RunID"], None]:
+    """Make a fleet driver which advances a run with an external clock until it reaches its end time
+
+    :param end_datetime: sim time to stop advancing at
+    :param stage_timeout: seconds to wait for the run to be running before advancing it
+    :returns: driver for `RunFleet.add`
+    """
+    def driver(client: "AlfalfaClient", run_id: "RunID") -> None:
+        client.waiter.watch(run_id, "running", stage_timeout).result()
+        while client.get_sim_time(run_id) < end_datetime:
+            client.advance(run_id)
+    return driver
+
+
+def schedule_runs(fleet: RunFleet, runs: List[dict], state: FleetState, retry_failed: bool = False) -> None:
+    """Add the runs of a manifest to a fleet, resuming those recorded in the state
+
+    Complete runs are skipped, as are failed runs unless `retry_failed` is set. Runs
+    which were created, including cancelled ones, are looked up on the server and
+    continued from their status. Those which finished since the state was saved are
+    recorded as such, and only those the server answers with a 404 for are submitted again.
+
+    :param fleet: fleet to add runs to
+    :param runs: runs from `load_manifest`
+    :param state: state of earlier attempts
+    :param retry_failed: submit runs which failed again
+    :raises AlfalfaClientException: if the status of a created run cannot be looked up
+    """
+    client = fleet.client
+    resumed = [run for run in runs if _resumable(state.get(run["key"]))]
+    statuses = [None] * len(resumed)
+    if resumed:
+        try:
+            statuses = client.status([state.get(run["key"])["run_id"] for run in resumed])
+        except AlfalfaBatchException as e:
+            for index, error in sorted(e.errors.items()):
+                if not isinstance(error, AlfalfaAPIException) or error.response.status_code != 404:
+                    key = resumed[index]["key"]
+                    raise AlfalfaClientException(f"Could not look up run {state.get(key)['run_id']} of '{key}': {error}") from error
+            statuses = [None if index in e.errors else status for index, status in enumerate(e.results)]
+    status_of = {run["key"]: status.upper() if status is not None else None for run, status in zip(resumed, statuses)}
+
+    preparing = []
+    for run in runs:
+        key = run["key"]
+        entry = state.get(key)
+        driver = advance_until_end(run["end_datetime"], fleet.stage_timeout) if run["external_clock"] else None
+        status = status_of.get(key)
+        if entry is not None and entry.get("stage") == COMPLETE:
+            continue
+        if entry is not None and entry.get("stage") == FAILED and not retry_failed:
+            continue
+        if status is None:
+            fleet.add(driver=driver, **run)
+        elif status == "COMPLETE":
+            state.set(key, stage=COMPLETE)
+        elif status == "ERROR":
+            state.set(key, stage=FAILED, error=f"Run {entry['run_id']} errored")
+            if retry_failed:
+                fleet.add(driver=driver, **run)
+        elif status == "STOPPING":
+            fleet.add(run_id=entry["run_id"], started=True, **run)
+        elif status in (STARTING, RUNNING):
+            fleet.add(driver=driver, run_id=entry["run_id"], started=True, **run)
+        else:
+            preparing.append((run, driver, entry["run_id"], client.waiter.watch(entry["run_id"], "ready", fleet.stage_timeout)))
+
+    for run, driver, run_id, ready in preparing:
+        try:
+            ready.result()
+        except Exception as e:
+            state.set(run["key"], stage=FAILED, error=str(e))
+            if retry_failed:
+                fleet.add(driver=driver, **run)
+        else:
+            fleet.add(driver=driver, run_id=run_id, **run)
+
+
+def _resumable(entry: Optional[dict]) -> bool:
+    return entry is not None and entry.get("run_id") is not None and entry.get("stage") not in (COMPLETE, FAILED)
+
+
+def build_summary(fleet: RunFleet, runs: List[dict], state: FleetState, requests: Dict[str, dict] = None) -> dict:
+    """Collect the outcome and timing of a fleet into a JSON serializable summary
+
+    :param fleet: fleet which was run
+    :param runs: runs from `load_manifest`
+    :param state: state of the runs of the manifest, including earlier attempts
+    :param requests: request metrics of the client, from `RequestMetrics.snapshot`
+    :returns: dictionary with the progress of this attempt, the number of runs of the
+              manifest in each stage, percentiles of stage durations of this attempt,
+              the entry of every run and the request metrics
+    """
+    timer = _StageTimer()
+    for run in fleet.runs:
+        for stage, seconds in run.stage_durations().items():
+            timer.record(stage, seconds)
+    entries = [{"key": run["key"], **(state.get(run["key"]) or {"stage": PENDING})} for run in runs]
+    stages = {stage.lower(): 0 for stage in STAGES}
+    for entry in entries:
+        stages[entry["stage"].lower()] += 1
+    return {
+        "progress": fleet.progress().to_dict(),
+        "manifest": {"total": len(entries), **stages},
+        "stage_durations": timer.summary(),
+        "runs": entries,
+        "requests": {endpoint: {name: value for name, value in stats.items() if name != "histogram"}
+                     for endpoint, stats in (requests or {}).items()}
+    }
+
+
+def run_manifest(args: argparse.Namespace) -> int:
+    from alfalfa_client.alfalfa_client import AlfalfaClient
+    from alfalfa_client.metrics import RequestMetrics
+
+    runs = load_manifest(args.manifest)
+    state = FleetState(args.state if args.state is not None else Path(args.manifest).with_suffix(".state.json"))
+
+    def log(message: str) -> None:
+        if not args.quiet:
+            sys.stderr.write(message + "\n")
+            sys.stderr.flush()
+
+    def on_update(run: FleetRun, progress: FleetProgress) -> None:
+        state.record(run)
+        if run.stage == FAILED:
+            log(f"{run.key} ({run.run_id}) failed: {run.error}")
+
+    metrics = RequestMetrics()
+    with AlfalfaClient(args.host, sim_time_check_interval=args.sim_time_check_interval) as client:
+        client.add_request_hook(metrics)
+        fleet = RunFleet(client, max_active=args.max_active, max_submitting=args.max_submitting,
+                         max_starting=args.max_starting, max_stopping=args.max_stopping,
+                         stage_timeout=args.stage_timeout, run_timeout=args.run_timeout, on_update=on_update)
+        schedule_runs(fleet, runs, state, retry_failed=args.retry_failed)
+        log(f"Running {len(fleet.runs)} of {len(runs)} runs on {args.host}, saving state to {state.path}")
+
+        thread = threading.Thread(target=fleet.run, name="alfalfa-fleet-runner", daemon=True)
+        thread.start()
+        try:
+            while thread.is_alive():
+                thread.join(args.progress_interval)
+                progress = fleet.progress()
+                log(f"[{progress.elapsed:8.1f}s] {progress}")
+        except KeyboardInterrupt:
+            fleet.cancel()
+            log("Interrupted, waiting for active runs to finish, interrupt again to exit and resume later")
+            try:
+                thread.join()
+            except KeyboardInterrupt:
+                return 130
+
+    summary = build_summary(fleet, runs, state, metrics.snapshot())
+    if args.summary == "-":
+        json.dump(summary, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+    else:
+        Path(args.summary).write_text(json.dumps(summary, indent=2))
+    return 0 if summary["manifest"][COMPLETE.lower()] == len(runs) else 1
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="alfalfa", description="Command line client for Alfalfa")
+    commands = parser.add_subparsers(title="commands", dest="command", required=True)
+
+    run = commands.add_parser("run", help="run every model of a manifest",
+                              description="Submit, start, run and stop every run of a manifest with bounded "
+                                          "concurrency. Progress is saved to a state file, running the same "
+                                          "manifest again resumes the runs which have not finished.")
+    run.add_argument("manifest", help="JSON manifest of runs, see `alfalfa_client.cli.load_manifest`")
+    run.add_argument("--host", default=os.environ.get("ALFALFA_HOST", "http://localhost"),
+                     help="url of Alfalfa web server (default: $ALFALFA_HOST or http://localhost)")
+    run.add_argument("--state", help="state file to resume from and save to (default: <manifest>.state.json)")
+    run.add_argument("--summary", default="-", help="file to write the JSON summary to (default: stdout)")
+    run.add_argument("--retry-failed", action="store_true", help="submit runs which failed in an earlier attempt again")
+    run.add_argument("--max-active", type=int, default=10, help="maximum number of active runs (default: 10)")
+    run.add_argument("--max-submitting", type=int, default=4, help="maximum number of runs being submitted (default: 4)")
+    run.add_argument("--max-starting", type=int, default=4, help="maximum number of runs being started (default: 4)")
+    run.add_argument("--max-stopping", type=int, default=4, help="maximum number of runs being stopped (default: 4)")
+    run.add_argument("--stage-timeout", type=float, default=600,
+                     help="seconds to wait for a run to be ready, running or stopped (default: 600)")
+    run.add_argument("--run-timeout", type=float, help="seconds to wait for a run without external clock to complete")
+    run.add_argument("--sim-time-check-interval", type=int, default=60,
+                     help="advances between reads of the sim time of external clock runs (default: 60)")
+    run.add_argument("--progress-interval", type=float, default=10, help="seconds between progress reports (default: 10)")
+    run.add_argument("--quiet", action="store_true", help="do not report progress")
+    run.set_defaults(handler=run_manifest)
+    return parser
+
+
+def main(argv: Sequence[str] = None) -> int:
+    """Entry point of the `alfalfa` command
+
+    :param argv: command line arguments, defaults to `sys.argv`
+    :returns: exit status, 0 if every run completed
+    """
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    try:
+        return args.handler(args)
+    except AlfalfaClientException as e:
+        parser.exit(2, f"alfalfa: error: {e}\n")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
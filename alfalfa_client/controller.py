@@ -0,0 +1,239 @@
+# ****************************************************************************************************
+# :copyright (c) 2008-2021 URBANopt, Alliance for Sustainable Energy, LLC, and other contributors.
+
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without modification, are permitted
+# provided that the following conditions are met:
+
+# Redistributions of source code must retain the above copyright notice, this list of conditions
+# and the following disclaimer.
+
+# Redistributions in binary form must reproduce the above copyright notice, this list of conditions
+# and the following disclaimer in the documentation and/or other materials provided with the
+# distribution.
+
+# Neither the name of the copyright holder nor the names of its contributors may be used to endorse
+# or promote products derived from this software without specific prior written permission.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+# FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER
+# IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT
+# OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+# ****************************************************************************************************
+
+import threading
+from collections import deque
+from concurrent.futures import Future
+from datetime import datetime
+from time import perf_counter
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional
+
+from alfalfa_client.lib import AlfalfaBatchException
+from alfalfa_client.metrics import RequestHook, RequestRecord
+
+if TYPE_CHECKING:
+    from alfalfa_client.alfalfa_client import AlfalfaClient, RunID
+
+Controller = Callable[["RunID", datetime, dict], Optional[dict]]
+
+
+class Frame:
+    """Outputs read from a run and the inputs the controller computed from them"""
+
+    __slots__ = ("run_id", "sim_time", "outputs", "inputs")
+
+    def __init__(self, run_id: "RunID", sim_time: datetime = None, outputs: dict = None):
+        self.run_id = run_id
+        self.sim_time = sim_time
+        self.outputs = outputs
+        self.inputs: Optional[dict] = None
+
+    def __repr__(self) -> str:
+        return f"Frame(run_id={self.run_id!r}, sim_time={self.sim_time!r})"
+
+
+class StepTiming:
+    """Where the time of one controller step went
+
+    `controller` is time spent in the controller callback and `io_wait` the time the
+    loop waited for requests it could not overlap with control. The time of every
+    request is split into `network`, estimated as the fastest request seen so far
+    (a round trip with next to no server work), and `server`, the remainder. Request
+    times overlap each other and the controller, so they add up to more than `wall`.
+    """
+
+    __slots__ = ("step", "runs", "wall", "controller", "io_wait", "network", "server", "requests")
+
+    def __init__(self, step: int, runs: int):
+        self.step = step
+        self.runs = runs
+        self.wall = 0.0
+        self.controller = 0.0
+        self.io_wait = 0.0
+        self.network = 0.0
+        self.server = 0.0
+        self.requests = 0
+
+    def to_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __repr__(self) -> str:
+        return (f"StepTiming(step={self.step}, wall={self.wall:.4f}, controller={self.controller:.4f}, "
+                f"io_wait={self.io_wait:.4f}, network={self.network:.4f}, server={self.server:.4f})")
+
+
+class ControllerRunner:
+    """Runs a controller in the loop with external clock runs, overlapping I/O with control
+
+    Each step, every run is read (sim time and outputs), passed to the controller, and
+    the inputs it returns are written before the run is advanced. Reads of the next runs
+    and writes of the previous runs are in flight on the client's executor while the
+    controller computes, at most `depth` frames each, so neither the network nor the
+    controller sits idle while the other works.
+    """
+
+    def __init__(self, client: "AlfalfaClient", run_ids: List["RunID"], controller: Controller, depth: int = 2,
+                 window: int = 10000):
+        """
+        :param client: client to make requests with
+        :param run_ids: ids of runs to control, started with `external_clock=True`
+        :param controller: called with the run id, sim time and outputs of each run, returns
+                           a dictionary of input names and values to write, or None
+        :param depth: number of frames buffered for reading and for writing, 1 runs every
+                      run serially, 2 double buffers them
+        :param window: number of step timings kept
+        """
+        if depth < 1:
+            raise ValueError("depth must be at least 1")
+        self.client = client
+        self.run_ids = list(run_ids)
+        self.controller = controller
+        self.depth = depth
+        self.timings: "deque[StepTiming]" = deque(maxlen=window)
+        self._steps = 0
+        self._network_estimate: Optional[float] = None
+
+    def step(self) -> List[Frame]:
+        """Read, control, write and advance every run once
+
+        :returns: frame of every run, in the order of `run_ids`
+        :raises AlfalfaBatchException: if any run failed, once all runs have been written
+        """
+        timing = StepTiming(self._steps, len(self.run_ids))
+        self._steps += 1
+        requests = _StepRequests(timing, self._network_estimate)
+        self.client.add_request_hook(requests)
+        try:
+            frames, errors = self._step(timing)
+        finally:
+            self.client.remove_request_hook(requests)
+            self._network_estimate = requests.network_estimate
+        self.timings.append(timing)
+        if errors:
+            raise AlfalfaBatchException(frames, errors)
+        return frames
+
+    def _step(self, timing: StepTiming):
+        start = perf_counter()
+        executor = self.client.executor
+        frames: List[Optional[Frame]] = [None] * len(self.run_ids)
+        errors: Dict[int, BaseException] = {}
+        reads: "deque[Future]" = deque()
+        writes: "deque[tuple]" = deque()
+        next_read = 0
+
+        def drain_write():
+            index, future = writes.popleft()
+            error = self._wait(future, timing)
+            if error is not None:
+                errors[index] = error
+
+        for index, run_id in enumerate(self.run_ids):
+            while next_read < len(self.run_ids) and next_read < index + self.depth:
+                reads.append(executor.submit(self._read, self.run_ids[next_read]))
+                next_read += 1
+            future = reads.popleft()
+            error = self._wait(future, timing)
+            if error is not None:
+                errors[index] = error
+                continue
+            frame = frames[index] = future.result()
+
+            control_start = perf_counter()
+            try:
+                frame.inputs = self.controller(run_id, frame.sim_time, frame.outputs)
+            except Exception as e:
+                errors[index] = e
+                continue
+            finally:
+                timing.controller += perf_counter() - control_start
+
+            writes.append((index, executor.submit(self._write, frame)))
+            while len(writes) > self.depth - 1:
+                drain_write()
+
+        while writes:
+            drain_write()
+        timing.wall = perf_counter() - start
+        return frames, errors
+
+    def run(self, steps: int, on_step: Callable[[List[Frame]], None] = None) -> None:
+        """Run a number of steps
+
+        :param steps: number of steps to run
+        :param on_step: called with the frames of every step once it has finished
+        """
+        for _ in range(steps):
+            frames = self.step()
+            if on_step is not None:
+                on_step(frames)
+
+    def summary(self) -> Dict[str, float]:
+        """Get the total of each timing over all kept steps
+
+        :returns: dictionary of steps and summed wall, controller, io_wait, network and server seconds
+        """
+        summary = dict.fromkeys(("wall", "controller", "io_wait", "network", "server"), 0.0)
+        for timing in self.timings:
+            for name in summary:
+                summary[name] += getattr(timing, name)
+        summary["steps"] = len(self.timings)
+        return summary
+
+    def _wait(self, future: Future, timing: StepTiming) -> Optional[BaseException]:
+        start = perf_counter()
+        error = future.exception()
+        timing.io_wait += perf_counter() - start
+        return error
+
+    def _read(self, run_id: "RunID") -> Frame:
+        return Frame(run_id, self.client.get_sim_time(run_id), self.client.get_outputs(run_id))
+
+    def _write(self, frame: Frame) -> None:
+        if frame.inputs:
+            self.client.set_inputs(frame.run_id, frame.inputs)
+        self.client.advance(frame.run_id)
+
+
+class _StepRequests(RequestHook):
+    """Splits the requests made by the client during a step into network and server time"""
+
+    def __init__(self, timing: StepTiming, network_estimate: Optional[float]):
+        self.timing = timing
+        self.network_estimate = network_estimate
+        self._lock = threading.Lock()
+
+    def request_finished(self, record: RequestRecord) -> None:
+        if record.status_code is None:
+            return
+        with self._lock:
+            if self.network_estimate is None or record.seconds < self.network_estimate:
+                self.network_estimate = record.seconds
+            self.timing.network += self.network_estimate
+            self.timing.server += record.seconds - self.network_estimate
+            self.timing.requests += 1
@@ -0,0 +1,275 @@
+# ****************************************************************************************************
+# :copyright (c) 2008-2021 URBANopt, Alliance for Sustainable Energy, LLC, and other contributors.
+
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without modification, are permitted
+# provided that the following conditions are met:
+
+# Redistributions of source code must retain the above copyright notice, this list of conditions
+# and the following disclaimer.
+
+# Redistributions in binary form must reproduce the above copyright notice, this list of conditions
+# and the following disclaimer in the documentation and/or other materials provided with the
+# distribution.
+
+# Neither the name of the copyright holder nor the names of its contributors may be used to endorse
+# or promote products derived from this software without specific prior written permission.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+# FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER
+# IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT
+# OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+# ****************************************************************************************************
+
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from datetime import datetime
+from os import PathLike
+from time import monotonic
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional
+
+if TYPE_CHECKING:
+    from alfalfa_client.alfalfa_client import AlfalfaClient, RunID
+
+PENDING = "PENDING"
+SUBMITTING = "SUBMITTING"
+STARTING = "STARTING"
+RUNNING = "RUNNING"
+STOPPING = "STOPPING"
+COMPLETE = "COMPLETE"
+FAILED = "FAILED"
+CANCELLED = "CANCELLED"
+
+STAGES = (PENDING, SUBMITTING, STARTING, RUNNING, STOPPING, COMPLETE, FAILED, CANCELLED)
+ACTIVE_STAGES = (SUBMITTING, STARTING, RUNNING, STOPPING)
+FINISHED_STAGES = (COMPLETE, FAILED, CANCELLED)
+
+
+class FleetRun:
+    """A run scheduled by a `RunFleet` and the stage of its lifecycle it is in"""
+
+    __slots__ = ("key", "model_path", "start_datetime", "end_datetime", "timescale", "external_clock", "realtime",
+                 "priority", "driver", "run_id", "started", "stage", "error", "stage_times")
+
+    def __init__(self, key: str, model_path: PathLike, start_datetime: datetime, end_datetime: datetime,
+                 timescale: int = 5, external_clock: bool = False, realtime: bool = False, priority: int = 0,
+                 driver: Callable[["AlfalfaClient", "RunID"], None] = None, run_id: "RunID" = None, started: bool = False):
+        self.key = key
+        self.model_path = model_path
+        self.start_datetime = start_datetime
+        self.end_datetime = end_datetime
+        self.timescale = timescale
+        self.external_clock = external_clock
+        self.realtime = realtime
+        self.priority = priority
+        self.driver = driver
+        self.run_id = run_id
+        self.started = started
+        self.stage = PENDING
+        self.error: Optional[BaseException] = None
+        self.stage_times: Dict[str, float] = {PENDING: monotonic()}
+
+    @property
+    def finished(self) -> bool:
+        return self.stage in FINISHED_STAGES
+
+    def stage_durations(self) -> Dict[str, float]:
+        """Get how long the run spent in each stage it has left
+
+        :returns: dictionary of stage names and seconds
+        """
+        entered = sorted(self.stage_times.items(), key=lambda item: item[1])
+        return {stage: end - start for (stage, start), (_, end) in zip(entered, entered[1:])}
+
+    def __repr__(self) -> str:
+        return f"FleetRun(key={self.key!r}, run_id={self.run_id!r}, stage={self.stage!r})"
+
+
+class FleetProgress:
+    """Snapshot of the progress of a `RunFleet`"""
+
+    __slots__ = ("total", "stages", "elapsed")
+
+    def __init__(self, total: int, stages: Dict[str, int], elapsed: float):
+        self.total = total
+        self.stages = stages
+        self.elapsed = elapsed
+
+    @property
+    def active(self) -> int:
+        return sum(self.stages[stage] for stage in ACTIVE_STAGES)
+
+    @property
+    def finished(self) -> int:
+        return sum(self.stages[stage] for stage in FINISHED_STAGES)
+
+    @property
+    def runs_per_hour(self) -> float:
+        """Number of runs completed per hour since the fleet started"""
+        return self.stages[COMPLETE] * 3600 / self.elapsed if self.elapsed > 0 else 0.0
+
+    def to_dict(self) -> dict:
+        return {"total": self.total, "elapsed": self.elapsed, "runs_per_hour": self.runs_per_hour,
+                **{stage.lower(): count for stage, count in self.stages.items()}}
+
+    def __str__(self) -> str:
+        return (f"{self.finished}/{self.total} finished ({self.stages[COMPLETE]} complete, {self.stages[FAILED]} failed), "
+                f"{self.active} active, {self.stages[PENDING]} pending, {self.runs_per_hour:.1f} runs/hour")
+
+
+class RunFleet:
+    """Drives many runs through submit, start, run and stop with bounded concurrency
+
+    At most `max_active` runs are between submitting and stopping at once, and the
+    number of runs in the submit, start and stop stages is limited separately so
+    uploads and model preprocessing do not overload the Alfalfa workers. Pending runs
+    are taken in order of priority as active runs finish.
+
+    A run with a `driver` is running until the driver returns, after which it is
+    stopped. Without one, the run is waited on until it completes by itself.
+    """
+
+    def __init__(self, client: "AlfalfaClient", max_active: int = 10, max_submitting: int = 4, max_starting: int = 4,
+                 max_stopping: int = 4, stage_timeout: float = 600, run_timeout: float = None,
+                 on_update: Callable[[FleetRun, FleetProgress], None] = None):
+        """
+        :param client: client to make requests with
+        :param max_active: maximum number of runs between submitting and stopping
+        :param max_submitting: maximum number of runs being uploaded and created at once
+        :param max_starting: maximum number of runs being started at once
+        :param max_stopping: maximum number of runs being stopped at once
+        :param stage_timeout: seconds to wait for a run to reach the status of each stage
+        :param run_timeout: seconds to wait for a run without a driver to complete, no limit if None
+        :param on_update: called with the run and the fleet progress whenever a run changes stage
+                          or is created and gets its run id
+        """
+        self.client = client
+        self.max_active = max_active
+        self.stage_timeout = stage_timeout
+        self.run_timeout = run_timeout
+        self.on_update = on_update
+        self.runs: List[FleetRun] = []
+
+        self._limits = {
+            SUBMITTING: threading.BoundedSemaphore(max_submitting),
+            STARTING: threading.BoundedSemaphore(max_starting),
+            STOPPING: threading.BoundedSemaphore(max_stopping),
+        }
+        self._lock = threading.Lock()
+        self._cancelled = threading.Event()
+        self._started_at = None
+
+    def add(self, model_path: PathLike, start_datetime: datetime, end_datetime: datetime, timescale: int = 5,
+            external_clock: bool = False, realtime: bool = False, priority: int = 0,
+            driver: Callable[["AlfalfaClient", "RunID"], None] = None, key: str = None,
+            run_id: "RunID" = None, started: bool = False) -> FleetRun:
+        """Schedule a run
+
+        :param model_path: path to model file or folder
+        :param start_datetime: time to start the model from
+        :param end_datetime: time to stop the model at
+        :param timescale: multiple of real time to run model at (for external_clock=False)
+        :param external_clock: run model with an external advancer
+        :param realtime: run model with timescale=1
+        :param priority: runs with a lower priority are scheduled first
+        :param driver: function called with the client and run id once the run is running,
+                       the run is stopped when it returns
+        :param key: name of the run in the fleet, defaults to its position
+        :param run_id: id of an already created run, skips submitting
+        :param started: the run with `run_id` is already running, skips starting
+        :returns: scheduled run
+        """
+        with self._lock:
+            run = FleetRun(key if key is not None else str(len(self.runs)), model_path, start_datetime, end_datetime,
+                           timescale, external_clock, realtime, priority, driver, run_id, started)
+            self.runs.append(run)
+        return run
+
+    def progress(self) -> FleetProgress:
+        """Get the number of runs in each stage and the completion rate
+
+        :returns: progress of fleet
+        """
+        with self._lock:
+            stages = dict.fromkeys(STAGES, 0)
+            for run in self.runs:
+                stages[run.stage] += 1
+            elapsed = monotonic() - self._started_at if self._started_at is not None else 0.0
+            return FleetProgress(len(self.runs), stages, elapsed)
+
+    def cancel(self) -> None:
+        """Stop scheduling pending runs, active runs are driven to completion"""
+        self._cancelled.set()
+
+    def run(self) -> List[FleetRun]:
+        """Drive every scheduled run through its lifecycle and wait for all of them
+
+        :returns: runs of fleet, failed runs have their `error` set
+        """
+        self._cancelled.clear()
+        self._started_at = monotonic()
+        pending = sorted((run for run in self.runs if not run.finished), key=lambda run: run.priority)
+        with ThreadPoolExecutor(self.max_active, thread_name_prefix="alfalfa-fleet") as executor:
+            wait([executor.submit(self._drive, run) for run in pending])
+        return self.runs
+
+    def _drive(self, run: FleetRun) -> None:
+        if self._cancelled.is_set():
+            self._enter(run, CANCELLED)
+            return
+        try:
+            if run.run_id is None:
+                with self._stage(run, SUBMITTING):
+                    run.run_id = self.client.submit(run.model_path, wait_for_status=False)
+                    self._notify(run)
+                    self.client.waiter.watch(run.run_id, "ready", self.stage_timeout).result()
+            if not run.started:
+                with self._stage(run, STARTING):
+                    self.client.start(run.run_id, run.start_datetime, run.end_datetime, timescale=run.timescale,
+                                      external_clock=run.external_clock, realtime=run.realtime, wait_for_status=False)
+                    run.started = True
+                    self.client.waiter.watch(run.run_id, "running", self.stage_timeout).result()
+            self._enter(run, RUNNING)
+            if run.driver is None:
+                self.client.waiter.watch(run.run_id, "complete", self.run_timeout).result()
+            else:
+                run.driver(self.client, run.run_id)
+                with self._stage(run, STOPPING):
+                    self.client.stop(run.run_id, wait_for_status=False)
+                    self.client.waiter.watch(run.run_id, "complete", self.stage_timeout).result()
+        except Exception as e:
+            run.error = e
+            self._enter(run, FAILED)
+            if run.started:
+                self._stop_quietly(run)
+        else:
+            self._enter(run, COMPLETE)
+
+    @contextmanager
+    def _stage(self, run: FleetRun, stage: str):
+        with self._limits[stage]:
+            self._enter(run, stage)
+            yield
+
+    def _enter(self, run: FleetRun, stage: str) -> None:
+        with self._lock:
+            run.stage = stage
+            run.stage_times[stage] = monotonic()
+        self._notify(run)
+
+    def _notify(self, run: FleetRun) -> None:
+        if self.on_update is not None:
+            self.on_update(run, self.progress())
+
+    def _stop_quietly(self, run: FleetRun) -> None:
+        try:
+            with self._limits[STOPPING]:
+                self.client.stop(run.run_id, wait_for_status=False)
+        except Exception:
+            pass
@@ -26,39 +26,102 @@
 # OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 # ****************************************************************************************************
 
-import concurrent.futures
 import functools
-import json
-import shutil
-import tempfile
+import os
+import threading
 from functools import partial
 from os import PathLike, path
 from pathlib import Path
-from typing import List
+from time import perf_counter
+from typing import TYPE_CHECKING, BinaryIO, List
 
-from requests import Response
+if TYPE_CHECKING:
+    from concurrent.futures import Executor
+
+    from requests import Response
+
+
+def default_pool_size() -> int:
+    """Default number of threads used for list calls
+    Matches the default worker count of `concurrent.futures.ThreadPoolExecutor`
+    so that every thread of a list call can hold its own pooled connection.
+
+    :returns: default pool size
+    """
+    return min(32, (os.cpu_count() or 1) + 4)
+
+
+_worker_state = threading.local()
+
+
+def _call_in_worker(func, *args, **kwargs):
+    _worker_state.active = True
+    try:
+        return func(*args, **kwargs)
+    finally:
+        _worker_state.active = False
+
+
+def parallel_map(executor: "Executor", func, iter_vals: List, args: List = [], kwargs: dict = {}, max_concurrency: int = None) -> List:
+    """Call a function once per item of a list using an executor
+    At most `max_concurrency` items are in flight at once. Every item is run to completion
+    even if others fail, the results are returned in the order of `iter_vals`. Calls made
+    from inside a worker thread run serially in that thread, so nested list calls cannot
+    exhaust the executor.
+
+    :param executor: executor to submit calls to
+    :param func: function to call, receives an item followed by `args` and `kwargs`
+    :param iter_vals: items to call the function with
+    :param max_concurrency: maximum number of items submitted to the executor at once
+
+    :returns: list of results
+    :raises AlfalfaBatchException: if any of the calls raised an exception
+    """
+    responses = [None] * len(iter_vals)
+    errors = {}
+
+    if getattr(_worker_state, "active", False):
+        for i, val in enumerate(iter_vals):
+            try:
+                responses[i] = func(val, *args, **kwargs)
+            except Exception as e:
+                errors[i] = e
+    else:
+        from concurrent.futures import FIRST_COMPLETED, wait
+
+        limit = max_concurrency or len(iter_vals)
+        pending = {}
+        next_index = 0
+        while next_index < len(iter_vals) or pending:
+            while next_index < len(iter_vals) and len(pending) < limit:
+                future = executor.submit(_call_in_worker, func, iter_vals[next_index], *args, **kwargs)
+                pending[future] = next_index
+                next_index += 1
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                i = pending.pop(future)
+                try:
+                    responses[i] = future.result()
+                except Exception as e:
+                    errors[i] = e
+
+    if errors:
+        raise AlfalfaBatchException(responses, errors)
+    return responses
 
 
 def parallelize(func):
     """Parallelize a function
     Decorator which, when applied to a function, will parallelize the function
     on the first non-self parameter. If a list is passed n instances of the
-    original function will be called inside Threads. The results will be returned
-    as a list with the same order as the original. If a list is not passed, the
-    original function will be called.
+    original function will be called using the executor of the instance. The
+    results will be returned as a list with the same order as the original.
+    If any of the calls fail an `AlfalfaBatchException` holding every result and
+    exception is raised once all calls have finished. If a list is not passed,
+    the original function will be called.
 
     """
 
-    def parallel_call(func, iter_vals: List, args: List = [], kwargs: dict = {}):
-        responses = [None] * len(iter_vals)
-        with concurrent.futures.ThreadPoolExecutor() as executor:
-            future_to_index = {executor.submit(func, iter_vals[i], *args, **kwargs): i for i in range(len(iter_vals))}
-            for future in concurrent.futures.as_completed(future_to_index):
-                arg = future_to_index[future]
-
-                responses[arg] = future.result()
-        return responses
-
     @functools.wraps(func)
     def parallel_wrapper(self, *args, **kwargs):
         # Find the first parameter as either an arg or kwarg
@@ -74,13 +137,43 @@ def parallelize(func):
                 raise TypeError(f"{func.__name__}() missing 1 required positional argument: '{first_varname}'")
 
         if isinstance(val, list):
-            return parallel_call(partial(func, self), val, args, kwargs)
+            return parallel_map(self.executor, partial(func, self), val, args, kwargs, max_concurrency=self.max_concurrency)
         else:
             return func(self, val, *args, **kwargs)
 
     return parallel_wrapper
 
 
+def async_parallelize(func):
+    """Parallelize a coroutine function
+    Asyncio counterpart of `parallelize`. If a list is passed as the first non-self
+    parameter, one coroutine is scheduled per item on the running event loop and the
+    results are returned as a list with the same order as the original.
+
+    """
+
+    @functools.wraps(func)
+    async def parallel_wrapper(self, *args, **kwargs):
+        if len(args) > 0:
+            val = args[0]
+            args = args[1:]
+        else:
+            first_varname = func.__code__.co_varnames[1]
+            if first_varname in kwargs.keys():
+                val = kwargs[first_varname]
+                del kwargs[first_varname]
+            else:
+                raise TypeError(f"{func.__name__}() missing 1 required positional argument: '{first_varname}'")
+
+        if isinstance(val, list):
+            import asyncio
+            return list(await asyncio.gather(*(func(self, item, *args, **kwargs) for item in val)))
+        else:
+            return await func(self, val, *args, **kwargs)
+
+    return parallel_wrapper
+
+
 def create_zip(dir: PathLike) -> str:
     """Create Zip
     Takes a directory and creates a temporary zip file of it.
@@ -89,6 +182,9 @@ def create_zip(dir: PathLike) -> str:
 
     :returns: path of zip file
     """
+    import shutil
+    import tempfile
+
     zip_file_fd, zip_file_path = tempfile.mkstemp(prefix=path.basename(dir), suffix='.zip')
     zip_file_path = Path(zip_file_path)
     shutil.make_archive(str(zip_file_path.parent / zip_file_path.stem), "zip", None, str(dir))
@@ -112,6 +208,99 @@ def prepare_model(model_path: PathLike) -> str:
         return str(model_path.absolute())
 
 
+class PackagedModel:
+    """Model ready for upload
+    Wraps the file to upload, which is closed (and deleted if temporary) by `close()`.
+    Can be passed directly as a multipart field, only the remaining bytes are reported
+    as its length so the encoder never has to look at the underlying file.
+    """
+
+    def __init__(self, filename: str, file: BinaryIO, size: int, packaging_seconds: float = 0):
+        self.filename = filename
+        self.file = file
+        self.size = size
+        self.packaging_seconds = packaging_seconds
+
+    def __len__(self) -> int:
+        return self.size - self.file.tell()
+
+    def read(self, size: int = -1) -> bytes:
+        return self.file.read(size)
+
+    def close(self) -> None:
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class UploadMetrics:
+    """Size and timing of a model upload"""
+
+    __slots__ = ("model_name", "size", "packaging_seconds", "transfer_seconds")
+
+    def __init__(self, model_name: str, size: int, packaging_seconds: float, transfer_seconds: float):
+        self.model_name = model_name
+        self.size = size
+        self.packaging_seconds = packaging_seconds
+        self.transfer_seconds = transfer_seconds
+
+    @property
+    def packaging_throughput(self) -> float:
+        """Packaging throughput in MB/s, None if the model did not need packaging"""
+        return self.size / 1e6 / self.packaging_seconds if self.packaging_seconds else None
+
+    @property
+    def transfer_throughput(self) -> float:
+        """Transfer throughput in MB/s"""
+        return self.size / 1e6 / self.transfer_seconds if self.transfer_seconds else None
+
+    def __repr__(self) -> str:
+        return (f"UploadMetrics(model_name={self.model_name!r}, size={self.size}, "
+                f"packaging_seconds={self.packaging_seconds:.3f}, transfer_seconds={self.transfer_seconds:.3f})")
+
+
+def package_model(model_path: PathLike, compresslevel: int = 6, spool_size: int = 64 * 1024 * 1024) -> PackagedModel:
+    """Package model for upload
+    Takes a file or directory. If the input is a file it is opened as is. If the input
+    is a directory it is zipped, with entries in sorted order, into a temporary buffer
+    which is held in memory up to `spool_size` bytes and spills to an anonymous temporary
+    file beyond that. Either way nothing is left behind once the package is closed.
+
+    :param model_path: path to model
+    :param compresslevel: zlib compression level of the zip, 0 stores files uncompressed
+    :param spool_size: maximum size of zip to hold in memory
+
+    :returns: packaged model
+    """
+    model_path = Path(model_path).absolute()
+    if not model_path.is_dir():
+        return PackagedModel(model_path.name, open(model_path, 'rb'), model_path.stat().st_size)
+
+    import tempfile
+    import zipfile
+
+    start = perf_counter()
+    buffer = tempfile.SpooledTemporaryFile(max_size=spool_size, suffix='.zip')
+    try:
+        compression = zipfile.ZIP_DEFLATED if compresslevel > 0 else zipfile.ZIP_STORED
+        with zipfile.ZipFile(buffer, 'w', compression=compression, compresslevel=compresslevel or None) as archive:
+            for root, dirnames, filenames in os.walk(model_path):
+                dirnames.sort()
+                for filename in sorted(filenames):
+                    file_path = Path(root) / filename
+                    archive.write(file_path, file_path.relative_to(model_path).as_posix())
+        size = buffer.tell()
+        buffer.seek(0)
+    except BaseException:
+        buffer.close()
+        raise
+    return PackagedModel(model_path.name + '.zip', buffer, size, perf_counter() - start)
+
+
 class AlfalfaException(Exception):
     """Wrapper for exceptions which come from alfalfa"""
 
@@ -123,19 +312,48 @@ class AlfalfaWorkerException(AlfalfaException):
 class AlfalfaAPIException(AlfalfaException):
     """Wrapper for API errors"""
 
-    def __init__(self, response: Response, *args: object) -> None:
+    def __init__(self, response: "Response", *args: object) -> None:
         self.response = response
-        body = response.json()
+        try:
+            body = response.json()
+        except ValueError:
+            body = None
+        if not isinstance(body, dict) or "message" not in body:
+            text = response.content.decode(errors="replace").strip()
+            super().__init__(f"HTTP {response.status_code} returned by {response.url}" + (f": {text[:1000]}" if text else ""), *args)
+            return
         super().__init__(body["message"], *args)
 
         if "payload" in body:
+            import json
             self.payload = json.dumps(body["payload"])
 
     def __str__(self) -> str:
         if hasattr(self, "payload"):
+            import json
             return super().__str__() + '\nAPI Payload: \n' + json.dumps(self.payload)
         return super().__str__()
 
 
 class AlfalfaClientException(AlfalfaException):
     """Wrapper for exceptions in client operation"""
+
+
+class AlfalfaCircuitOpenException(AlfalfaClientException):
+    """Raised without making a request while the server is considered down"""
+
+
+class AlfalfaBatchException(AlfalfaException):
+    """Raised when some calls of a list operation fail
+
+    Holds the results of the calls which succeeded and the exceptions of those which did not.
+    """
+
+    def __init__(self, results: List, errors: dict, *args: object) -> None:
+        self.results = results
+        self.errors = errors
+        super().__init__(f"{len(errors)} of {len(results)} calls failed", *args)
+
+    def __str__(self) -> str:
+        details = "\n".join(f"[{index}] {type(error).__name__}: {error}" for index, error in sorted(self.errors.items()))
+        return super().__str__() + "\n" + details
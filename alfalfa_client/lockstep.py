@@ -0,0 +1,159 @@
+# ****************************************************************************************************
+# :copyright (c) 2008-2021 URBANopt, Alliance for Sustainable Energy, LLC, and other contributors.
+
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without modification, are permitted
+# provided that the following conditions are met:
+
+# Redistributions of source code must retain the above copyright notice, this list of conditions
+# and the following disclaimer.
+
+# Redistributions in binary form must reproduce the above copyright notice, this list of conditions
+# and the following disclaimer in the documentation and/or other materials provided with the
+# distribution.
+
+# Neither the name of the copyright holder nor the names of its contributors may be used to endorse
+# or promote products derived from this software without specific prior written permission.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+# FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER
+# IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT
+# OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+# ****************************************************************************************************
+
+import threading
+from collections import deque
+from datetime import datetime
+from time import perf_counter
+from typing import TYPE_CHECKING, Dict, Iterable, List
+
+from alfalfa_client.lib import parallel_map
+
+if TYPE_CHECKING:
+    from alfalfa_client.alfalfa_client import AlfalfaClient, RunID
+
+
+class StepResult:
+    """State of a run after a lockstep step"""
+
+    __slots__ = ("run_id", "sim_time", "outputs")
+
+    def __init__(self, run_id: "RunID", sim_time: datetime, outputs: dict):
+        self.run_id = run_id
+        self.sim_time = sim_time
+        self.outputs = outputs
+
+    def __repr__(self) -> str:
+        return f"StepResult(run_id={self.run_id!r}, sim_time={self.sim_time!r}, outputs={len(self.outputs)} points)"
+
+
+class PhaseTimer:
+    """Rolling record of how long each phase of a step takes
+
+    Keeps the most recent `window` durations of every phase so percentiles reflect
+    current behavior and memory stays flat over long simulations.
+    """
+
+    PHASES = ("set_inputs", "advance", "get_sim_time", "get_outputs", "run", "step")
+
+    def __init__(self, window: int = 10000):
+        """
+        :param window: number of durations kept per phase
+        """
+        self.window = window
+        self._durations = {phase: deque(maxlen=window) for phase in self.PHASES}
+        self._lock = threading.Lock()
+
+    def record(self, phase: str, seconds: float) -> None:
+        with self._lock:
+            self._durations[phase].append(seconds)
+
+    def percentiles(self, phase: str, percentiles: Iterable[float] = (50, 90, 99)) -> Dict[str, float]:
+        """Get latency percentiles for a phase
+
+        :param phase: name of phase
+        :param percentiles: percentiles to calculate
+        :returns: dictionary of 'p<percentile>' to duration in seconds, empty if the phase has no samples
+        """
+        with self._lock:
+            samples = sorted(self._durations[phase])
+        if not samples:
+            return {}
+        result = {}
+        for percentile in percentiles:
+            index = min(len(samples) - 1, max(0, round(percentile / 100 * len(samples)) - 1))
+            result[f"p{percentile:g}"] = samples[index]
+        return result
+
+    def summary(self, percentiles: Iterable[float] = (50, 90, 99)) -> Dict[str, Dict[str, float]]:
+        """Get latency percentiles of every phase which has samples
+
+        :param percentiles: percentiles to calculate
+        :returns: dictionary of phase to percentiles
+        """
+        summary = {}
+        for phase in self.PHASES:
+            phase_percentiles = self.percentiles(phase, percentiles)
+            if phase_percentiles:
+                summary[phase] = phase_percentiles
+        return summary
+
+    def reset(self) -> None:
+        with self._lock:
+            for durations in self._durations.values():
+                durations.clear()
+
+
+class LockstepEngine:
+    """Steps many external clock runs together
+
+    Each run is driven through set_inputs, advance, get_sim_time and get_outputs on the
+    client's executor without waiting on the other runs, the only barrier is at the end
+    of the step when every run has finished.
+    """
+
+    def __init__(self, client: "AlfalfaClient", window: int = 10000):
+        """
+        :param client: client to make requests with
+        :param window: number of durations kept per phase for latency percentiles
+        """
+        self.client = client
+        self.timer = PhaseTimer(window)
+
+    def _timed(self, phase: str, func, *args):
+        start = perf_counter()
+        try:
+            return func(*args)
+        finally:
+            self.timer.record(phase, perf_counter() - start)
+
+    def _step_run(self, run_id: "RunID", inputs_by_run: Dict["RunID", dict]) -> StepResult:
+        start = perf_counter()
+        inputs = inputs_by_run.get(run_id)
+        if inputs:
+            self._timed("set_inputs", self.client.set_inputs, run_id, inputs)
+        self._timed("advance", self.client.advance, run_id)
+        sim_time = self._timed("get_sim_time", self.client.get_sim_time, run_id)
+        outputs = self._timed("get_outputs", self.client.get_outputs, run_id)
+        self.timer.record("run", perf_counter() - start)
+        return StepResult(run_id, sim_time, outputs)
+
+    def step(self, run_ids: List["RunID"], inputs_by_run: Dict["RunID", dict] = None) -> Dict["RunID", StepResult]:
+        """Advance every run by one timestep
+
+        :param run_ids: ids of runs to step
+        :param inputs_by_run: dictionary of run id to dictionary of point names and input values
+                              to write before advancing
+        :returns: dictionary of run id to state of the run after advancing
+        :raises AlfalfaBatchException: if stepping any of the runs failed, once all runs have finished
+        """
+        start = perf_counter()
+        results = parallel_map(self.client.executor, self._step_run, list(run_ids), [inputs_by_run or {}],
+                               max_concurrency=self.client.max_concurrency)
+        self.timer.record("step", perf_counter() - start)
+        return {result.run_id: result for result in results}
@@ -0,0 +1,249 @@
+# ****************************************************************************************************
+# :copyright (c) 2008-2021 URBANopt, Alliance for Sustainable Energy, LLC, and other contributors.
+
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without modification, are permitted
+# provided that the following conditions are met:
+
+# Redistributions of source code must retain the above copyright notice, this list of conditions
+# and the following disclaimer.
+
+# Redistributions in binary form must reproduce the above copyright notice, this list of conditions
+# and the following disclaimer in the documentation and/or other materials provided with the
+# distribution.
+
+# Neither the name of the copyright holder nor the names of its contributors may be used to endorse
+# or promote products derived from this software without specific prior written permission.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+# FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER
+# IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT
+# OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+# ****************************************************************************************************
+
+import threading
+from bisect import bisect_left
+from typing import Dict, Optional, Sequence
+
+
+def endpoint_template(endpoint: str) -> str:
+    """Replace the ids in an endpoint with placeholders so requests can be grouped
+
+    :param endpoint: endpoint relative to the api url, e.g. "runs/abc/advance"
+    :returns: endpoint template, e.g. "runs/{id}/advance"
+    """
+    parts = endpoint.split("/")
+    if parts[0] == "runs" and len(parts) > 1:
+        parts[1] = "{id}"
+    elif parts[0] == "aliases" and len(parts) > 1:
+        parts[1] = "{alias}"
+    elif parts[0] == "models" and len(parts) > 2:
+        parts[1] = "{id}"
+    return "/".join(parts)
+
+
+def body_size(body) -> int:
+    """Size of a request body
+
+    :param body: body of a prepared request
+    :returns: number of bytes in body, 0 if unknown
+    """
+    if body is None:
+        return 0
+    if isinstance(body, (bytes, str)):
+        return len(body)
+    return getattr(body, "len", 0)
+
+
+class RequestRecord:
+    """Outcome of a single HTTP request made by the client"""
+
+    __slots__ = ("endpoint", "method", "status_code", "seconds", "request_bytes", "response_bytes", "error", "attempt")
+
+    def __init__(self, endpoint: str, method: str, status_code: Optional[int], seconds: float,
+                 request_bytes: int = 0, response_bytes: int = 0, error: BaseException = None, attempt: int = 1):
+        self.endpoint = endpoint
+        self.method = method
+        self.status_code = status_code
+        self.seconds = seconds
+        self.request_bytes = request_bytes
+        self.response_bytes = response_bytes
+        self.error = error
+        self.attempt = attempt
+
+    @property
+    def failed(self) -> bool:
+        return self.error is not None or self.status_code is None or self.status_code >= 400
+
+
+class RequestHook:
+    """Base class for observers of the requests made by a client
+
+    Register with `AlfalfaClient.add_request_hook`. Hooks are called from whichever
+    thread made the request and must be thread safe.
+    """
+
+    def request_started(self, endpoint: str, method: str) -> None:
+        """Called before a request is sent
+
+        :param endpoint: endpoint template of request
+        :param method: HTTP method of request
+        """
+
+    def request_finished(self, record: RequestRecord) -> None:
+        """Called once a request has completed or failed
+
+        :param record: outcome of request, with endpoint as a template
+        """
+
+
+class _EndpointStats:
+    __slots__ = ("requests", "errors", "retries", "in_flight", "request_bytes", "response_bytes", "seconds", "buckets")
+
+    def __init__(self, num_buckets: int):
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.in_flight = 0
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.seconds = 0.0
+        self.buckets = [0] * (num_buckets + 1)
+
+
+class RequestMetrics(RequestHook):
+    """Aggregates request counts, bytes, errors, retries and latency histograms per endpoint"""
+
+    DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        """
+        :param buckets: upper bounds in seconds of the latency histogram buckets
+        """
+        self.buckets = tuple(sorted(buckets))
+        self._endpoints: Dict[tuple, _EndpointStats] = {}
+        self._lock = threading.Lock()
+
+    def _stats(self, endpoint: str, method: str) -> _EndpointStats:
+        stats = self._endpoints.get((method, endpoint))
+        if stats is None:
+            stats = self._endpoints[(method, endpoint)] = _EndpointStats(len(self.buckets))
+        return stats
+
+    def request_started(self, endpoint: str, method: str) -> None:
+        with self._lock:
+            self._stats(endpoint, method).in_flight += 1
+
+    def request_finished(self, record: RequestRecord) -> None:
+        with self._lock:
+            stats = self._stats(record.endpoint, record.method)
+            stats.in_flight -= 1
+            stats.requests += 1
+            stats.errors += record.failed
+            stats.retries += record.attempt > 1
+            stats.request_bytes += record.request_bytes
+            stats.response_bytes += record.response_bytes
+            stats.seconds += record.seconds
+            stats.buckets[bisect_left(self.buckets, record.seconds)] += 1
+
+    def snapshot(self) -> Dict[str, dict]:
+        """Get a copy of the current metrics
+
+        :returns: dictionary of "<METHOD> <endpoint template>" to its counters and latency
+                  histogram, where histogram maps bucket upper bounds to cumulative counts
+        """
+        with self._lock:
+            snapshot = {}
+            for (method, endpoint), stats in sorted(self._endpoints.items()):
+                cumulative = 0
+                histogram = {}
+                for bound, count in zip(self.buckets + (float("inf"),), stats.buckets):
+                    cumulative += count
+                    histogram[bound] = cumulative
+                snapshot[f"{method} {endpoint}"] = {
+                    "requests": stats.requests,
+                    "errors": stats.errors,
+                    "retries": stats.retries,
+                    "in_flight": stats.in_flight,
+                    "request_bytes": stats.request_bytes,
+                    "response_bytes": stats.response_bytes,
+                    "seconds": stats.seconds,
+                    "histogram": histogram,
+                }
+            return snapshot
+
+    def reset(self) -> None:
+        with self._lock:
+            self._endpoints.clear()
+
+    def to_prometheus(self, prefix: str = "alfalfa_client") -> str:
+        """Render the metrics in the Prometheus text exposition format
+
+        :param prefix: prefix of metric names
+        :returns: metrics text
+        """
+        lines = [
+            f"# TYPE {prefix}_requests_total counter",
+            f"# TYPE {prefix}_request_errors_total counter",
+            f"# TYPE {prefix}_request_retries_total counter",
+            f"# TYPE {prefix}_requests_in_flight gauge",
+            f"# TYPE {prefix}_request_bytes_total counter",
+            f"# TYPE {prefix}_response_bytes_total counter",
+            f"# TYPE {prefix}_request_duration_seconds histogram",
+        ]
+        for key, stats in self.snapshot().items():
+            method, endpoint = key.split(" ", 1)
+            labels = f'method="{method}",endpoint="{endpoint}"'
+            lines.append(f"{prefix}_requests_total{{{labels}}} {stats['requests']}")
+            lines.append(f"{prefix}_request_errors_total{{{labels}}} {stats['errors']}")
+            lines.append(f"{prefix}_request_retries_total{{{labels}}} {stats['retries']}")
+            lines.append(f"{prefix}_requests_in_flight{{{labels}}} {stats['in_flight']}")
+            lines.append(f"{prefix}_request_bytes_total{{{labels}}} {stats['request_bytes']}")
+            lines.append(f"{prefix}_response_bytes_total{{{labels}}} {stats['response_bytes']}")
+            for bound, count in stats["histogram"].items():
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                lines.append(f'{prefix}_request_duration_seconds_bucket{{{labels},le="{le}"}} {count}')
+            lines.append(f"{prefix}_request_duration_seconds_sum{{{labels}}} {stats['seconds']}")
+            lines.append(f"{prefix}_request_duration_seconds_count{{{labels}}} {stats['requests']}")
+        return "\n".join(lines) + "\n"
+
+
+class OpenTelemetryHook(RequestHook):
+    """Reports requests to OpenTelemetry metrics
+
+    Requires the `opentelemetry-api` package.
+    """
+
+    def __init__(self, meter=None):
+        """
+        :param meter: meter to create instruments with, defaults to one named "alfalfa_client"
+        """
+        if meter is None:
+            from opentelemetry import metrics
+            meter = metrics.get_meter("alfalfa_client")
+        self._duration = meter.create_histogram("alfalfa_client.request.duration", unit="s")
+        self._requests = meter.create_counter("alfalfa_client.requests")
+        self._errors = meter.create_counter("alfalfa_client.request.errors")
+        self._retries = meter.create_counter("alfalfa_client.request.retries")
+        self._bytes = meter.create_counter("alfalfa_client.request.bytes", unit="By")
+        self._in_flight = meter.create_up_down_counter("alfalfa_client.requests.in_flight")
+
+    def request_started(self, endpoint: str, method: str) -> None:
+        self._in_flight.add(1, {"endpoint": endpoint, "method": method})
+
+    def request_finished(self, record: RequestRecord) -> None:
+        attributes = {"endpoint": record.endpoint, "method": record.method}
+        self._in_flight.add(-1, attributes)
+        self._requests.add(1, attributes)
+        self._duration.record(record.seconds, attributes)
+        self._bytes.add(record.request_bytes, dict(attributes, direction="sent"))
+        self._bytes.add(record.response_bytes, dict(attributes, direction="received"))
+        if record.failed:
+            self._errors.add(1, attributes)
+        if record.attempt > 1:
+            self._retries.add(1, attributes)
@@ -0,0 +1,248 @@
+# ****************************************************************************************************
+# :copyright (c) 2008-2021 URBANopt, Alliance for Sustainable Energy, LLC, and other contributors.
+
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without modification, are permitted
+# provided that the following conditions are met:
+
+# Redistributions of source code must retain the above copyright notice, this list of conditions
+# and the following disclaimer.
+
+# Redistributions in binary form must reproduce the above copyright notice, this list of conditions
+# and the following disclaimer in the documentation and/or other materials provided with the
+# distribution.
+
+# Neither the name of the copyright holder nor the names of its contributors may be used to endorse
+# or promote products derived from this software without specific prior written permission.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+# FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER
+# IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT
+# OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+# ****************************************************************************************************
+
+import os
+import threading
+from contextlib import contextmanager
+from os import PathLike
+from pathlib import Path
+from time import time
+from typing import Dict, Optional
+
+
+def default_cache_path() -> Path:
+    """Default location of the model cache index
+
+    :returns: path inside the user's cache directory
+    """
+    cache_home = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(cache_home) / "alfalfa_client" / "models.json"
+
+
+def hash_model(model_path: PathLike, chunk_size: int = 1024 * 1024) -> str:
+    """Hash the content of a model
+    Takes a file or directory. Directories are hashed over the relative path and content
+    of every file in sorted order, so the hash only changes when the model does.
+
+    :param model_path: path to model
+    :param chunk_size: number of bytes to read at a time
+
+    :returns: hex digest of model content
+    """
+    model_path = Path(model_path)
+    import hashlib
+
+    digest = hashlib.sha256()
+    if model_path.is_dir():
+        files = []
+        for root, dirnames, filenames in os.walk(model_path):
+            dirnames.sort()
+            files.extend(Path(root) / filename for filename in sorted(filenames))
+    else:
+        files = [model_path]
+
+    for file_path in files:
+        if file_path != model_path:
+            relative_path = file_path.relative_to(model_path).as_posix().encode()
+            digest.update(len(relative_path).to_bytes(8, "big") + relative_path)
+        digest.update(file_path.stat().st_size.to_bytes(8, "big"))
+        with open(file_path, "rb") as file:
+            for chunk in iter(lambda: file.read(chunk_size), b""):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+@contextmanager
+def _locked_file(path: Path):
+    """Hold an exclusive lock on a file, shared between processes"""
+    try:
+        import fcntl
+    except ImportError:
+        fcntl = None
+        import msvcrt
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a+b") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        else:
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class ModelCache:
+    """Index of uploaded models by content hash, stored on disk
+
+    Lets repeated submissions of the same model skip the upload and create runs from the
+    model already on the server. Entries are per host and the least recently used are
+    dropped once there are more than `max_entries`. Changes are merged with the entries
+    other instances and processes wrote to the same file, under a file lock.
+    """
+
+    def __init__(self, path: PathLike = None, max_entries: int = 1000):
+        """
+        :param path: path of index file, defaults to `default_cache_path()`
+        :param max_entries: maximum number of models to remember
+        """
+        self.path = Path(path) if path is not None else default_cache_path()
+        self.max_entries = max_entries
+
+        self._lock = threading.Lock()
+        self._key_locks: Dict[str, threading.Lock] = {}
+        self._entries = self._load()
+
+    def _load(self) -> Dict[str, dict]:
+        import json
+
+        try:
+            with open(self.path) as index_file:
+                entries = json.load(index_file)
+            return entries if isinstance(entries, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self, changes: Dict[str, Optional[dict]], clear: bool = False) -> None:
+        """Write changed entries to the index, merged with the entries on disk
+
+        :param changes: entries to set by key, None to remove an entry
+        :param clear: drop every entry on disk before applying the changes
+        """
+        import json
+        import tempfile
+
+        with _locked_file(self.path.with_name(self.path.name + ".lock")):
+            entries = {} if clear else self._load()
+            for key, entry in self._entries.items():
+                stored = entries.get(key)
+                if stored is not None and stored["model_id"] == entry["model_id"]:
+                    stored["used"] = max(stored["used"], entry["used"])
+            for key, entry in changes.items():
+                if entry is None:
+                    entries.pop(key, None)
+                else:
+                    entries[key] = entry
+            if len(entries) > self.max_entries:
+                by_use = sorted(entries, key=lambda key: entries[key]["used"])
+                for key in by_use[:len(entries) - self.max_entries]:
+                    del entries[key]
+
+            fd, tmp_path = tempfile.mkstemp(dir=self.path.parent, prefix=self.path.name, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w") as index_file:
+                    json.dump(entries, index_file)
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+        self._entries = entries
+
+    @staticmethod
+    def _key(host: str, digest: str) -> str:
+        return f"{host.rstrip('/')} {digest}"
+
+    def lock(self, host: str, digest: str) -> threading.Lock:
+        """Get a lock for a model, held while it is being uploaded so concurrent
+        submissions of the same model upload it once
+
+        :param host: url of alfalfa host
+        :param digest: content hash of model
+        :returns: lock for model
+        """
+        with self._lock:
+            return self._key_locks.setdefault(self._key(host, digest), threading.Lock())
+
+    def get(self, host: str, digest: str) -> Optional[str]:
+        """Get the id of a previously uploaded model
+
+        :param host: url of alfalfa host
+        :param digest: content hash of model
+        :returns: id of model or None if it has not been uploaded
+        """
+        key = self._key(host, digest)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._load().get(key)
+                if entry is None:
+                    return None
+                self._entries[key] = entry
+            entry["used"] = time()
+            return entry["model_id"]
+
+    def put(self, host: str, digest: str, model_id: str) -> None:
+        """Remember an uploaded model
+
+        :param host: url of alfalfa host
+        :param digest: content hash of model
+        :param model_id: id of uploaded model
+        """
+        with self._lock:
+            self._save({self._key(host, digest): {"model_id": model_id, "used": time()}})
+
+    def discard(self, host: str, digest: str) -> None:
+        """Forget a model, e.g. once the server no longer has it
+
+        :param host: url of alfalfa host
+        :param digest: content hash of model
+        """
+        with self._lock:
+            self._save({self._key(host, digest): None})
+
+    def clear(self) -> None:
+        """Forget all models"""
+        with self._lock:
+            self._save({}, clear=True)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+_shared_caches: Dict[Path, ModelCache] = {}
+_shared_caches_lock = threading.Lock()
+
+
+def shared_model_cache(path: PathLike = None) -> ModelCache:
+    """Get the model cache of an index file, shared by every client in the process
+
+    :param path: path of index file, defaults to `default_cache_path()`
+    :returns: model cache
+    """
+    path = Path(path) if path is not None else default_cache_path()
+    key = path.resolve()
+    with _shared_caches_lock:
+        cache = _shared_caches.get(key)
+        if cache is None:
+            cache = _shared_caches[key] = ModelCache(path)
+        return cache
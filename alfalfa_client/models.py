@@ -0,0 +1,172 @@
+# ****************************************************************************************************
+# :copyright (c) 2008-2021 URBANopt, Alliance for Sustainable Energy, LLC, and other contributors.
+
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without modification, are permitted
+# provided that the following conditions are met:
+
+# Redistributions of source code must retain the above copyright notice, this list of conditions
+# and the following disclaimer.
+
+# Redistributions in binary form must reproduce the above copyright notice, this list of conditions
+# and the following disclaimer in the documentation and/or other materials provided with the
+# distribution.
+
+# Neither the name of the copyright holder nor the names of its contributors may be used to endorse
+# or promote products derived from this software without specific prior written permission.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+# FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER
+# IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT
+# OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+# ****************************************************************************************************
+
+import sys
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+INPUT_TYPES = ("INPUT", "BIDIRECTIONAL")
+OUTPUT_TYPES = ("OUTPUT", "BIDIRECTIONAL")
+
+
+class Point:
+    """A point of a run
+
+    Fields other than id, name and type returned by the server (units, tags, ...) are
+    kept in `metadata`, which is None for points without any.
+    """
+
+    __slots__ = ("id", "name", "type", "metadata")
+
+    def __init__(self, id: str, name: str, type: str, metadata: Dict[str, Any] = None):
+        self.id = id
+        self.name = name
+        self.type = type
+        self.metadata = metadata
+
+    @classmethod
+    def from_dict(cls, point: dict) -> "Point":
+        """Create a point from an entry of the `runs/{id}/points` payload
+
+        :param point: point dictionary
+        :returns: point
+        """
+        metadata = {key: value for key, value in point.items() if key not in ("id", "name", "type")}
+        return cls(point["id"], point["name"], sys.intern(point.get("type", "")), metadata or None)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Get a metadata field of the point
+
+        :param key: name of field
+        :param default: value to return if the point does not have the field
+        :returns: value of field
+        """
+        if self.metadata is None:
+            return default
+        return self.metadata.get(key, default)
+
+    def to_dict(self) -> dict:
+        """Convert the point back to the dictionary returned by the server
+
+        :returns: point dictionary
+        """
+        return {"id": self.id, "name": self.name, "type": self.type, **(self.metadata or {})}
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, Point):
+            return NotImplemented
+        return (self.id, self.name, self.type, self.metadata) == (other.id, other.name, other.type, other.metadata)
+
+    def __hash__(self) -> int:
+        return hash(self.id)
+
+    def __repr__(self) -> str:
+        return f"Point(id={self.id!r}, name={self.name!r}, type={self.type!r})"
+
+
+class Run:
+    """The points of a run, indexed by name, id and type
+
+    Built once from a single fetch of `runs/{id}/points`. Points are held in one tuple
+    and the indexes map to positions in it.
+    """
+
+    __slots__ = ("id", "points", "_by_name", "_by_id", "_by_type")
+
+    def __init__(self, id: str, points: Iterable[Point]):
+        """
+        :param id: id of run
+        :param points: points of run
+        """
+        self.id = id
+        self.points: Tuple[Point, ...] = tuple(points)
+        self._by_name: Dict[str, int] = {}
+        self._by_id: Dict[str, int] = {}
+        self._by_type: Dict[str, List[int]] = {}
+        for position, point in enumerate(self.points):
+            self._by_name.setdefault(point.name, position)
+            self._by_id[point.id] = position
+            self._by_type.setdefault(point.type, []).append(position)
+
+    @classmethod
+    def from_payload(cls, run_id: str, points: List[dict]) -> "Run":
+        """Create a run from the `runs/{id}/points` payload
+
+        :param run_id: id of run
+        :param points: list of point dictionaries
+        :returns: run
+        """
+        return cls(run_id, map(Point.from_dict, points))
+
+    def point(self, name: str) -> Optional[Point]:
+        """Get a point by name
+
+        :param name: name of point
+        :returns: point or None if the run has no point with that name
+        """
+        position = self._by_name.get(name)
+        return self.points[position] if position is not None else None
+
+    def point_by_id(self, id: str) -> Optional[Point]:
+        """Get a point by id
+
+        :param id: id of point
+        :returns: point or None if the run has no point with that id
+        """
+        position = self._by_id.get(id)
+        return self.points[position] if position is not None else None
+
+    def of_type(self, *point_types: str) -> Tuple[Point, ...]:
+        """Get the points of some types in the order returned by the server
+
+        :param point_types: point types, e.g. "INPUT", "OUTPUT" or "BIDIRECTIONAL"
+        :returns: points of those types
+        """
+        positions = sorted(position for point_type in set(point_types) for position in self._by_type.get(point_type, ()))
+        return tuple(self.points[position] for position in positions)
+
+    @property
+    def inputs(self) -> Tuple[Point, ...]:
+        """Points which can be written"""
+        return self.of_type(*INPUT_TYPES)
+
+    @property
+    def outputs(self) -> Tuple[Point, ...]:
+        """Points which can be read as outputs"""
+        return self.of_type(*OUTPUT_TYPES)
+
+    def __len__(self) -> int:
+        return len(self.points)
+
+    def __iter__(self) -> Iterator[Point]:
+        return iter(self.points)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._by_name
+
+    def __repr__(self) -> str:
+        return f"Run(id={self.id!r}, points={len(self.points)})"
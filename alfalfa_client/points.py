@@ -0,0 +1,280 @@
+# ****************************************************************************************************
+# :copyright (c) 2008-2021 URBANopt, Alliance for Sustainable Energy, LLC, and other contributors.
+
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without modification, are permitted
+# provided that the following conditions are met:
+
+# Redistributions of source code must retain the above copyright notice, this list of conditions
+# and the following disclaimer.
+
+# Redistributions in binary form must reproduce the above copyright notice, this list of conditions
+# and the following disclaimer in the documentation and/or other materials provided with the
+# distribution.
+
+# Neither the name of the copyright holder nor the names of its contributors may be used to endorse
+# or promote products derived from this software without specific prior written permission.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+# FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER
+# IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT
+# OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+# ****************************************************************************************************
+
+import threading
+from collections import OrderedDict
+from time import monotonic
+from typing import (
+    TYPE_CHECKING,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    Tuple
+)
+
+from alfalfa_client.lib import AlfalfaClientException
+from alfalfa_client.models import Point, Run
+
+if TYPE_CHECKING:
+    from alfalfa_client.alfalfa_client import AlfalfaClient
+
+
+class PointIndex:
+    """Points of one run with the time they were fetched
+
+    Also holds the last values written to and read from the run by name, used by
+    clients which only send changed inputs. These survive refetches of the index.
+    """
+
+    __slots__ = ("run_id", "run", "fetched_at", "missing", "written", "read")
+
+    def __init__(self, run_id: str, points: List[dict]):
+        self.run_id = run_id
+        self.run = Run.from_payload(run_id, points)
+        self.fetched_at = monotonic()
+        self.missing: Dict[str, float] = {}
+        self.written: dict = {}
+        self.read: dict = {}
+
+
+class PointCache:
+    """Cache of point indexes for the most recently used runs
+
+    Indexes are fetched in bulk, one request per run, and evicted once more than
+    `max_runs` runs are cached or they are older than `ttl`. Names or ids which are
+    not found after a refetch are remembered for `negative_ttl` seconds so repeated
+    lookups of unknown points do not refetch the whole list every time.
+    """
+
+    def __init__(self, fetch: Callable[[str], List[dict]], max_runs: int = 256, ttl: float = None, negative_ttl: float = 5):
+        """
+        :param fetch: function returning the list of points of a run
+        :param max_runs: maximum number of runs to hold indexes for
+        :param ttl: seconds before an index is refetched, never if None
+        :param negative_ttl: seconds an unknown name or id is remembered for
+        """
+        self.fetch = fetch
+        self.max_runs = max_runs
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+
+        self._indexes: "OrderedDict[str, PointIndex]" = OrderedDict()
+        self._fetch_locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "negative_hits": 0, "fetches": 0, "evictions": 0}
+
+    def get_id(self, run_id: str, name: str) -> Optional[str]:
+        """Get the id of a point from its name
+
+        :param run_id: id of run
+        :param name: name of point
+        :returns: id of point or None if the run has no point with that name
+        """
+        point = self._lookup(run_id, name, "point")
+        return point.id if point is not None else None
+
+    def get_name(self, run_id: str, id: str) -> Optional[str]:
+        """Get the name of a point from its id
+
+        :param run_id: id of run
+        :param id: id of point
+        :returns: name of point or None if the run has no point with that id
+        """
+        point = self._lookup(run_id, id, "point_by_id")
+        return point.name if point is not None else None
+
+    def get_point(self, run_id: str, name: str) -> Optional[Point]:
+        """Get a point with its metadata from its name
+
+        :param run_id: id of run
+        :param name: name of point
+        :returns: point or None if the run has no point with that name
+        """
+        return self._lookup(run_id, name, "point")
+
+    def run(self, run_id: str) -> Run:
+        """Get all points of a run, fetching them if they are not cached
+
+        :param run_id: id of run
+        :returns: points of run
+        """
+        return self.index(run_id).run
+
+    def index(self, run_id: str) -> PointIndex:
+        """Get the point index of a run, fetching it if it is not cached
+
+        :param run_id: id of run
+        :returns: point index of run
+        """
+        return self._get_index(run_id)[0]
+
+    def invalidate(self, run_id: str = None) -> None:
+        """Drop cached points
+
+        :param run_id: id of run to drop points of, all runs if None
+        """
+        with self._lock:
+            if run_id is None:
+                self._indexes.clear()
+                self._fetch_locks.clear()
+            else:
+                self._indexes.pop(run_id, None)
+                self._fetch_locks.pop(run_id, None)
+
+    def stats(self) -> Dict[str, int]:
+        """Get cache counters
+
+        :returns: dictionary of hits, misses, negative_hits, fetches, evictions and the current number of runs
+        """
+        with self._lock:
+            return dict(self._stats, runs=len(self._indexes))
+
+    def _lookup(self, run_id: str, key: str, method: str) -> Optional[Point]:
+        index, fetched = self._get_index(run_id)
+        value = getattr(index.run, method)(key)
+        if value is not None:
+            self._count("hits" if not fetched else "misses")
+            return value
+
+        missing_since = index.missing.get(key)
+        if missing_since is not None and monotonic() - missing_since < self.negative_ttl:
+            self._count("negative_hits")
+            return None
+
+        self._count("misses")
+        if not fetched:
+            index, _ = self._get_index(run_id, refresh=True)
+            value = getattr(index.run, method)(key)
+            if value is not None:
+                return value
+        index.missing[key] = monotonic()
+        return None
+
+    def _count(self, counter: str) -> None:
+        with self._lock:
+            self._stats[counter] += 1
+
+    def _get_index(self, run_id: str, refresh: bool = False):
+        with self._lock:
+            index = self._indexes.get(run_id)
+            if index is not None and not refresh and not self._expired(index):
+                self._indexes.move_to_end(run_id)
+                return index, False
+            fetch_lock = self._fetch_locks.setdefault(run_id, threading.Lock())
+
+        with fetch_lock:
+            with self._lock:
+                current = self._indexes.get(run_id)
+                if current is not None and current is not index and not self._expired(current):
+                    return current, True
+            points = self.fetch(run_id)
+            previous = index
+            index = PointIndex(run_id, points)
+            if previous is not None:
+                index.written, index.read = previous.written, previous.read
+            with self._lock:
+                self._stats["fetches"] += 1
+                self._indexes[run_id] = index
+                self._indexes.move_to_end(run_id)
+                while len(self._indexes) > self.max_runs:
+                    evicted, _ = self._indexes.popitem(last=False)
+                    self._fetch_locks.pop(evicted, None)
+                    self._stats["evictions"] += 1
+            return index, True
+
+    def _expired(self, index: PointIndex) -> bool:
+        return self.ttl is not None and monotonic() - index.fetched_at >= self.ttl
+
+
+def values_equal(a, b, tolerance: float = 0) -> bool:
+    """Compare point values, numbers are equal if they are within `tolerance` of each other
+
+    :param a: first value
+    :param b: second value
+    :param tolerance: maximum absolute difference between equal numbers
+    :returns: True if the values are equal
+    """
+    if isinstance(a, (int, float)) and isinstance(b, (int, float)) and not isinstance(a, bool) and not isinstance(b, bool):
+        return abs(a - b) <= tolerance
+    return a == b
+
+
+class PointHandle:
+    """Fixed set of input and output points of a run resolved to ids
+
+    Values are written and read as sequences in the order of the names the handle was
+    compiled with, so no names are translated on each call.
+    """
+
+    __slots__ = ("client", "run_id", "input_names", "output_names", "input_ids", "output_ids", "_values_endpoint")
+
+    def __init__(self, client: "AlfalfaClient", run_id: str, input_names: Sequence[str] = (), output_names: Sequence[str] = ()):
+        """
+        :param client: client to make requests with
+        :param run_id: id of run
+        :param input_names: names of points written by `write`
+        :param output_names: names of points read by `read`
+        """
+        self.client = client
+        self.run_id = run_id
+        self.input_names = tuple(input_names)
+        self.output_names = tuple(output_names)
+        self.input_ids = tuple(self._resolve(name) for name in self.input_names)
+        self.output_ids = tuple(self._resolve(name) for name in self.output_names)
+        self._values_endpoint = f"runs/{run_id}/points/values"
+
+    def _resolve(self, name: str) -> str:
+        id = self.client.points.get_id(self.run_id, name)
+        if id is None:
+            raise AlfalfaClientException(f"No Point exists with name {name}")
+        return id
+
+    def write(self, values: Sequence[float]) -> None:
+        """Write values to the input points
+
+        :param values: values in the order of the input names of the handle
+        """
+        if len(values) != len(self.input_ids):
+            raise AlfalfaClientException(f"Expected {len(self.input_ids)} input values, got {len(values)}")
+        self.client._request(self._values_endpoint, method="PUT", parameters={"points": dict(zip(self.input_ids, values))})
+
+    def read(self, as_numpy: bool = False) -> Tuple[float, ...]:
+        """Read values of the output points
+
+        :param as_numpy: return a numpy array instead of a tuple
+        :returns: values in the order of the output names of the handle, None (or nan) for points without a value
+        """
+        response = self.client._request(self._values_endpoint, method="POST",
+                                        parameters={"pointTypes": ["OUTPUT", "BIDIRECTIONAL"]})
+        values = tuple(map(self.client.codec.decode_values(response.content).get, self.output_ids))
+        if as_numpy:
+            import numpy as np
+            return np.array(values, dtype=float)
+        return values
@@ -0,0 +1,160 @@
+# ****************************************************************************************************
+# :copyright (c) 2008-2021 URBANopt, Alliance for Sustainable Energy, LLC, and other contributors.
+
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without modification, are permitted
+# provided that the following conditions are met:
+
+# Redistributions of source code must retain the above copyright notice, this list of conditions
+# and the following disclaimer.
+
+# Redistributions in binary form must reproduce the above copyright notice, this list of conditions
+# and the following disclaimer in the documentation and/or other materials provided with the
+# distribution.
+
+# Neither the name of the copyright holder nor the names of its contributors may be used to endorse
+# or promote products derived from this software without specific prior written permission.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+# FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER
+# IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT
+# OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+# ****************************************************************************************************
+
+import os
+from datetime import datetime
+from os import PathLike
+from typing import TYPE_CHECKING, List, Sequence
+
+import numpy as np
+
+from alfalfa_client.lib import AlfalfaClientException
+
+if TYPE_CHECKING:
+    from alfalfa_client.alfalfa_client import AlfalfaClient, RunID
+
+
+class OutputRecorder:
+    """Records the outputs of a run into a preallocated columnar buffer
+
+    Each row holds the sim time and the value of every recorded point. The buffer
+    grows by doubling and is either held in memory or memory-mapped from `path`, in
+    which case the rows are spilled to disk by the operating system as they are written.
+    `times`, `values` and `to_dataframe()` are views on the buffer, nothing is copied.
+    """
+
+    def __init__(self, client: "AlfalfaClient", run_id: "RunID", points: Sequence[str] = None,
+                 capacity: int = 1440, path: PathLike = None):
+        """
+        :param client: client to make requests with
+        :param run_id: id of run to record
+        :param points: names of output points to record, defaults to all outputs of the run
+        :param capacity: number of rows to allocate up front
+        :param path: file to memory-map the buffer from, held in memory if None
+        """
+        self.client = client
+        self.run_id = run_id
+        self.points = list(points) if points is not None else list(client.get_outputs(run_id))
+        self.path = path
+        self.dtype = np.dtype([("time", "datetime64[s]"), ("values", np.float64, (len(self.points),))])
+
+        self._handle = None
+        self._closed = False
+        self._length = 0
+        self._buffer = self._allocate(max(1, capacity))
+
+    def __len__(self) -> int:
+        return self._length
+
+    def _allocate(self, capacity: int) -> np.ndarray:
+        if self.path is None:
+            buffer = np.empty(capacity, dtype=self.dtype)
+            if self._length:
+                buffer[:self._length] = self._buffer[:self._length]
+            return buffer
+
+        if self._length:
+            self._buffer.flush()
+        mode = "r+" if self._length else "w+"
+        with open(self.path, "ab" if self._length else "wb") as buffer_file:
+            buffer_file.truncate(capacity * self.dtype.itemsize)
+        return np.memmap(self.path, dtype=self.dtype, mode=mode, shape=(capacity,))
+
+    def append(self, sim_time: datetime, outputs: dict) -> None:
+        """Append a row
+
+        :param sim_time: sim time of the outputs
+        :param outputs: dictionary of output names and values, missing points are recorded as nan
+        """
+        self._append(sim_time, [outputs.get(name, np.nan) for name in self.points])
+
+    def _append(self, sim_time: datetime, values: Sequence[float]) -> None:
+        if self._closed:
+            raise AlfalfaClientException(f"Recorder of run {self.run_id} is closed")
+        if self._length == len(self._buffer):
+            self._buffer = self._allocate(2 * len(self._buffer))
+        row = self._buffer[self._length]
+        row["time"] = sim_time
+        row["values"] = [np.nan if value is None else value for value in values]
+        self._length += 1
+
+    def record(self) -> datetime:
+        """Read the sim time and outputs of the run and append them
+
+        :returns: sim time of the recorded row
+        """
+        if self._handle is None:
+            self._handle = self.client.compile_points(self.run_id, outputs=self.points)
+        sim_time = self.client.get_sim_time(self.run_id)
+        self._append(sim_time, self._handle.read())
+        return sim_time
+
+    @property
+    def times(self) -> np.ndarray:
+        """View of recorded sim times"""
+        return self._buffer["time"][:self._length]
+
+    @property
+    def values(self) -> np.ndarray:
+        """View of recorded values, with one row per sim time and one column per point"""
+        return self._buffer["values"][:self._length]
+
+    def to_dataframe(self):
+        """Get the recorded outputs as a pandas DataFrame backed by the buffer
+
+        :returns: dataframe indexed by sim time with one column per point
+        """
+        import pandas as pd
+        return pd.DataFrame(self.values, index=pd.DatetimeIndex(self.times, name="time"), columns=self.points, copy=False)
+
+    def flush(self) -> None:
+        """Write recorded rows of a memory-mapped buffer to disk"""
+        if isinstance(self._buffer, np.memmap):
+            self._buffer.flush()
+
+    def close(self) -> None:
+        """Flush the buffer and trim a memory-mapped file to the recorded rows, no rows can be appended after"""
+        self._closed = True
+        if isinstance(self._buffer, np.memmap):
+            self._buffer.flush()
+            self._buffer = np.empty(0, dtype=self.dtype)
+            os.truncate(self.path, self._length * self.dtype.itemsize)
+            self._buffer = self.load(self.path, self.points)
+
+    @classmethod
+    def load(cls, path: PathLike, points: List[str]) -> np.ndarray:
+        """Memory-map a file written by a recorder
+
+        :param path: path of file
+        :param points: names of recorded points, in recorded order
+        :returns: structured array with "time" and "values" fields
+        """
+        dtype = np.dtype([("time", "datetime64[s]"), ("values", np.float64, (len(points),))])
+        if os.path.getsize(path) == 0:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(path, dtype=dtype, mode="r")
@@ -0,0 +1,212 @@
+# ****************************************************************************************************
+# :copyright (c) 2008-2021 URBANopt, Alliance for Sustainable Energy, LLC, and other contributors.
+
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without modification, are permitted
+# provided that the following conditions are met:
+
+# Redistributions of source code must retain the above copyright notice, this list of conditions
+# and the following disclaimer.
+
+# Redistributions in binary form must reproduce the above copyright notice, this list of conditions
+# and the following disclaimer in the documentation and/or other materials provided with the
+# distribution.
+
+# Neither the name of the copyright holder nor the names of its contributors may be used to endorse
+# or promote products derived from this software without specific prior written permission.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+# FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER
+# IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT
+# OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+# ****************************************************************************************************
+
+import random
+import threading
+from time import monotonic
+from typing import Optional
+
+
+def request_not_sent(error: BaseException) -> bool:
+    """Check if a request failed before any of it reached the server
+
+    :param error: exception raised by the request
+    :returns: True if the connection could not be established
+    """
+    from requests.exceptions import ConnectionError, ConnectTimeout
+    from urllib3.exceptions import MaxRetryError, NewConnectionError
+
+    if isinstance(error, ConnectTimeout):
+        return True
+    if isinstance(error, ConnectionError) and error.args:
+        reason = error.args[0]
+        if isinstance(reason, MaxRetryError):
+            reason = reason.reason
+        return isinstance(reason, NewConnectionError)
+    return False
+
+
+class RetryBudget:
+    """Limits retries to a fraction of requests
+
+    Every request deposits `ratio` tokens, up to `max_tokens`, and every retry spends one,
+    so when the server is overloaded retries add at most `ratio` extra load.
+    """
+
+    def __init__(self, ratio: float = 0.2, max_tokens: float = 20):
+        """
+        :param ratio: retries allowed per request
+        :param max_tokens: maximum number of retries which can be saved up
+        """
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self._tokens = max_tokens
+        self._lock = threading.Lock()
+
+    def deposit(self) -> None:
+        with self._lock:
+            self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        with self._lock:
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+
+class CircuitBreaker:
+    """Fails fast while the server is down
+
+    Opens after `failure_threshold` consecutive failures. While open, requests are
+    rejected without being sent until `reset_timeout` seconds have passed, then a single
+    trial request is let through which closes the circuit if it succeeds.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30):
+        """
+        :param failure_threshold: consecutive failures before the circuit opens
+        :param reset_timeout: seconds to reject requests for once open
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def open(self) -> bool:
+        with self._lock:
+            return self._opened_at is not None
+
+    def allow(self) -> bool:
+        """Check if a request may be sent"""
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if monotonic() - self._opened_at >= self.reset_timeout and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._trial_in_flight or self._failures >= self.failure_threshold:
+                self._opened_at = monotonic()
+            self._trial_in_flight = False
+
+
+class RetryPolicy:
+    """Decides which failed requests are retried and how long to wait between attempts
+
+    Requests which do not change the state of a run (reads, and writes which can be
+    repeated such as setting point values or aliases) are retried on connection errors
+    and on 429, 502, 503 and 504 responses. Requests which do change it (advance, start,
+    stop, creating runs and uploads) are only retried when the server confirms it did
+    not process them: the connection could not be established, or it answered 429 or 503.
+    Attempts are spaced with full jitter exponential backoff, limited by a `RetryBudget`
+    and a `CircuitBreaker`.
+    """
+
+    IDEMPOTENT = {
+        ("POST", "runs/{id}/points"),
+        ("POST", "runs/{id}/points/values"),
+        ("PUT", "runs/{id}/points/values"),
+        ("PUT", "aliases/{alias}"),
+    }
+    RETRY_STATUSES = (429, 502, 503, 504)
+    NOT_PROCESSED_STATUSES = (429, 503)
+
+    def __init__(self, max_attempts: int = 4, backoff: float = 0.1, max_backoff: float = 5,
+                 budget: RetryBudget = None, circuit_breaker: CircuitBreaker = None):
+        """
+        :param max_attempts: maximum number of attempts per request, 1 disables retries
+        :param backoff: upper bound of the delay before the first retry in seconds, doubles for each retry
+        :param max_backoff: maximum delay between attempts in seconds
+        :param budget: retry budget, defaults to a new `RetryBudget`
+        :param circuit_breaker: circuit breaker, defaults to a new `CircuitBreaker`
+        """
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.budget = budget if budget is not None else RetryBudget()
+        self.circuit_breaker = circuit_breaker if circuit_breaker is not None else CircuitBreaker()
+
+    def is_idempotent(self, method: str, endpoint: str) -> bool:
+        """
+        :param method: HTTP method
+        :param endpoint: endpoint template
+        :returns: True if the request can safely be repeated
+        """
+        return method == "GET" or (method, endpoint) in self.IDEMPOTENT
+
+    def should_retry(self, attempt: int, method: str, endpoint: str, status_code: Optional[int] = None,
+                     error: BaseException = None) -> bool:
+        """Check if a failed attempt should be retried, spending from the budget if so
+
+        :param attempt: number of the attempt which failed, starting at 1
+        :param method: HTTP method
+        :param endpoint: endpoint template
+        :param status_code: status code of the response, None if there was no response
+        :param error: exception raised by the attempt
+        :returns: True if the request should be retried
+        """
+        from requests.exceptions import ConnectionError
+
+        if attempt >= self.max_attempts:
+            return False
+        if error is not None:
+            retryable = request_not_sent(error) or (isinstance(error, ConnectionError) and self.is_idempotent(method, endpoint))
+        elif self.is_idempotent(method, endpoint):
+            retryable = status_code in self.RETRY_STATUSES
+        else:
+            retryable = status_code in self.NOT_PROCESSED_STATUSES
+        return retryable and self.budget.withdraw()
+
+    def delay(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        """Get the number of seconds to wait before the next attempt
+
+        :param attempt: number of the attempt which failed, starting at 1
+        :param retry_after: value of the Retry-After header of the response
+        :returns: delay in seconds
+        """
+        delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** (attempt - 1)))
+        if retry_after:
+            try:
+                delay = max(delay, min(float(retry_after), self.max_backoff))
+            except ValueError:
+                pass
+        return delay
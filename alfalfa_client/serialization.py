@@ -0,0 +1,216 @@
+# ****************************************************************************************************
+# :copyright (c) 2008-2021 URBANopt, Alliance for Sustainable Energy, LLC, and other contributors.
+
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without modification, are permitted
+# provided that the following conditions are met:
+
+# Redistributions of source code must retain the above copyright notice, this list of conditions
+# and the following disclaimer.
+
+# Redistributions in binary form must reproduce the above copyright notice, this list of conditions
+# and the following disclaimer in the documentation and/or other materials provided with the
+# distribution.
+
+# Neither the name of the copyright holder nor the names of its contributors may be used to endorse
+# or promote products derived from this software without specific prior written permission.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+# FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER
+# IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT
+# OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+# ****************************************************************************************************
+
+from typing import Any, Dict, List, Optional, Union
+
+from alfalfa_client.lib import AlfalfaClientException
+
+
+def encode_default(obj: Any) -> Any:
+    """Convert objects the JSON encoders do not support, such as numpy scalars and arrays
+
+    :param obj: object to convert
+    :returns: JSON serializable object
+    """
+    if hasattr(obj, "tolist"):
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+class RunState:
+    """Id, status and error log of a run as returned by `runs/{id}`"""
+
+    __slots__ = ("id", "status", "error_log")
+
+    def __init__(self, id: str, status: str, error_log: str = ""):
+        self.id = id
+        self.status = status
+        self.error_log = error_log
+
+    def __repr__(self) -> str:
+        return f"RunState(id={self.id!r}, status={self.status!r})"
+
+
+class JSONCodec:
+    """Encodes request bodies and decodes response payloads with the standard library `json` module
+
+    Subclasses replace `dumps` and `loads` with faster implementations, or the `decode_*`
+    methods with decoders that build the result without an intermediate dict.
+    """
+
+    name = "json"
+
+    def __init__(self):
+        import json
+        self._json = json
+
+    def dumps(self, obj: Any) -> bytes:
+        """Serialize a request body
+
+        :param obj: object to serialize
+        :returns: utf-8 encoded JSON
+        """
+        return self._json.dumps(obj, separators=(",", ":"), default=encode_default).encode()
+
+    def loads(self, data: bytes) -> Any:
+        """Parse a JSON document
+
+        :param data: utf-8 encoded JSON
+        :returns: parsed document
+        """
+        return self._json.loads(data)
+
+    def decode_payload(self, data: bytes) -> Any:
+        """Parse a response and return its `payload`
+
+        :param data: response body
+        :returns: payload of response
+        """
+        return self.loads(data)["payload"]
+
+    def decode_run(self, data: bytes, run_id: str = None) -> RunState:
+        """Parse the response of `runs/{id}`
+
+        :param data: response body
+        :param run_id: id of the requested run, used if the response has no id
+        :returns: state of run
+        """
+        payload = self.decode_payload(data)
+        return RunState(payload.get("id", run_id), payload["status"], payload.get("errorLog", ""))
+
+    def decode_time(self, data: bytes) -> str:
+        """Parse the response of `runs/{id}/time`
+
+        :param data: response body
+        :returns: sim time of run as sent by the server
+        """
+        return self.decode_payload(data)["time"]
+
+    def decode_values(self, data: bytes) -> Dict[str, Any]:
+        """Parse the response of `runs/{id}/points/values`
+
+        :param data: response body
+        :returns: dictionary of point ids and values
+        """
+        return self.decode_payload(data)
+
+    def decode_points(self, data: bytes) -> List[dict]:
+        """Parse the response of `runs/{id}/points`
+
+        :param data: response body
+        :returns: list of point dictionaries
+        """
+        return self.decode_payload(data)
+
+
+class OrjsonCodec(JSONCodec):
+    """Codec using `orjson` for encoding and decoding"""
+
+    name = "orjson"
+
+    def __init__(self):
+        import orjson
+        self._orjson_dumps = orjson.dumps
+        self.loads = orjson.loads
+
+    def dumps(self, obj: Any) -> bytes:
+        return self._orjson_dumps(obj, default=encode_default)
+
+
+class MsgspecCodec(JSONCodec):
+    """Codec using `msgspec`, responses are decoded into typed structs and unused fields skipped"""
+
+    name = "msgspec"
+
+    def __init__(self):
+        import msgspec
+
+        class Run(msgspec.Struct):
+            status: str
+            id: Optional[str] = None
+            errorLog: Optional[str] = ""
+
+        class Time(msgspec.Struct):
+            time: str
+
+        class Envelope(msgspec.Struct):
+            payload: Any
+
+        def decoder(payload_type):
+            envelope = msgspec.defstruct("Envelope", [("payload", payload_type)])
+            return msgspec.json.Decoder(envelope)
+
+        self.dumps = msgspec.json.Encoder(enc_hook=encode_default).encode
+        self.loads = msgspec.json.Decoder().decode
+        self._payload = msgspec.json.Decoder(Envelope).decode
+        self._run = decoder(Run).decode
+        self._time = decoder(Time).decode
+        self._values = decoder(Dict[str, Any]).decode
+        self._points = decoder(List[Dict[str, Any]]).decode
+
+    def decode_payload(self, data: bytes) -> Any:
+        return self._payload(data).payload
+
+    def decode_run(self, data: bytes, run_id: str = None) -> RunState:
+        run = self._run(data).payload
+        return RunState(run.id if run.id is not None else run_id, run.status, run.errorLog)
+
+    def decode_time(self, data: bytes) -> str:
+        return self._time(data).payload.time
+
+    def decode_values(self, data: bytes) -> Dict[str, Any]:
+        return self._values(data).payload
+
+    def decode_points(self, data: bytes) -> List[dict]:
+        return self._points(data).payload
+
+
+CODECS = {codec.name: codec for codec in (MsgspecCodec, OrjsonCodec, JSONCodec)}
+
+
+def get_codec(codec: Union[str, JSONCodec] = None) -> JSONCodec:
+    """Get a JSON codec
+
+    :param codec: codec instance, or name of codec ("msgspec", "orjson" or "json"),
+                  defaults to the fastest installed
+    :returns: codec
+    """
+    if isinstance(codec, JSONCodec):
+        return codec
+    if codec is None:
+        for codec_type in CODECS.values():
+            try:
+                return codec_type()
+            except ImportError:
+                continue
+    if codec not in CODECS:
+        raise AlfalfaClientException(f"Unknown JSON codec '{codec}', expected one of {', '.join(CODECS)}")
+    try:
+        return CODECS[codec]()
+    except ImportError as e:
+        raise AlfalfaClientException(f"JSON codec '{codec}' requires the '{e.name}' package") from e
@@ -0,0 +1,471 @@
+# ****************************************************************************************************
+# :copyright (c) 2008-2021 URBANopt, Alliance for Sustainable Energy, LLC, and other contributors.
+
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without modification, are permitted
+# provided that the following conditions are met:
+
+# Redistributions of source code must retain the above copyright notice, this list of conditions
+# and the following disclaimer.
+
+# Redistributions in binary form must reproduce the above copyright notice, this list of conditions
+# and the following disclaimer in the documentation and/or other materials provided with the
+# distribution.
+
+# Neither the name of the copyright holder nor the names of its contributors may be used to endorse
+# or promote products derived from this software without specific prior written permission.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+# FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER
+# IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT
+# OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+# ****************************************************************************************************
+
+import threading
+from concurrent.futures import Executor, ThreadPoolExecutor
+from datetime import datetime
+from os import PathLike
+from typing import Dict, List, Optional, Tuple, Union
+
+from alfalfa_client.alfalfa_client import AlfalfaClient, ModelID, RunID
+from alfalfa_client.lib import (
+    AlfalfaAPIException,
+    AlfalfaBatchException,
+    AlfalfaClientException,
+    parallel_map,
+    parallelize
+)
+from alfalfa_client.lockstep import LockstepEngine, StepResult
+from alfalfa_client.metrics import RequestHook, RequestRecord
+from alfalfa_client.models import Run
+from alfalfa_client.points import PointHandle
+
+
+class Shard(RequestHook):
+    """One Alfalfa host of a `ShardedAlfalfaClient` and its current load
+
+    Registered as a request hook of its client to count requests in flight and keep
+    an exponentially weighted average of request latency. Runs placed on the host are
+    counted as active until they are stopped or seen to be complete or errored.
+    """
+
+    def __init__(self, client: AlfalfaClient, latency_weight: float = 0.2, min_latency: float = 0.001):
+        """
+        :param client: client for the host
+        :param latency_weight: weight of the latest request in the latency average
+        :param min_latency: latency assumed before any request has completed
+        """
+        self.client = client
+        self.latency_weight = latency_weight
+        self.min_latency = min_latency
+        self.runs = set()
+        self.placing = 0
+        self.in_flight = 0
+        self.latency = 0.0
+        self._lock = threading.Lock()
+        client.add_request_hook(self)
+
+    @property
+    def host(self) -> str:
+        return self.client.host
+
+    @property
+    def active_runs(self) -> int:
+        return len(self.runs)
+
+    def request_started(self, endpoint: str, method: str) -> None:
+        with self._lock:
+            self.in_flight += 1
+
+    def request_finished(self, record: RequestRecord) -> None:
+        with self._lock:
+            self.in_flight -= 1
+            if self.latency:
+                self.latency += self.latency_weight * (record.seconds - self.latency)
+            else:
+                self.latency = record.seconds
+
+    def score(self) -> Tuple[int, int, float]:
+        """Cost of placing one more run on the host, lower is better
+
+        Compares the number of active runs and runs being placed first, then the number of
+        requests in flight. The average request latency only breaks ties, as it follows
+        whichever requests completed last.
+        """
+        return self.active_runs + self.placing, self.in_flight, max(self.latency, self.min_latency)
+
+    def add_run(self, run_id: RunID) -> None:
+        with self._lock:
+            self.runs.add(run_id)
+
+    def finish_run(self, run_id: RunID) -> None:
+        with self._lock:
+            self.runs.discard(run_id)
+
+    def __repr__(self) -> str:
+        return f"Shard(host={self.host!r}, active_runs={self.active_runs}, in_flight={self.in_flight}, latency={self.latency:.4f})"
+
+
+class ShardedAlfalfaClient:
+    """One client over several Alfalfa hosts
+
+    New runs are placed on the least loaded host, judged by its active runs, then its
+    requests in flight, then its observed latency. The host of every run, model and alias created through
+    this client is remembered so later calls are sent to it. Calls with an id which was
+    not created through this client ask every host for it once. List calls are spread
+    over every host at once.
+    """
+
+    def __init__(self, hosts: List[str], max_workers: int = None, max_concurrency: int = None, **client_kwargs):
+        """
+        :param hosts: urls of the alfalfa web servers
+        :param max_workers: number of threads used by list calls across all hosts,
+                            defaults to the total of the threads of each host's client
+        :param max_concurrency: maximum number of items of a single list call in flight at once
+        :param client_kwargs: options passed to the `AlfalfaClient` of each host
+        """
+        if not hosts:
+            raise AlfalfaClientException("ShardedAlfalfaClient requires at least one host")
+        self.shards = [Shard(AlfalfaClient(host, **client_kwargs)) for host in hosts]
+        self.max_workers = max_workers if max_workers is not None else sum(shard.client.max_workers for shard in self.shards)
+        self.max_concurrency = max_concurrency
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self._owners: Dict[str, Shard] = {}
+        self._model_owners: Dict[ModelID, Shard] = {}
+        self._lock = threading.Lock()
+        self.lockstep = LockstepEngine(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @property
+    def executor(self) -> Executor:
+        """Executor which runs the calls of list operations across all hosts"""
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="alfalfa-sharded")
+        return self._executor
+
+    def close(self) -> None:
+        """Close the clients of every host and the threads of list calls"""
+        for shard in self.shards:
+            shard.client.close()
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+
+    def host_of(self, run_id: RunID) -> str:
+        """Get the host a run is on
+
+        :param run_id: id or alias of run
+        :returns: url of host
+        """
+        return self._shard(run_id).host
+
+    def _place(self) -> Shard:
+        with self._lock:
+            shard = min(self.shards, key=Shard.score)
+            shard.placing += 1
+        return shard
+
+    def _placed(self, shard: Shard, run_id: RunID = None) -> None:
+        with self._lock:
+            shard.placing -= 1
+            if run_id is not None:
+                shard.add_run(run_id)
+                self._owners[run_id] = shard
+
+    def _observe(self, run_id: RunID, status: str) -> None:
+        if status and status.upper() in ("COMPLETE", "ERROR"):
+            shard = self._owners.get(run_id)
+            if shard is not None:
+                shard.finish_run(run_id)
+
+    def _own(self, id: str, shard: Shard) -> None:
+        with self._lock:
+            self._owners[id] = shard
+
+    def _shard(self, run_id: RunID) -> Shard:
+        shard = self._owners.get(run_id)
+        if shard is not None:
+            return shard
+        found = self._probe(lambda shard: shard.client.status(run_id))
+        if found is None:
+            raise AlfalfaClientException(f"No host has a run with id '{run_id}'")
+        self._own(run_id, found)
+        return found
+
+    def _probe(self, func) -> Optional[Shard]:
+        """Call `func` on every shard at once and return the first shard it succeeds on
+
+        Shards which fail with anything but a 404 are skipped, their first error is only
+        raised if no shard answered.
+        """
+        def attempt(shard: Shard):
+            try:
+                func(shard)
+                return True
+            except AlfalfaAPIException as e:
+                if e.response.status_code != 404:
+                    return e
+                return False
+            except Exception as e:
+                return e
+
+        with ThreadPoolExecutor(len(self.shards)) as executor:
+            results = list(executor.map(attempt, self.shards))
+        found = next((shard for shard, result in zip(self.shards, results) if result is True), None)
+        error = next((result for result in results if isinstance(result, Exception)), None)
+        if found is None and error is not None:
+            raise error
+        return found
+
+    @parallelize
+    def status(self, run_id: Union[RunID, List[RunID]]) -> str:
+        """Get status of run
+
+        :param run_id: id of run or list of ids
+        :returns: status of run
+        """
+        status = self._shard(run_id).client.status(run_id)
+        self._observe(run_id, status)
+        return status
+
+    @parallelize
+    def get_error_log(self, run_id: Union[RunID, List[RunID]]) -> str:
+        """Get error log from run
+
+        :param run_id: id of run or list of ids
+        :returns: error log from run
+        """
+        return self._shard(run_id).client.get_error_log(run_id)
+
+    def wait(self, run_id: Union[RunID, List[RunID]], desired_status: str, timeout: float = 600) -> None:
+        """Wait for a run to have a certain status or timeout with error
+
+        :param run_id: id of run or list of ids
+        :param desired_status: status to wait for
+        :param timeout: timeout length in seconds
+        """
+        if not isinstance(run_id, list):
+            self._shard(run_id).client.waiter.watch(run_id, desired_status, timeout, callback=self._observe).result()
+            return
+
+        futures = [self._shard(id).client.waiter.watch(id, desired_status, timeout, callback=self._observe) for id in run_id]
+        errors = {}
+        for i, future in enumerate(futures):
+            error = future.exception()
+            if error is not None:
+                errors[i] = error
+        if errors:
+            raise AlfalfaBatchException([None] * len(futures), errors)
+        return [None] * len(futures)
+
+    def upload_model(self, model_path: PathLike) -> ModelID:
+        """Upload a model to the least loaded host
+
+        :param model_path: path to model file or folder
+        :returns: id of model"""
+        shard = self._place()
+        try:
+            model_id = shard.client.upload_model(model_path)
+        finally:
+            self._placed(shard)
+        with self._lock:
+            self._model_owners[model_id] = shard
+        return model_id
+
+    def create_run_from_model(self, model_id: Union[ModelID, List[ModelID]], wait_for_status: bool = True) -> Union[RunID, List[RunID]]:
+        """Create a run from a model on the host the model was uploaded to
+
+        :param model_id: id of model to create a run from or list of ids
+        :param wait_for_status: wait for model to be "READY" before returning
+        :returns: id of run created or list of ids"""
+        if isinstance(model_id, list):
+            run_ids = parallel_map(self.executor, self.create_run_from_model, model_id, [False],
+                                   max_concurrency=self.max_concurrency)
+        else:
+            shard = self._model_owners.get(model_id)
+            if shard is None:
+                raise AlfalfaClientException(f"Model '{model_id}' was not uploaded through this client")
+            run_ids = shard.client.create_run_from_model(model_id, wait_for_status=False)
+            shard.add_run(run_ids)
+            self._own(run_ids, shard)
+
+        if wait_for_status:
+            self.wait(run_ids, "ready")
+        return run_ids
+
+    def create_runs(self, model_id: ModelID, count: int, wait_for_status: bool = True) -> List[RunID]:
+        """Create many runs from one model
+
+        :param model_id: id of model to create runs from
+        :param count: number of runs to create
+        :param wait_for_status: wait for all runs to be "READY" before returning
+        :returns: list of ids of runs created"""
+        return self.create_run_from_model([model_id] * count, wait_for_status=wait_for_status)
+
+    def submit(self, model_path: Union[str, List[str]], wait_for_status: bool = True) -> Union[RunID, List[RunID]]:
+        """Submit a model to the least loaded host
+
+        :param model_path: path to the model to upload or list of paths, spread over the hosts
+        :param wait_for_status: wait for model to be "READY" before returning
+        :returns: id of created run or list of ids"""
+        if isinstance(model_path, list):
+            run_ids = parallel_map(self.executor, self.submit, model_path, [False], max_concurrency=self.max_concurrency)
+        else:
+            shard = self._place()
+            run_ids = None
+            try:
+                run_ids = shard.client.submit(model_path, wait_for_status=False)
+            finally:
+                self._placed(shard, run_ids)
+
+        if wait_for_status:
+            self.wait(run_ids, "ready")
+        return run_ids
+
+    @parallelize
+    def start(self, run_id: Union[RunID, List[RunID]], start_datetime: datetime, end_datetime: datetime, timescale: int = 5,
+              external_clock: bool = False, realtime: bool = False, wait_for_status: bool = True):
+        """Start one run from a model.
+
+        :param run_id: id of run or list of ids
+        :param start_datetime: time to start the model from
+        :param end_datetime: time to stop the model at (may not be honored for external_clock=True)
+        :param timescale: multiple of real time to run model at (for external_clock=False)
+        :param external_clock: run model with an external advancer
+        :param realtime: run model with timescale=1
+        :param wait_for_status: wait for model to be "RUNNING" before returning
+        """
+        return self._shard(run_id).client.start(run_id, start_datetime, end_datetime, timescale=timescale,
+                                                external_clock=external_clock, realtime=realtime,
+                                                wait_for_status=wait_for_status)
+
+    @parallelize
+    def stop(self, run_id: Union[RunID, List[RunID]], wait_for_status: bool = True):
+        """Stop a run
+
+        :param run_id: id of the run or list of ids
+        :param wait_for_status: wait for the run to be "complete" before returning
+        """
+        shard = self._shard(run_id)
+        shard.client.stop(run_id, wait_for_status=wait_for_status)
+        shard.finish_run(run_id)
+
+    @parallelize
+    def advance(self, run_id: Union[RunID, List[RunID]]) -> None:
+        """Advance a run 1 timestep
+
+        :param run_id: id of run or list of ids"""
+        self._shard(run_id).client.advance(run_id)
+
+    def step(self, run_ids: Union[RunID, List[RunID]], inputs_by_run: Dict[RunID, dict] = None) -> Dict[RunID, StepResult]:
+        """Write inputs, advance and read the sim time and outputs of many runs across all hosts
+
+        :param run_ids: id of run or list of ids
+        :param inputs_by_run: dictionary of run id to dictionary of point names and input values
+        :returns: dictionary of run id to state of the run after advancing
+        """
+        if not isinstance(run_ids, list):
+            run_ids = [run_ids]
+        return self.lockstep.step(run_ids, inputs_by_run)
+
+    @parallelize
+    def get_points(self, run_id: Union[RunID, List[RunID]]) -> Run:
+        """Get all points of run with their metadata
+
+        :param run_id: id of run or list of ids
+        :returns: points of run"""
+        return self._shard(run_id).client.get_points(run_id)
+
+    def get_inputs(self, run_id: RunID) -> List[str]:
+        """Get inputs of run
+
+        :param run_id: id of run
+        :returns: list of input names"""
+        return self._shard(run_id).client.get_inputs(run_id)
+
+    def set_inputs(self, run_id: RunID, inputs: dict) -> None:
+        """Set inputs of run
+
+        :param run_id: id of run
+        :param inputs: dictionary of point names and input values"""
+        self._shard(run_id).client.set_inputs(run_id, inputs)
+
+    def get_outputs(self, run_id: RunID, changed_since_last_read: bool = False) -> dict:
+        """Get outputs of run
+
+        :param run_id: id of run
+        :param changed_since_last_read: only return changed outputs, see `AlfalfaClient.get_outputs`
+        :returns: dictionary of output names and values"""
+        return self._shard(run_id).client.get_outputs(run_id, changed_since_last_read=changed_since_last_read)
+
+    def get_outputs_many(self, run_ids: List[RunID]) -> Dict[RunID, dict]:
+        """Get outputs of many runs across all hosts
+
+        :param run_ids: ids of runs
+        :returns: dictionary of run id to dictionary of output names and values
+        """
+        run_ids = list(run_ids)
+        outputs = parallel_map(self.executor, self.get_outputs, run_ids, max_concurrency=self.max_concurrency)
+        return dict(zip(run_ids, outputs))
+
+    def set_inputs_many(self, inputs_by_run: Dict[RunID, dict]) -> None:
+        """Set inputs of many runs across all hosts
+
+        :param inputs_by_run: dictionary of run id to dictionary of point names and input values
+        """
+        parallel_map(self.executor, lambda item: self.set_inputs(*item), list(dict(inputs_by_run).items()),
+                     max_concurrency=self.max_concurrency)
+
+    def compile_points(self, run_id: RunID, inputs: List[str] = (), outputs: List[str] = ()) -> PointHandle:
+        """Resolve a fixed set of input and output names of a run once
+
+        :param run_id: id of run
+        :param inputs: names of input points
+        :param outputs: names of output points
+        :returns: handle bound to the client of the run's host"""
+        return self._shard(run_id).client.compile_points(run_id, inputs, outputs)
+
+    @parallelize
+    def get_sim_time(self, run_id: Union[RunID, List[RunID]]) -> datetime:
+        """Get sim_time of run
+
+        :param run_id: id of site or list of ids
+        :returns: datetime of site
+        """
+        return self._shard(run_id).client.get_sim_time(run_id)
+
+    def set_alias(self, alias: str, run_id: RunID) -> None:
+        """Set alias to point to a run_id on the run's host
+
+        :param run_id: id of run to point alias to
+        :param alias: alias to use"""
+        shard = self._shard(run_id)
+        shard.client.set_alias(alias, run_id)
+        self._own(alias, shard)
+
+    def get_alias(self, alias: str) -> RunID:
+        """Get run_id from alias
+
+        :param alias: alias
+        :returns: Id of run associated with alias"""
+        shard = self._owners.get(alias)
+        if shard is None:
+            shard = self._probe(lambda shard: shard.client.get_alias(alias))
+            if shard is None:
+                raise AlfalfaClientException(f"No host has an alias '{alias}'")
+            self._own(alias, shard)
+        return shard.client.get_alias(alias)
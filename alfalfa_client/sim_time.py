@@ -0,0 +1,209 @@
+# ****************************************************************************************************
+# :copyright (c) 2008-2021 URBANopt, Alliance for Sustainable Energy, LLC, and other contributors.
+
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without modification, are permitted
+# provided that the following conditions are met:
+
+# Redistributions of source code must retain the above copyright notice, this list of conditions
+# and the following disclaimer.
+
+# Redistributions in binary form must reproduce the above copyright notice, this list of conditions
+# and the following disclaimer in the documentation and/or other materials provided with the
+# distribution.
+
+# Neither the name of the copyright holder nor the names of its contributors may be used to endorse
+# or promote products derived from this software without specific prior written permission.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+# FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER
+# IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT
+# OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+# ****************************************************************************************************
+
+import threading
+from datetime import datetime, timedelta
+from typing import TYPE_CHECKING, Dict, Optional, Union
+
+if TYPE_CHECKING:
+    from alfalfa_client.alfalfa_client import AlfalfaClient, RunID
+
+SIM_TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def parse_sim_time(value: Union[str, datetime]) -> datetime:
+    """Parse a sim time sent by the server
+
+    :param value: time in the format "YYYY-MM-DD HH:MM:SS", or a datetime which is returned as is
+    :returns: parsed time
+    """
+    if isinstance(value, datetime):
+        return value
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return datetime.strptime(value, SIM_TIME_FORMAT)
+
+
+class RunClock:
+    """Known and predicted sim time of one run driven by an external clock"""
+
+    __slots__ = ("time", "timestep", "end_time", "observed_time", "advances")
+
+    def __init__(self, end_time: datetime = None, timestep: timedelta = None):
+        self.time: Optional[datetime] = None
+        self.timestep = timestep
+        self.end_time = end_time
+        self.observed_time: Optional[datetime] = None
+        self.advances = 0
+
+    def advanced(self) -> None:
+        self.advances += 1
+        if self.time is not None and self.timestep is not None:
+            self.time += self.timestep
+        else:
+            self.time = None
+
+    def observe(self, time: datetime) -> bool:
+        """Record a time read from the server
+
+        :returns: True if the time differs from the predicted time
+        """
+        mismatch = self.time is not None and self.advances > 0 and time != self.time
+        if self.observed_time is not None and self.advances > 0:
+            self.timestep = (time - self.observed_time) / self.advances
+        self.time = self.observed_time = time
+        self.advances = 0
+        return mismatch
+
+
+class SimTimeTracker:
+    """Predicts the sim time of external clock runs after each advance
+
+    Runs started with `external_clock=True` move forward by one timestep for every
+    `advance` made through the client. Once the timestep of a run is known, learned
+    from two reads of the server time, `get` returns the predicted time and only
+    checks it against the server after `check_interval` advances, or once it passes the
+    end time of the run. A prediction which does not match the server is corrected and
+    the timestep learned again. With `check_interval` None every call reads the time
+    from the server.
+    """
+
+    def __init__(self, client: "AlfalfaClient", check_interval: int = None):
+        """
+        :param client: client to make requests with
+        :param check_interval: number of advances between checks of the predicted time against the server
+        """
+        self.client = client
+        self.check_interval = check_interval
+        self._clocks: Dict["RunID", RunClock] = {}
+        self._lock = threading.Lock()
+        self._stats = {"predicted": 0, "checks": 0, "mismatches": 0}
+
+    def started(self, run_id: "RunID", end_time: Union[str, datetime], external_clock: bool) -> None:
+        """Record that a run was started
+
+        :param run_id: id of run
+        :param end_time: end time the run was started with
+        :param external_clock: whether the run is advanced by the client, runs with an end time
+                               which cannot be parsed are not tracked and always read from the server
+        """
+        end_datetime = None
+        if external_clock:
+            try:
+                end_datetime = parse_sim_time(str(end_time))
+            except ValueError:
+                pass
+        with self._lock:
+            if end_datetime is not None:
+                self._clocks[run_id] = RunClock(end_datetime)
+            else:
+                self._clocks.pop(run_id, None)
+
+    def advanced(self, run_id: "RunID") -> None:
+        """Record that a run was advanced by one timestep
+
+        :param run_id: id of run
+        """
+        with self._lock:
+            clock = self._clocks.get(run_id)
+            if clock is not None:
+                clock.advanced()
+
+    def forget(self, run_id: "RunID") -> None:
+        """Stop tracking a run
+
+        :param run_id: id of run
+        """
+        with self._lock:
+            self._clocks.pop(run_id, None)
+
+    def set_timestep(self, run_id: "RunID", timestep: timedelta) -> None:
+        """Set the timestep of a run instead of learning it from the server
+
+        :param run_id: id of run, must have been started with `external_clock=True`
+        :param timestep: sim time added by each advance
+        """
+        with self._lock:
+            self._clocks.setdefault(run_id, RunClock()).timestep = timestep
+
+    def timestep(self, run_id: "RunID") -> Optional[timedelta]:
+        """Get the timestep of a run
+
+        :param run_id: id of run
+        :returns: sim time added by each advance, None if not known yet
+        """
+        clock = self._clocks.get(run_id)
+        return clock.timestep if clock is not None else None
+
+    def end_time(self, run_id: "RunID") -> Optional[datetime]:
+        """Get the end time a run was started with
+
+        :param run_id: id of run
+        :returns: end time, None if the run is not tracked
+        """
+        clock = self._clocks.get(run_id)
+        return clock.end_time if clock is not None else None
+
+    def get(self, run_id: "RunID") -> datetime:
+        """Get the sim time of a run, predicted if possible
+
+        :param run_id: id of run
+        :returns: sim time of run
+        """
+        if self.check_interval is not None:
+            with self._lock:
+                clock = self._clocks.get(run_id)
+                if (clock is not None and clock.time is not None and clock.advances < self.check_interval
+                        and (clock.end_time is None or clock.time <= clock.end_time)):
+                    self._stats["predicted"] += 1
+                    return clock.time
+        return self.fetch(run_id)
+
+    def fetch(self, run_id: "RunID") -> datetime:
+        """Read the sim time of a run from the server
+
+        :param run_id: id of run
+        :returns: sim time of run
+        """
+        response = self.client._request(f"runs/{run_id}/time", method="GET")
+        time = parse_sim_time(self.client.codec.decode_time(response.content))
+        with self._lock:
+            self._stats["checks"] += 1
+            clock = self._clocks.get(run_id)
+            if clock is not None and clock.observe(time):
+                self._stats["mismatches"] += 1
+        return time
+
+    def stats(self) -> Dict[str, int]:
+        """Get tracker counters
+
+        :returns: dictionary of predicted times returned, server checks and mismatches found
+        """
+        with self._lock:
+            return dict(self._stats)
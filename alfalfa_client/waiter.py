@@ -0,0 +1,227 @@
+# ****************************************************************************************************
+# :copyright (c) 2008-2021 URBANopt, Alliance for Sustainable Energy, LLC, and other contributors.
+
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without modification, are permitted
+# provided that the following conditions are met:
+
+# Redistributions of source code must retain the above copyright notice, this list of conditions
+# and the following disclaimer.
+
+# Redistributions in binary form must reproduce the above copyright notice, this list of conditions
+# and the following disclaimer in the documentation and/or other materials provided with the
+# distribution.
+
+# Neither the name of the copyright holder nor the names of its contributors may be used to endorse
+# or promote products derived from this software without specific prior written permission.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND
+# FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER
+# IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT
+# OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+# ****************************************************************************************************
+
+import heapq
+import math
+import threading
+from time import monotonic
+from typing import TYPE_CHECKING, Callable, Dict, List
+
+from alfalfa_client.lib import (
+    AlfalfaAPIException,
+    AlfalfaClientException,
+    AlfalfaException
+)
+
+if TYPE_CHECKING:
+    from concurrent.futures import Future
+
+    from alfalfa_client.alfalfa_client import AlfalfaClient, RunID
+
+StatusCallback = Callable[["RunID", str], None]
+
+
+class _Watch:
+    __slots__ = ("desired_status", "deadline", "future", "callback")
+
+    def __init__(self, desired_status: str, deadline: float, future: "Future", callback: StatusCallback):
+        self.desired_status = desired_status
+        self.deadline = deadline
+        self.future = future
+        self.callback = callback
+
+
+class _WatchedRun:
+    __slots__ = ("run_id", "watches", "status", "interval", "polling")
+
+    def __init__(self, run_id: "RunID", interval: float):
+        self.run_id = run_id
+        self.watches: List[_Watch] = []
+        self.status = None
+        self.interval = interval
+        self.polling = False
+
+
+class RunWaiter:
+    """Waits for runs to reach a status from a single scheduler thread
+
+    Every watched run is polled with one request which returns both its status and
+    error log. Polling starts at `initial_interval` and backs off up to `max_interval`
+    while the status does not change, resetting whenever it does. Any number of
+    watchers on the same run share its polls.
+    """
+
+    def __init__(self, client: "AlfalfaClient", initial_interval: float = 0.1, max_interval: float = 2,
+                 backoff: float = 2, poll_workers: int = 4):
+        """
+        :param client: client to make requests with
+        :param initial_interval: seconds between the first polls of a run, and after its status changes
+        :param max_interval: maximum number of seconds between polls of a run
+        :param backoff: factor the interval grows by after each poll with no status change
+        :param poll_workers: number of polls which can be in flight at once
+        """
+        self.client = client
+        self.initial_interval = initial_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.poll_workers = poll_workers
+
+        self._runs: Dict["RunID", _WatchedRun] = {}
+        self._schedule = []
+        self._condition = threading.Condition(threading.RLock())
+        self._thread = None
+        self._pool = None
+
+    def watch(self, run_id: "RunID", desired_status: str, timeout: float = 600, callback: StatusCallback = None) -> "Future":
+        """Start waiting for a run to have a status
+
+        :param run_id: id of run
+        :param desired_status: status to wait for
+        :param timeout: timeout length in seconds, no limit if None
+        :param callback: called with the run id and status whenever a new status is observed,
+                         an exception raised by it fails the future
+        :returns: future which resolves to the status once reached, or raises `AlfalfaException`
+                  if the run errors and `AlfalfaClientException` if the timeout is reached
+        """
+        from concurrent.futures import Future
+
+        future = Future()
+        watch = _Watch(desired_status.upper(), monotonic() + timeout if timeout is not None else math.inf, future, callback)
+        with self._condition:
+            self._start()
+            run = self._runs.get(run_id)
+            if run is None:
+                run = _WatchedRun(run_id, self.initial_interval)
+                self._runs[run_id] = run
+                heapq.heappush(self._schedule, (monotonic(), run_id))
+            run.watches.append(watch)
+            self._condition.notify()
+        return future
+
+    def close(self) -> None:
+        """Stop the scheduler thread, outstanding watches fail with `AlfalfaClientException`"""
+        with self._condition:
+            thread, self._thread = self._thread, None
+            self._condition.notify()
+        if thread is not None:
+            thread.join()
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+        with self._condition:
+            for run in self._runs.values():
+                for watch in run.watches:
+                    if not watch.future.done():
+                        watch.future.set_exception(AlfalfaClientException("'wait' cancelled, client was closed"))
+            self._runs.clear()
+            self._schedule.clear()
+
+    def _start(self) -> None:
+        if self._thread is None:
+            from concurrent.futures import ThreadPoolExecutor
+
+            self._pool = ThreadPoolExecutor(max_workers=self.poll_workers, thread_name_prefix="alfalfa-client-wait")
+            self._thread = threading.Thread(target=self._run_scheduler, name="alfalfa-client-waiter", daemon=True)
+            self._thread.start()
+
+    def _run_scheduler(self) -> None:
+        thread = threading.current_thread()
+        with self._condition:
+            while self._thread is thread:
+                now = monotonic()
+                self._expire(now)
+                while self._schedule and self._schedule[0][0] <= now:
+                    _, run_id = heapq.heappop(self._schedule)
+                    run = self._runs.get(run_id)
+                    if run is not None and not run.polling:
+                        run.polling = True
+                        self._pool.submit(self._poll, run)
+                next_deadline = min((watch.deadline for run in self._runs.values() for watch in run.watches
+                                     if watch.deadline != math.inf), default=None)
+                next_poll = self._schedule[0][0] if self._schedule else None
+                wake_times = [time for time in (next_deadline, next_poll) if time is not None]
+                self._condition.wait(max(0, min(wake_times) - now) if wake_times else None)
+
+    def _expire(self, now: float) -> None:
+        for run_id in list(self._runs):
+            run = self._runs[run_id]
+            for watch in [watch for watch in run.watches if watch.deadline <= now or watch.future.done()]:
+                run.watches.remove(watch)
+                if watch.future.done():
+                    continue
+                watch.future.set_exception(AlfalfaClientException(
+                    f"'wait' timed out waiting for status: '{watch.desired_status.lower()}', current status: '{run.status}'"))
+            if not run.watches and not run.polling:
+                del self._runs[run_id]
+
+    def _poll(self, run: _WatchedRun) -> None:
+        error = None
+        status = run.status
+        error_log = None
+        try:
+            state = self.client.codec.decode_run(self.client._request(f"runs/{run.run_id}", method="GET").content, run.run_id)
+            status = state.status
+            error_log = state.error_log
+        except AlfalfaAPIException as e:
+            if e.response.status_code != 404:
+                error = e
+        except Exception as e:
+            error = e
+
+        with self._condition:
+            run.polling = False
+            changed = status != run.status
+            if changed:
+                run.status = status
+            for watch in list(run.watches):
+                if watch.future.done():
+                    run.watches.remove(watch)
+                    continue
+                if changed and watch.callback is not None:
+                    try:
+                        watch.callback(run.run_id, status)
+                    except Exception as e:
+                        watch.future.set_exception(e)
+                        run.watches.remove(watch)
+                        continue
+                if error is not None:
+                    watch.future.set_exception(error)
+                elif status == "ERROR":
+                    watch.future.set_exception(AlfalfaException(error_log))
+                elif status == watch.desired_status:
+                    watch.future.set_result(status)
+                else:
+                    continue
+                run.watches.remove(watch)
+
+            if run.watches:
+                run.interval = self.initial_interval if changed else min(run.interval * self.backoff, self.max_interval)
+                heapq.heappush(self._schedule, (monotonic() + run.interval, run.run_id))
+            else:
+                del self._runs[run.run_id]
+            self._condition.notify()
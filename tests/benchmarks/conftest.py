@@ -0,0 +1,30 @@
+import pytest
+
+from alfalfa_client.alfalfa_client import AlfalfaClient
+from tests.mock_alfalfa import MockAlfalfaServer
+
+
+@pytest.fixture
+def large_server():
+    server = MockAlfalfaServer(num_inputs=2000, num_outputs=2000).start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def large_client(large_server: MockAlfalfaServer):
+    with AlfalfaClient(large_server.url, dedupe_uploads=False) as client:
+        yield client
+
+
+@pytest.fixture
+def slow_server():
+    server = MockAlfalfaServer(latency=0.002, status_delay=0.05).start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def slow_client(slow_server: MockAlfalfaServer):
+    with AlfalfaClient(slow_server.url, dedupe_uploads=False) as client:
+        yield client
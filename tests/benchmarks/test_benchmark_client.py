@@ -0,0 +1,87 @@
+from pathlib import Path
+from time import sleep
+
+import pytest
+
+from alfalfa_client.alfalfa_client import AlfalfaClient
+from alfalfa_client.controller import ControllerRunner
+from tests.mock_alfalfa import MockAlfalfaServer
+
+MODEL_PATH = Path(__file__).parents[1] / "integration" / "models" / "small_office"
+
+
+def test_advance_fan_out(benchmark, slow_client: AlfalfaClient, slow_server: MockAlfalfaServer):
+    run_ids = [f"run_{i}" for i in range(100)]
+    for run_id in run_ids:
+        slow_server.add_run(run_id)
+
+    benchmark(slow_client.advance, run_ids)
+
+
+def test_step_fan_out(benchmark, slow_client: AlfalfaClient, slow_server: MockAlfalfaServer):
+    run_ids = [f"run_{i}" for i in range(100)]
+    for run_id in run_ids:
+        slow_server.add_run(run_id)
+    inputs_by_run = {run_id: {"Input_0": 1.0} for run_id in run_ids}
+
+    benchmark(slow_client.step, run_ids, inputs_by_run)
+
+
+def test_set_inputs(benchmark, large_client: AlfalfaClient, large_server: MockAlfalfaServer):
+    large_server.add_run("run")
+    inputs = {f"Input_{i}": float(i) for i in range(large_server.num_inputs)}
+
+    benchmark(large_client.set_inputs, "run", inputs)
+
+
+def test_get_outputs(benchmark, large_client: AlfalfaClient, large_server: MockAlfalfaServer):
+    large_server.add_run("run")
+
+    outputs = benchmark(large_client.get_outputs, "run")
+
+    assert len(outputs) == large_server.num_outputs
+
+
+def test_wait_latency(benchmark, slow_client: AlfalfaClient, slow_server: MockAlfalfaServer):
+    run = slow_server.add_run("run", status="READY")
+
+    def start_and_wait():
+        with slow_server.lock:
+            run.set_status("RUNNING", slow_server.status_delay)
+        slow_client.wait("run", "running")
+        with slow_server.lock:
+            run.set_status("READY")
+
+    benchmark(start_and_wait)
+
+
+def test_upload_throughput(benchmark, large_client: AlfalfaClient):
+    benchmark(large_client.upload_model, MODEL_PATH)
+
+    metrics = large_client.upload_metrics[-1]
+    benchmark.extra_info["size_mb"] = metrics.size / 1e6
+    benchmark.extra_info["packaging_mb_per_s"] = metrics.packaging_throughput
+    benchmark.extra_info["transfer_mb_per_s"] = metrics.transfer_throughput
+
+
+def test_get_outputs_many(benchmark, slow_client: AlfalfaClient, slow_server: MockAlfalfaServer):
+    run_ids = [f"run_{i}" for i in range(200)]
+    for run_id in run_ids:
+        slow_server.add_run(run_id)
+
+    benchmark(slow_client.get_outputs_many, run_ids)
+
+
+@pytest.mark.parametrize("depth", [1, 2, 4])
+def test_controller_runner(benchmark, slow_client: AlfalfaClient, slow_server: MockAlfalfaServer, depth: int):
+    run_ids = [f"run_{i}" for i in range(20)]
+    for run_id in run_ids:
+        slow_server.add_run(run_id)
+
+    def controller(run_id, sim_time, outputs):
+        sleep(0.001)
+        return {"Input_0": outputs["Output_0"]}
+
+    runner = ControllerRunner(slow_client, run_ids, controller, depth=depth)
+    benchmark(runner.step)
+    benchmark.extra_info.update(runner.summary())
@@ -0,0 +1,49 @@
+import importlib.util
+import json
+from datetime import datetime
+
+import pytest
+
+from alfalfa_client.serialization import CODECS, get_codec
+from alfalfa_client.sim_time import parse_sim_time
+
+INSTALLED_CODECS = [name for name in CODECS if name == "json" or importlib.util.find_spec(name)]
+
+VALUES = json.dumps({"payload": {f"run-{i}": float(i) for i in range(2000)}}).encode()
+POINTS = json.dumps({"payload": [{"id": f"run-{i}", "name": f"Output_{i}", "type": "OUTPUT"} for i in range(2000)]}).encode()
+WRITES = {"points": {f"run-{i}": float(i) for i in range(2000)}}
+
+
+def test_decode_values_response_json(benchmark):
+    benchmark(lambda: json.loads(VALUES)["payload"])
+
+
+@pytest.mark.parametrize("name", INSTALLED_CODECS)
+def test_decode_values(benchmark, name: str):
+    values = benchmark(get_codec(name).decode_values, VALUES)
+
+    assert len(values) == 2000
+
+
+@pytest.mark.parametrize("name", INSTALLED_CODECS)
+def test_decode_points(benchmark, name: str):
+    points = benchmark(get_codec(name).decode_points, POINTS)
+
+    assert len(points) == 2000
+
+
+def test_encode_writes_requests_json(benchmark):
+    benchmark(lambda: json.dumps(WRITES).encode())
+
+
+@pytest.mark.parametrize("name", INSTALLED_CODECS)
+def test_encode_writes(benchmark, name: str):
+    benchmark(get_codec(name).dumps, WRITES)
+
+
+def test_parse_sim_time_strptime(benchmark):
+    benchmark(datetime.strptime, "2020-01-01 12:30:00", "%Y-%m-%d %H:%M:%S")
+
+
+def test_parse_sim_time(benchmark):
+    benchmark(parse_sim_time, "2020-01-01 12:30:00")
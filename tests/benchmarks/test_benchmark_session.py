@@ -0,0 +1,34 @@
+import requests
+
+from alfalfa_client.alfalfa_client import AlfalfaClient
+from alfalfa_client.metrics import RequestMetrics
+from tests.mock_alfalfa import MockAlfalfaServer
+
+
+def test_unpooled_requests(benchmark, mock_server: MockAlfalfaServer):
+    """Baseline: a new connection for every request"""
+    mock_server.add_run("run")
+    url = mock_server.url + "/api/v2/runs/run/advance"
+
+    benchmark(lambda: requests.request(method="POST", url=url).raise_for_status())
+
+
+def test_pooled_requests(benchmark, mock_client: AlfalfaClient, mock_server: MockAlfalfaServer):
+    mock_server.add_run("run")
+
+    benchmark(mock_client.advance, "run")
+
+
+def test_pooled_requests_list(benchmark, mock_client: AlfalfaClient, mock_server: MockAlfalfaServer):
+    run_ids = [f"run_{i}" for i in range(mock_client.pool_size)]
+    for run_id in run_ids:
+        mock_server.add_run(run_id)
+
+    benchmark(mock_client.advance, run_ids)
+
+
+def test_instrumented_requests(benchmark, mock_client: AlfalfaClient, mock_server: MockAlfalfaServer):
+    mock_server.add_run("run")
+    mock_client.add_request_hook(RequestMetrics())
+
+    benchmark(mock_client.advance, "run")
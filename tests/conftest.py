@@ -27,3 +27,37 @@ IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISI
 OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 ****************************************************************************************************
 """
+
+from pathlib import Path
+
+import pytest
+
+from alfalfa_client.alfalfa_client import AlfalfaClient
+from alfalfa_client.model_cache import ModelCache
+from tests.mock_alfalfa import MockAlfalfaServer
+
+
+def pytest_configure(config):
+    # Benchmarks run once as smoke tests unless timing is enabled with --benchmark-enable
+    if config.pluginmanager.hasplugin("benchmark"):
+        config.option.benchmark_disable = True
+
+
+def pytest_ignore_collect(collection_path: Path, config):
+    # Benchmarks need the pytest-benchmark plugin
+    benchmarks = Path(__file__).parent / "benchmarks"
+    if not config.pluginmanager.hasplugin("benchmark") and benchmarks in (collection_path, *collection_path.parents):
+        return True
+
+
+@pytest.fixture
+def mock_server():
+    server = MockAlfalfaServer().start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def mock_client(mock_server: MockAlfalfaServer, tmp_path):
+    with AlfalfaClient(mock_server.url, model_cache=ModelCache(tmp_path / "models.json")) as client:
+        yield client
@@ -0,0 +1,297 @@
+import json
+import re
+import threading
+from collections import Counter
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from time import monotonic, sleep
+
+
+class MockRun:
+    """State of a single run held by the mock server"""
+
+    def __init__(self, run_id: str, status: str = "READY", num_inputs: int = 2, num_outputs: int = 2):
+        self.id = run_id
+        self.status = status
+        self.error_log = ""
+        self.time = datetime(2020, 1, 1, 0, 0)
+        self.end_time = None
+        self.timestep = timedelta(minutes=1)
+        self.points = []
+        self.values = {}
+        self._pending_statuses = []
+        for i in range(num_inputs):
+            self.add_point(f"Input_{i}", "INPUT")
+        for i in range(num_outputs):
+            self.add_point(f"Output_{i}", "OUTPUT", value=float(i))
+
+    def add_point(self, name: str, point_type: str, value: float = None, **metadata) -> dict:
+        point = {"id": f"{self.id}-{len(self.points)}", "name": name, "type": point_type, **metadata}
+        self.points.append(point)
+        if value is not None:
+            self.values[point["id"]] = value
+        return point
+
+    def points_of_type(self, point_types: list = None) -> list:
+        return [point for point in self.points if point_types is None or point["type"] in point_types]
+
+    def set_status(self, status: str, delay: float = 0) -> None:
+        """Change status, after `delay` seconds if given"""
+        self._pending_statuses = []
+        if delay:
+            self.queue_status(status, delay)
+        else:
+            self.status = status
+
+    def queue_status(self, status: str, delay: float) -> None:
+        """Change status `delay` seconds from now, after any status changes already queued"""
+        self._pending_statuses.append((monotonic() + delay, status))
+
+    def current_status(self) -> str:
+        now = monotonic()
+        while self._pending_statuses and now >= self._pending_statuses[0][0]:
+            self.status = self._pending_statuses.pop(0)[1]
+        return self.status
+
+
+class RunNotFound(Exception):
+    pass
+
+
+class MockAlfalfaHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    routes = [
+        ("POST", r"models/upload", "create_upload"),
+        ("POST", r"models/(?P<model_id>[^/]+)/createRun", "create_run"),
+        ("GET", r"runs/(?P<run_id>[^/]+)", "get_run"),
+        ("POST", r"runs/(?P<run_id>[^/]+)/start", "start"),
+        ("POST", r"runs/(?P<run_id>[^/]+)/stop", "stop"),
+        ("POST", r"runs/(?P<run_id>[^/]+)/advance", "advance"),
+        ("GET", r"runs/(?P<run_id>[^/]+)/time", "get_time"),
+        ("GET", r"runs/(?P<run_id>[^/]+)/points", "get_points"),
+        ("POST", r"runs/(?P<run_id>[^/]+)/points", "get_points"),
+        ("POST", r"runs/(?P<run_id>[^/]+)/points/values", "get_point_values"),
+        ("PUT", r"runs/(?P<run_id>[^/]+)/points/values", "set_point_values"),
+        ("GET", r"aliases/(?P<alias>[^/]+)", "get_alias"),
+        ("PUT", r"aliases/(?P<alias>[^/]+)", "set_alias"),
+    ]
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_PUT(self):
+        self._dispatch("PUT")
+
+    def _dispatch(self, method: str):
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length) if length else b""
+        path = self.path.split("?")[0]
+        prefix = f"/api/{self.server.api_version}/"
+        if method == "POST" and path.startswith("/upload/"):
+            self._delay("upload")
+            return self._respond(*self.upload(path[len("/upload/"):], body))
+        if path.startswith(prefix):
+            endpoint = path[len(prefix):]
+            for route_method, pattern, handler in self.routes:
+                match = re.fullmatch(pattern, endpoint)
+                if route_method == method and match:
+                    parameters = json.loads(body) if body else None
+                    self._delay(handler)
+                    with self.server.lock:
+                        self.server.request_counts[handler] += 1
+                        faults = self.server.faults.get(handler)
+                        fault = faults.pop(0) if faults else None
+                    if fault == 0:
+                        self.close_connection = True
+                        return
+                    if fault is not None:
+                        return self._respond_text(fault, "Service temporarily overloaded")
+                    with self.server.lock:
+                        try:
+                            status, payload = getattr(self, handler)(parameters, **match.groupdict())
+                        except RunNotFound as e:
+                            status, payload = 404, {"message": f"Run with id '{e}' does not exist"}
+                    return self._respond(status, payload)
+        self._respond(404, {"message": f"No route for {method} {path}"})
+
+    def _delay(self, handler: str):
+        latency = self.server.route_latency.get(handler, self.server.latency)
+        if latency:
+            sleep(latency)
+
+    def _respond(self, status: int, body: dict = None):
+        data = json.dumps(body).encode() if body is not None else b""
+        self.send_response(status)
+        if data:
+            self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _respond_text(self, status: int, text: str):
+        data = text.encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "text/plain")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _run(self, run_id: str) -> MockRun:
+        run = self.server.runs.get(self.server.aliases.get(run_id, run_id))
+        if run is None:
+            raise RunNotFound(run_id)
+        return run
+
+    def create_upload(self, parameters):
+        model_id = f"model_{len(self.server.models)}"
+        self.server.models[model_id] = {"name": parameters["modelName"], "file": None}
+        return 200, {"payload": {
+            "url": f"{self.server.url}/upload/{model_id}",
+            "modelId": model_id,
+            "fields": {"key": f"uploads/{model_id}/{parameters['modelName']}"}
+        }}
+
+    def upload(self, model_id, body):
+        boundary = self.headers["Content-Type"].split("boundary=")[1].encode()
+        file_part = body.split(b"--" + boundary)[-2]
+        with self.server.lock:
+            self.server.request_counts["upload"] += 1
+            self.server.models[model_id]["file"] = file_part.split(b"\r\n\r\n", 1)[1][:-2]
+        return 204, None
+
+    def create_run(self, parameters, model_id):
+        if model_id not in self.server.models:
+            return 404, {"message": f"Model with id '{model_id}' does not exist"}
+        run = self.server.add_run(f"{self.server.run_id_prefix}_{len(self.server.runs)}", status="PREPROCESSING")
+        run.set_status("READY", self.server.status_delay)
+        return 200, {"payload": {"runId": run.id}}
+
+    def get_run(self, parameters, run_id):
+        run = self._run(run_id)
+        return 200, {"payload": {"id": run.id, "status": run.current_status(), "errorLog": run.error_log}}
+
+    def start(self, parameters, run_id):
+        run = self._run(run_id)
+        run.time = datetime.strptime(parameters["startDatetime"], '%Y-%m-%d %H:%M:%S')
+        run.end_time = datetime.strptime(parameters["endDatetime"], '%Y-%m-%d %H:%M:%S')
+        run.set_status("STARTING")
+        run.set_status("RUNNING", self.server.status_delay)
+        if self.server.run_duration is not None and not parameters.get("externalClock"):
+            run.queue_status("COMPLETE", self.server.status_delay + self.server.run_duration)
+        return 204, None
+
+    def stop(self, parameters, run_id):
+        run = self._run(run_id)
+        run.set_status("STOPPING")
+        run.set_status("COMPLETE", self.server.status_delay)
+        return 204, None
+
+    def advance(self, parameters, run_id):
+        run = self._run(run_id)
+        run.time += run.timestep
+        return 204, None
+
+    def get_time(self, parameters, run_id):
+        run = self._run(run_id)
+        return 200, {"payload": {"time": run.time.strftime('%Y-%m-%d %H:%M:%S')}}
+
+    def get_points(self, parameters, run_id):
+        run = self._run(run_id)
+        point_types = parameters.get("pointTypes") if parameters else None
+        return 200, {"payload": run.points_of_type(point_types)}
+
+    def get_point_values(self, parameters, run_id):
+        run = self._run(run_id)
+        point_types = parameters.get("pointTypes") if parameters else None
+        points = run.points_of_type(point_types)
+        return 200, {"payload": {point["id"]: run.values[point["id"]] for point in points if point["id"] in run.values}}
+
+    def set_point_values(self, parameters, run_id):
+        run = self._run(run_id)
+        writable = {point["id"] for point in run.points_of_type(["INPUT", "BIDIRECTIONAL"])}
+        invalid = [id for id in parameters["points"] if id not in writable]
+        if invalid:
+            return 400, {"message": "Invalid point writes", "payload": invalid}
+        run.values.update(parameters["points"])
+        return 204, None
+
+    def get_alias(self, parameters, alias):
+        if alias not in self.server.aliases:
+            return 404, {"message": f"Alias '{alias}' does not exist"}
+        return 200, {"payload": self.server.aliases[alias]}
+
+    def set_alias(self, parameters, alias):
+        self._run(parameters["runId"])
+        self.server.aliases[alias] = parameters["runId"]
+        return 204, None
+
+
+class MockAlfalfaServer(ThreadingHTTPServer):
+    """In-process stand-in for the Alfalfa web server
+
+    Serves the subset of the v2 REST API used by `AlfalfaClient` from a background thread.
+    Runs created through the API have `num_inputs` and `num_outputs` points and reach
+    their next status `status_delay` seconds after it is requested. Every request is
+    delayed by `latency` seconds, or by the value in `route_latency` for its handler name.
+    Runs started without an external clock complete `run_duration` seconds after they
+    are running, if it is given. Created runs are named `run_id_prefix` followed by a counter.
+    """
+
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, api_version: str = "v2", latency: float = 0,
+                 route_latency: dict = None, status_delay: float = 0, num_inputs: int = 2, num_outputs: int = 2,
+                 run_duration: float = None, run_id_prefix: str = "run"):
+        super().__init__((host, port), MockAlfalfaHandler)
+        self.api_version = api_version
+        self.latency = latency
+        self.route_latency = route_latency or {}
+        self.status_delay = status_delay
+        self.num_inputs = num_inputs
+        self.num_outputs = num_outputs
+        self.run_duration = run_duration
+        self.run_id_prefix = run_id_prefix
+        self.lock = threading.Lock()
+        self.runs = {}
+        self.models = {}
+        self.aliases = {}
+        self.faults = {}
+        self.request_counts = Counter()
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def add_run(self, run_id: str, status: str = "RUNNING", **kwargs) -> MockRun:
+        kwargs.setdefault("num_inputs", self.num_inputs)
+        kwargs.setdefault("num_outputs", self.num_outputs)
+        run = MockRun(run_id, status, **kwargs)
+        self.runs[run_id] = run
+        return run
+
+    def fail_next(self, handler: str, *statuses: int) -> None:
+        """Answer the next requests to a handler with the given statuses and a plain text body,
+        a status of 0 closes the connection without answering"""
+        with self.lock:
+            self.faults.setdefault(handler, []).extend(statuses)
+
+    def start(self) -> "MockAlfalfaServer":
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+        self._thread.join()
@@ -0,0 +1,76 @@
+from datetime import datetime
+from time import sleep
+
+import pytest
+
+from alfalfa_client.alfalfa_client import AlfalfaClient
+from tests.mock_alfalfa import MockAlfalfaServer
+
+
+@pytest.fixture
+def alias_client(mock_server: MockAlfalfaServer):
+    with AlfalfaClient(mock_server.url, alias_ttl=60, dedupe_uploads=False) as client:
+        yield client
+
+
+def test_alias_resolved_locally(alias_client: AlfalfaClient, mock_server: MockAlfalfaServer):
+    mock_server.add_run("run")
+    alias_client.set_alias("controller", "run")
+    del mock_server.aliases["controller"]
+
+    assert alias_client.get_sim_time("controller") == datetime(2020, 1, 1)
+    assert alias_client.get_alias("controller") == "run"
+    assert mock_server.request_counts["get_alias"] == 0
+    assert alias_client.aliases.stats()["rewrites"] == 1
+
+
+def test_get_alias_cached_with_ttl(mock_server: MockAlfalfaServer):
+    mock_server.add_run("run")
+    mock_server.aliases["controller"] = "run"
+
+    with AlfalfaClient(mock_server.url, alias_ttl=0.05, dedupe_uploads=False) as client:
+        assert client.get_alias("controller") == "run"
+        assert client.get_alias("controller") == "run"
+        assert mock_server.request_counts["get_alias"] == 1
+
+        sleep(0.05)
+        client.get_alias("controller")
+        assert mock_server.request_counts["get_alias"] == 2
+
+
+def test_moved_alias_refetched(alias_client: AlfalfaClient, mock_server: MockAlfalfaServer):
+    mock_server.add_run("old")
+    mock_server.add_run("new").time = datetime(2021, 1, 1)
+    alias_client.set_alias("controller", "old")
+
+    del mock_server.runs["old"]
+    mock_server.aliases["controller"] = "new"
+
+    assert alias_client.get_sim_time("controller") == datetime(2021, 1, 1)
+    assert alias_client.aliases.lookup("controller") is None
+
+
+def test_prefetch_aliases(alias_client: AlfalfaClient, mock_server: MockAlfalfaServer):
+    for i in range(5):
+        mock_server.add_run(f"run_{i}")
+        mock_server.aliases[f"alias_{i}"] = f"run_{i}"
+
+    aliases = alias_client.prefetch_aliases(f"alias_{i}" for i in range(5))
+    alias_client.advance(list(aliases))
+
+    assert aliases == {f"alias_{i}": f"run_{i}" for i in range(5)}
+    assert mock_server.request_counts["get_alias"] == 5
+    assert alias_client.aliases.stats()["rewrites"] == 5
+
+
+def test_cache_disabled(mock_server: MockAlfalfaServer):
+    mock_server.add_run("run")
+
+    with AlfalfaClient(mock_server.url, dedupe_uploads=False) as client:
+        client.set_alias("controller", "run")
+        client.get_alias("controller")
+        client.get_sim_time("controller")
+
+        assert mock_server.request_counts["get_alias"] == 1
+        assert client.aliases.stats()["aliases"] == 0
+        assert client.aliases.stats()["rewrites"] == 0
@@ -0,0 +1,71 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+
+pytest.importorskip("aiohttp")
+
+from alfalfa_client.async_alfalfa_client import AsyncAlfalfaClient
+from alfalfa_client.lib import AlfalfaAPIException
+from tests.mock_alfalfa import MockAlfalfaServer
+
+
+def test_advance_many(mock_server: MockAlfalfaServer):
+    run_ids = [f"run_{i}" for i in range(50)]
+    for run_id in run_ids:
+        mock_server.add_run(run_id)
+
+    async def advance():
+        async with AsyncAlfalfaClient(mock_server.url, max_concurrency=8) as client:
+            await client.advance(run_ids)
+            await client.advance(run_ids[0])
+            return await client.get_sim_time(run_ids)
+
+    sim_times = asyncio.run(advance())
+
+    assert sim_times[0] == datetime(2020, 1, 1, 0, 2)
+    assert sim_times[1:] == [datetime(2020, 1, 1, 0, 1)] * 49
+
+
+def test_wait(mock_server: MockAlfalfaServer):
+    mock_server.add_run("run", status="RUNNING")
+
+    async def wait():
+        async with AsyncAlfalfaClient(mock_server.url) as client:
+            await client.wait(["run"], "running")
+            return await client.status("run")
+
+    assert asyncio.run(wait()) == "RUNNING"
+
+
+def test_run_not_found(mock_server: MockAlfalfaServer):
+    async def advance():
+        async with AsyncAlfalfaClient(mock_server.url) as client:
+            await client.advance("0000")
+
+    with pytest.raises(AlfalfaAPIException):
+        asyncio.run(advance())
+
+
+def test_set_inputs_first(mock_server: MockAlfalfaServer):
+    run = mock_server.add_run("run")
+
+    async def set_inputs():
+        async with AsyncAlfalfaClient(mock_server.url) as client:
+            await client.set_inputs("run", {"Input_0": 2.0})
+
+    asyncio.run(set_inputs())
+
+    assert run.values["run-0"] == 2.0
+
+
+def test_plain_text_error(mock_server: MockAlfalfaServer):
+    mock_server.add_run("run")
+    mock_server.fail_next("advance", 503)
+
+    async def advance():
+        async with AsyncAlfalfaClient(mock_server.url) as client:
+            await client.advance("run")
+
+    with pytest.raises(AlfalfaAPIException, match="HTTP 503 .*Service temporarily overloaded"):
+        asyncio.run(advance())
@@ -0,0 +1,147 @@
+import json
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+from alfalfa_client.cli import load_manifest, main
+from alfalfa_client.lib import AlfalfaClientException
+from tests.mock_alfalfa import MockAlfalfaServer
+
+MODEL_PATH = Path(__file__).parents[1] / "integration" / "models" / "small_office"
+
+
+@pytest.fixture
+def manifest(tmp_path: Path, monkeypatch) -> Path:
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    path = tmp_path / "manifest.json"
+    path.write_text(json.dumps({
+        "defaults": {"start_datetime": "2020-01-01 00:00:00", "end_datetime": "2020-01-02 00:00:00"},
+        "runs": [
+            {"model": str(MODEL_PATH), "name": "office", "count": 2},
+            {"model": str(MODEL_PATH), "name": "stepped", "external_clock": True, "end_datetime": "2020-01-01 00:03:00"}
+        ]
+    }))
+    return path
+
+
+def run(manifest: Path, server: MockAlfalfaServer, *args: str) -> int:
+    return main(["run", str(manifest), "--host", server.url, "--quiet", "--progress-interval", "0.05",
+                 "--summary", str(manifest.with_name("summary.json")), *args])
+
+
+def read(path: Path) -> dict:
+    return json.loads(path.read_text())
+
+
+def test_load_manifest(manifest: Path):
+    runs = load_manifest(manifest)
+
+    assert [run["key"] for run in runs] == ["office-0", "office-1", "stepped"]
+    assert runs[0]["start_datetime"] == datetime(2020, 1, 1)
+    assert runs[2]["end_datetime"] == datetime(2020, 1, 1, 0, 3)
+    assert runs[2]["external_clock"] and not runs[0]["external_clock"]
+
+
+def test_invalid_manifest(tmp_path: Path, capsys):
+    path = tmp_path / "manifest.json"
+    path.write_text(json.dumps({"runs": [{"model": str(MODEL_PATH), "start_datetime": "2020-01-01 00:00:00",
+                                          "end_datetime": "2020-01-02 00:00:00", "timestep": 60}]}))
+
+    with pytest.raises(AlfalfaClientException, match="unknown fields: timestep"):
+        load_manifest(path)
+    with pytest.raises(SystemExit) as exit:
+        main(["run", str(path)])
+    assert exit.value.code == 2
+    assert "timestep" in capsys.readouterr().err
+
+    for count in (0, -1, 1.5, "2", True):
+        path.write_text(json.dumps({"runs": [{"model": str(MODEL_PATH), "start_datetime": "2020-01-01 00:00:00",
+                                              "end_datetime": "2020-01-02 00:00:00", "count": count}]}))
+        with pytest.raises(AlfalfaClientException, match="invalid count"):
+            load_manifest(path)
+
+
+def test_run_manifest(manifest: Path, mock_server: MockAlfalfaServer):
+    mock_server.run_duration = 0.05
+
+    assert run(manifest, mock_server) == 0
+
+    state = read(manifest.with_suffix(".state.json"))["runs"]
+    assert {key: entry["stage"] for key, entry in state.items()} == {"office-0": "COMPLETE", "office-1": "COMPLETE", "stepped": "COMPLETE"}
+    assert mock_server.runs[state["stepped"]["run_id"]].time == datetime(2020, 1, 1, 0, 3)
+    assert mock_server.request_counts["upload"] == 1
+    assert mock_server.request_counts["create_run"] == 3
+    assert mock_server.request_counts["stop"] == 1
+
+    summary = read(manifest.with_name("summary.json"))
+    assert summary["manifest"]["complete"] == 3
+    assert summary["progress"]["complete"] == 3
+    assert set(summary["stage_durations"]) == {"PENDING", "SUBMITTING", "STARTING", "RUNNING", "STOPPING"}
+    assert {"SUBMITTING", "STARTING", "RUNNING"} <= set(summary["runs"][0]["durations"])
+    assert summary["requests"]["POST runs/{id}/advance"]["requests"] == 3
+
+
+def test_resume(manifest: Path, mock_server: MockAlfalfaServer):
+    mock_server.add_run("finished", "COMPLETE")
+    mock_server.add_run("detached", "COMPLETE")
+    mock_server.add_run("live", "RUNNING").queue_status("COMPLETE", 0.05)
+    manifest.with_suffix(".state.json").write_text(json.dumps({"runs": {
+        "office-0": {"run_id": "finished", "stage": "COMPLETE", "durations": {"RUNNING": 10.0}},
+        "office-1": {"run_id": "live", "stage": "RUNNING", "started": True, "durations": {"RUNNING": 10.0}},
+        "stepped": {"run_id": "detached", "stage": "RUNNING", "started": True}
+    }}))
+
+    assert run(manifest, mock_server) == 0
+
+    assert mock_server.request_counts["create_run"] == 0
+    assert mock_server.request_counts["start"] == 0
+    state = read(manifest.with_suffix(".state.json"))["runs"]
+    assert {entry["stage"] for entry in state.values()} == {"COMPLETE"}
+    assert state["office-0"]["durations"] == {"RUNNING": 10.0}
+    assert state["office-1"]["durations"]["RUNNING"] > 10.0
+
+
+def test_resume_failed(manifest: Path, mock_server: MockAlfalfaServer):
+    mock_server.run_duration = 0.05
+    mock_server.add_run("stepped", "COMPLETE")
+    manifest.with_suffix(".state.json").write_text(json.dumps({"runs": {
+        "office-0": {"run_id": "deleted", "stage": "STARTING"},
+        "office-1": {"run_id": None, "stage": "FAILED", "error": "Run errored"},
+        "stepped": {"run_id": "stepped", "stage": "COMPLETE"}
+    }}))
+
+    assert run(manifest, mock_server) == 1
+    assert mock_server.request_counts["create_run"] == 1
+    assert read(manifest.with_name("summary.json"))["manifest"]["failed"] == 1
+
+    assert run(manifest, mock_server, "--retry-failed") == 0
+    assert mock_server.request_counts["create_run"] == 2
+
+
+def test_resume_cancelled(manifest: Path, mock_server: MockAlfalfaServer):
+    mock_server.run_duration = 0.05
+    mock_server.add_run("cancelled", "READY")
+    mock_server.add_run("stepped", "COMPLETE")
+    manifest.with_suffix(".state.json").write_text(json.dumps({"runs": {
+        "office-0": {"run_id": "cancelled", "stage": "CANCELLED"},
+        "office-1": {"run_id": None, "stage": "CANCELLED"},
+        "stepped": {"run_id": "stepped", "stage": "COMPLETE"}
+    }}))
+
+    assert run(manifest, mock_server) == 0
+    assert mock_server.request_counts["create_run"] == 1
+    assert read(manifest.with_suffix(".state.json"))["runs"]["office-0"]["run_id"] == "cancelled"
+
+
+def test_resume_lookup_error(manifest: Path, mock_server: MockAlfalfaServer):
+    mock_server.add_run("live", "RUNNING")
+    manifest.with_suffix(".state.json").write_text(json.dumps({"runs": {
+        "office-0": {"run_id": "live", "stage": "RUNNING", "started": True}
+    }}))
+    mock_server.fail_next("get_run", 400)
+
+    with pytest.raises(SystemExit) as exit:
+        run(manifest, mock_server)
+    assert exit.value.code == 2
+    assert mock_server.request_counts["create_run"] == 0
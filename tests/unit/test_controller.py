@@ -0,0 +1,69 @@
+from datetime import datetime
+from time import perf_counter, sleep
+
+import pytest
+
+from alfalfa_client.alfalfa_client import AlfalfaClient
+from alfalfa_client.controller import ControllerRunner
+from alfalfa_client.lib import AlfalfaBatchException
+from tests.mock_alfalfa import MockAlfalfaServer
+
+
+def test_controller_loop(mock_client: AlfalfaClient, mock_server: MockAlfalfaServer):
+    run_ids = [f"run_{i}" for i in range(4)]
+    for run_id in run_ids:
+        mock_server.add_run(run_id)
+    seen = []
+
+    def controller(run_id, sim_time, outputs):
+        seen.append((run_id, sim_time))
+        return {"Input_0": outputs["Output_1"] + len(seen)}
+
+    runner = ControllerRunner(mock_client, run_ids, controller)
+    runner.run(2)
+
+    assert [run_id for run_id, _ in seen] == run_ids * 2
+    assert [time for _, time in seen[4:]] == [datetime(2020, 1, 1, 0, 1)] * 4
+    assert all(mock_server.runs[run_id].time == datetime(2020, 1, 1, 0, 2) for run_id in run_ids)
+    assert mock_server.runs["run_3"].values["run_3-0"] == 9.0
+
+    summary = runner.summary()
+    assert summary["steps"] == 2
+    assert runner.timings[1].requests == 4 * 4
+    assert summary["network"] > 0 and summary["server"] >= 0 and summary["controller"] > 0
+
+
+def test_io_overlaps_controller():
+    server = MockAlfalfaServer(latency=0.01).start()
+    run_ids = [f"run_{i}" for i in range(6)]
+    for run_id in run_ids:
+        server.add_run(run_id)
+
+    def controller(run_id, sim_time, outputs):
+        sleep(0.02)
+
+    try:
+        with AlfalfaClient(server.url, dedupe_uploads=False) as client:
+            durations = {}
+            for depth in (1, 2):
+                runner = ControllerRunner(client, run_ids, controller, depth=depth)
+                runner.step()
+                start = perf_counter()
+                runner.step()
+                durations[depth] = perf_counter() - start
+    finally:
+        server.stop()
+
+    assert durations[2] < durations[1] * 0.8
+
+
+def test_failed_runs_reported(mock_client: AlfalfaClient, mock_server: MockAlfalfaServer):
+    mock_server.add_run("run")
+
+    runner = ControllerRunner(mock_client, ["run", "missing"], lambda run_id, sim_time, outputs: None)
+    with pytest.raises(AlfalfaBatchException) as e:
+        runner.step()
+
+    assert list(e.value.errors) == [1]
+    assert e.value.results[0].outputs == {"Output_0": 0.0, "Output_1": 1.0}
+    assert mock_server.runs["run"].time == datetime(2020, 1, 1, 0, 1)
@@ -0,0 +1,101 @@
+import threading
+from datetime import datetime
+from pathlib import Path
+from time import sleep
+
+from alfalfa_client.alfalfa_client import AlfalfaClient
+from alfalfa_client.fleet import CANCELLED, COMPLETE, FAILED, RUNNING, RunFleet
+from tests.mock_alfalfa import MockAlfalfaServer
+
+MODEL_PATH = Path(__file__).parents[1] / "integration" / "models" / "small_office"
+START = datetime(2020, 1, 1, 0, 0)
+END = datetime(2020, 1, 2, 0, 0)
+
+
+def test_max_active(mock_client: AlfalfaClient, mock_server: MockAlfalfaServer):
+    lock = threading.Lock()
+    active = []
+    peak = []
+
+    def driver(client: AlfalfaClient, run_id: str):
+        with lock:
+            active.append(run_id)
+            peak.append(len(active))
+        client.advance(run_id)
+        sleep(0.02)
+        with lock:
+            active.remove(run_id)
+
+    updates = []
+    fleet = RunFleet(mock_client, max_active=2, on_update=lambda run, progress: updates.append((run.key, run.stage)))
+    for _ in range(6):
+        fleet.add(MODEL_PATH, START, END, external_clock=True, driver=driver)
+
+    runs = fleet.run()
+
+    assert [run.stage for run in runs] == [COMPLETE] * 6
+    assert max(peak) == 2
+    assert mock_server.request_counts["upload"] == 1
+    assert all(mock_server.runs[run.run_id].time > START for run in runs)
+    assert ("0", RUNNING) in updates and ("0", COMPLETE) in updates
+    assert set(runs[0].stage_durations()) == {"PENDING", "SUBMITTING", "STARTING", "RUNNING", "STOPPING"}
+
+    progress = fleet.progress()
+    assert progress.stages[COMPLETE] == 6
+    assert progress.active == 0
+    assert progress.runs_per_hour > 0
+
+
+def test_runs_complete_without_driver(mock_client: AlfalfaClient, mock_server: MockAlfalfaServer):
+    mock_server.run_duration = 0.05
+    fleet = RunFleet(mock_client)
+    for _ in range(3):
+        fleet.add(MODEL_PATH, START, END)
+
+    runs = fleet.run()
+
+    assert [run.stage for run in runs] == [COMPLETE] * 3
+    assert mock_server.request_counts["stop"] == 0
+
+
+def test_priority_and_failures(mock_client: AlfalfaClient, mock_server: MockAlfalfaServer):
+    order = []
+    fleet = RunFleet(mock_client, max_active=1)
+    fleet.add(MODEL_PATH, START, END, external_clock=True, priority=2, key="late", driver=lambda client, run_id: order.append("late"))
+    fleet.add(MODEL_PATH, START, END, external_clock=True, priority=1, key="early", driver=lambda client, run_id: order.append("early"))
+    missing = fleet.add(MODEL_PATH, START, END, external_clock=True, run_id="missing")
+
+    fleet.run()
+
+    assert order == ["early", "late"]
+    assert missing.stage == FAILED
+    assert missing.error is not None
+
+
+def test_resume_and_cancel(mock_client: AlfalfaClient, mock_server: MockAlfalfaServer):
+    mock_server.add_run("existing", status="RUNNING")
+    fleet = RunFleet(mock_client, max_active=1)
+    existing = fleet.add(MODEL_PATH, START, END, external_clock=True, run_id="existing", started=True,
+                         driver=lambda client, run_id: fleet.cancel())
+    skipped = fleet.add(MODEL_PATH, START, END, external_clock=True)
+
+    fleet.run()
+
+    assert existing.stage == COMPLETE
+    assert skipped.stage == CANCELLED
+    assert mock_server.request_counts["create_upload"] == 0
+    assert mock_server.request_counts["start"] == 0
+    assert str(fleet.progress()).startswith("2/2 finished (1 complete, 0 failed)")
+
+
+def test_stop_after_start_timeout(mock_client: AlfalfaClient, mock_server: MockAlfalfaServer):
+    mock_server.status_delay = 5
+    mock_server.add_run("slow", status="READY")
+    fleet = RunFleet(mock_client, stage_timeout=0.3)
+    run = fleet.add(MODEL_PATH, START, END, external_clock=True, run_id="slow")
+
+    fleet.run()
+
+    assert run.stage == FAILED
+    assert run.started
+    assert mock_server.request_counts["stop"] == 1
@@ -0,0 +1,50 @@
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).parents[2]
+LAZY_MODULES = {"requests", "urllib3", "requests_toolbelt", "asyncio", "concurrent.futures", "zipfile", "tempfile", "json", "hashlib"}
+
+# Cumulative microseconds reported by `python -X importtime` for `import alfalfa_client`
+IMPORT_BUDGET_US = int(os.environ.get("ALFALFA_IMPORT_BUDGET_US", 80000))
+
+
+def imported_modules(code: str) -> set:
+    result = subprocess.run([sys.executable, "-c", f"{code}\nimport sys\nprint('\\n'.join(sys.modules))"],
+                            cwd=ROOT, capture_output=True, text=True, check=True)
+    return set(result.stdout.split())
+
+
+def import_time_us(module: str) -> int:
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=ROOT, capture_output=True, text=True, check=True)
+    for line in result.stderr.splitlines():
+        _, _, cumulative, name = (part.strip() for part in line.replace("import time:", "|").split("|"))
+        if name == module:
+            return int(cumulative)
+    raise AssertionError(f"{module} missing from importtime output")
+
+
+def test_import_is_lazy():
+    baseline = imported_modules("pass")
+
+    imported = imported_modules("import alfalfa_client") - baseline
+
+    assert "alfalfa_client.alfalfa_client" in imported
+    assert not imported & LAZY_MODULES
+
+
+def test_machinery_loaded_on_use():
+    imported = imported_modules("from alfalfa_client import AlfalfaClient\n"
+                                "client = AlfalfaClient(json_codec='json')\n"
+                                "client.session, client.executor")
+
+    assert {"requests", "concurrent.futures", "json"} <= imported
+
+
+def test_import_time_budget():
+    import_time = statistics.median(import_time_us("alfalfa_client") for _ in range(5))
+
+    assert import_time < IMPORT_BUDGET_US, f"import alfalfa_client took {import_time} us, budget is {IMPORT_BUDGET_US} us"
@@ -0,0 +1,43 @@
+from datetime import datetime
+
+import pytest
+
+from alfalfa_client.alfalfa_client import AlfalfaClient
+from alfalfa_client.lib import AlfalfaBatchException
+from alfalfa_client.lockstep import PhaseTimer
+from tests.mock_alfalfa import MockAlfalfaServer
+
+
+def test_step(mock_client: AlfalfaClient, mock_server: MockAlfalfaServer):
+    run_ids = [f"run_{i}" for i in range(10)]
+    for run_id in run_ids:
+        mock_server.add_run(run_id)
+
+    results = mock_client.step(run_ids, {"run_0": {"Input_0": 5}})
+
+    assert list(results) == run_ids
+    assert all(result.sim_time == datetime(2020, 1, 1, 0, 1) for result in results.values())
+    assert results["run_0"].outputs == {"Output_0": 0.0, "Output_1": 1.0}
+    assert mock_server.runs["run_0"].values["run_0-0"] == 5
+
+    summary = mock_client.lockstep.timer.summary()
+    assert set(summary) == {"set_inputs", "advance", "get_sim_time", "get_outputs", "run", "step"}
+    assert summary["advance"]["p50"] <= summary["advance"]["p99"]
+
+
+def test_step_failure(mock_client: AlfalfaClient, mock_server: MockAlfalfaServer):
+    mock_server.add_run("run")
+
+    with pytest.raises(AlfalfaBatchException) as exc_info:
+        mock_client.step(["run", "0000"])
+
+    assert exc_info.value.results[0].sim_time == datetime(2020, 1, 1, 0, 1)
+
+
+def test_percentiles():
+    timer = PhaseTimer(window=100)
+    for i in range(1, 201):
+        timer.record("advance", i)
+
+    assert timer.percentiles("advance") == {"p50": 150, "p90": 190, "p99": 199}
+    assert timer.percentiles("get_outputs") == {}
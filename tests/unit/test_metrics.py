@@ -0,0 +1,66 @@
+import pytest
+
+from alfalfa_client.alfalfa_client import AlfalfaClient
+from alfalfa_client.lib import AlfalfaAPIException
+from alfalfa_client.metrics import (
+    RequestHook,
+    RequestMetrics,
+    endpoint_template
+)
+from tests.mock_alfalfa import MockAlfalfaServer
+
+
+def test_endpoint_template():
+    assert endpoint_template("runs/abc/advance") == "runs/{id}/advance"
+    assert endpoint_template("runs/abc") == "runs/{id}"
+    assert endpoint_template("models/upload") == "models/upload"
+    assert endpoint_template("models/abc/createRun") == "models/{id}/createRun"
+    assert endpoint_template("aliases/test") == "aliases/{alias}"
+
+
+def test_request_metrics(mock_client: AlfalfaClient, mock_server: MockAlfalfaServer):
+    mock_server.add_run("run")
+    metrics = RequestMetrics()
+    mock_client.add_request_hook(metrics)
+
+    mock_client.advance(["run", "run"])
+    mock_client.get_outputs("run")
+    with pytest.raises(AlfalfaAPIException):
+        mock_client.advance("0000")
+
+    snapshot = metrics.snapshot()
+    advance = snapshot["POST runs/{id}/advance"]
+    assert advance["requests"] == 3
+    assert advance["errors"] == 1
+    assert advance["in_flight"] == 0
+    assert advance["histogram"][float("inf")] == 3
+    assert snapshot["POST runs/{id}/points/values"]["response_bytes"] > 0
+    assert snapshot["POST runs/{id}/points/values"]["request_bytes"] > 0
+    assert snapshot["GET runs/{id}/points"]["requests"] == 1
+
+    text = metrics.to_prometheus()
+    assert 'alfalfa_client_requests_total{method="POST",endpoint="runs/{id}/advance"} 3' in text
+    assert 'alfalfa_client_request_duration_seconds_bucket{method="POST",endpoint="runs/{id}/advance",le="+Inf"} 3' in text
+
+    mock_client.remove_request_hook(metrics)
+    mock_client.advance("run")
+    assert metrics.snapshot()["POST runs/{id}/advance"]["requests"] == 3
+
+
+def test_connection_error_recorded():
+    class Recorder(RequestHook):
+        def __init__(self):
+            self.records = []
+
+        def request_finished(self, record):
+            self.records.append(record)
+
+    recorder = Recorder()
+    client = AlfalfaClient("http://127.0.0.1:1")
+    client.add_request_hook(recorder)
+
+    with pytest.raises(Exception):
+        client.advance("run")
+
+    assert recorder.records[0].error is not None
+    assert recorder.records[0].failed
@@ -0,0 +1,109 @@
+import shutil
+from pathlib import Path
+from time import monotonic
+
+from alfalfa_client.alfalfa_client import AlfalfaClient
+from alfalfa_client.model_cache import (
+    ModelCache,
+    hash_model,
+    shared_model_cache
+)
+from tests.mock_alfalfa import MockAlfalfaServer
+
+MODEL_PATH = Path(__file__).parents[1] / "integration" / "models" / "small_office"
+
+
+def test_hash_model(tmp_path: Path):
+    model_copy = tmp_path / "model"
+    shutil.copytree(MODEL_PATH, model_copy)
+
+    assert hash_model(MODEL_PATH) == hash_model(model_copy)
+
+    (model_copy / "workflow.osw").write_text("{}")
+    assert hash_model(MODEL_PATH) != hash_model(model_copy)
+
+
+def test_cache_persists(tmp_path: Path):
+    cache = ModelCache(tmp_path / "models.json")
+    cache.put("http://localhost", "abc", "model_0")
+
+    reloaded = ModelCache(tmp_path / "models.json")
+    assert reloaded.get("http://localhost", "abc") == "model_0"
+    assert reloaded.get("http://otherhost", "abc") is None
+
+    reloaded.discard("http://localhost", "abc")
+    assert ModelCache(tmp_path / "models.json").get("http://localhost", "abc") is None
+
+
+def test_caches_merge_entries(tmp_path: Path):
+    first = ModelCache(tmp_path / "models.json")
+    second = ModelCache(tmp_path / "models.json")
+    first.put("http://localhost", "a", "model_a")
+    second.put("http://localhost", "b", "model_b")
+
+    assert second.get("http://localhost", "a") == "model_a"
+    reloaded = ModelCache(tmp_path / "models.json")
+    assert reloaded.get("http://localhost", "a") == "model_a"
+    assert reloaded.get("http://localhost", "b") == "model_b"
+
+    first.discard("http://localhost", "b")
+    assert len(ModelCache(tmp_path / "models.json")) == 1
+
+
+def test_shared_model_cache(tmp_path: Path, monkeypatch, mock_server: MockAlfalfaServer):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    assert shared_model_cache(tmp_path / "models.json") is shared_model_cache(tmp_path / "." / "models.json")
+
+    with AlfalfaClient(mock_server.url) as first, AlfalfaClient(mock_server.url) as second:
+        assert first.model_cache is second.model_cache
+        first.submit([str(MODEL_PATH)] * 2, wait_for_status=False)
+        second.submit(str(MODEL_PATH), wait_for_status=False)
+
+    assert mock_server.request_counts["upload"] == 1
+
+
+def test_cache_size_limit(tmp_path: Path):
+    cache = ModelCache(tmp_path / "models.json", max_entries=2)
+    cache.put("http://localhost", "a", "model_a")
+    cache.put("http://localhost", "b", "model_b")
+    cache.get("http://localhost", "a")
+    cache.put("http://localhost", "c", "model_c")
+
+    assert len(cache) == 2
+    assert cache.get("http://localhost", "b") is None
+    assert cache.get("http://localhost", "a") == "model_a"
+
+
+def test_submit_skips_upload(mock_client: AlfalfaClient, mock_server: MockAlfalfaServer):
+    run_ids = mock_client.submit([str(MODEL_PATH)] * 5)
+
+    assert len(set(run_ids)) == 5
+    assert mock_server.request_counts["upload"] == 1
+
+
+def test_submit_waits_for_runs_together(mock_client: AlfalfaClient, mock_server: MockAlfalfaServer):
+    mock_server.status_delay = 0.3
+    mock_client.submit(str(MODEL_PATH))
+
+    start = monotonic()
+    mock_client.submit([str(MODEL_PATH)] * 4)
+
+    assert monotonic() - start < 1.0
+    assert mock_server.request_counts["upload"] == 1
+
+
+def test_submit_stale_model(mock_client: AlfalfaClient, mock_server: MockAlfalfaServer):
+    mock_client.submit(str(MODEL_PATH))
+    mock_server.models.clear()
+
+    mock_client.submit(str(MODEL_PATH))
+
+    assert mock_server.request_counts["upload"] == 2
+    assert len(mock_server.models) == 1
+
+
+def test_submit_without_dedupe(mock_server: MockAlfalfaServer):
+    with AlfalfaClient(mock_server.url, dedupe_uploads=False) as client:
+        client.submit([str(MODEL_PATH)] * 2)
+
+    assert mock_server.request_counts["upload"] == 2
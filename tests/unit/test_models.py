@@ -0,0 +1,43 @@
+from alfalfa_client.alfalfa_client import AlfalfaClient
+from alfalfa_client.models import Point, Run
+from tests.mock_alfalfa import MockAlfalfaServer
+
+POINTS = [
+    {"id": "a", "name": "Zone Temperature", "type": "OUTPUT", "units": "C"},
+    {"id": "b", "name": "Setpoint", "type": "INPUT"},
+    {"id": "c", "name": "Damper", "type": "BIDIRECTIONAL", "units": "%"},
+]
+
+
+def test_point_metadata():
+    point = Point.from_dict(POINTS[0])
+
+    assert not hasattr(point, "__dict__")
+    assert point.get("units") == "C"
+    assert point.get("tags", []) == []
+    assert point.to_dict() == POINTS[0]
+    assert Point.from_dict(POINTS[1]).metadata is None
+
+
+def test_run_lookup():
+    run = Run.from_payload("run", POINTS)
+
+    assert len(run) == 3
+    assert "Setpoint" in run
+    assert run.point("Setpoint").id == "b"
+    assert run.point_by_id("c").name == "Damper"
+    assert run.point("missing") is None
+    assert [point.id for point in run.inputs] == ["b", "c"]
+    assert [point.id for point in run.outputs] == ["a", "c"]
+    assert [point.id for point in run.of_type("OUTPUT")] == ["a"]
+
+
+def test_get_points(mock_client: AlfalfaClient, mock_server: MockAlfalfaServer):
+    mock_server.add_run("run").add_point("Fan", "BIDIRECTIONAL", units="W")
+
+    run = mock_client.get_points("run")
+
+    assert run.point("Fan").get("units") == "W"
+    assert mock_client.get_inputs("run") == ["Input_0", "Input_1", "Fan"]
+    assert mock_client.points.get_point("run", "Output_1").type == "OUTPUT"
+    assert mock_server.request_counts["get_points"] == 1
@@ -0,0 +1,90 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from alfalfa_client.alfalfa_client import AlfalfaClient
+from alfalfa_client.lib import (
+    AlfalfaAPIException,
+    AlfalfaBatchException,
+    parallelize
+)
+from tests.mock_alfalfa import MockAlfalfaServer
+
+
+class Counter:
+    def __init__(self, executor=None, max_concurrency=None):
+        self.executor = executor or ThreadPoolExecutor(max_workers=8)
+        self.max_concurrency = max_concurrency
+        self.lock = threading.Lock()
+        self.active = 0
+        self.peak = 0
+
+    @parallelize
+    def square(self, value: int) -> int:
+        with self.lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        threading.Event().wait(0.01)
+        with self.lock:
+            self.active -= 1
+        if value < 0:
+            raise ValueError(value)
+        return value * value
+
+    @parallelize
+    def nested(self, values: list) -> list:
+        return self.square(values)
+
+
+def test_results_ordered():
+    assert Counter().square(list(range(20))) == [i * i for i in range(20)]
+    assert Counter().square(3) == 9
+
+
+def test_max_concurrency():
+    counter = Counter(max_concurrency=2)
+    counter.square(list(range(10)))
+
+    assert counter.peak <= 2
+
+
+def test_failures_do_not_cancel_batch():
+    with pytest.raises(AlfalfaBatchException) as exc_info:
+        Counter().square([1, -2, 3, -4])
+
+    assert exc_info.value.results == [1, None, 9, None]
+    assert set(exc_info.value.errors) == {1, 3}
+    assert isinstance(exc_info.value.errors[1], ValueError)
+
+
+def test_nested_list_calls():
+    counter = Counter(executor=ThreadPoolExecutor(max_workers=1))
+
+    assert counter.nested([[1, 2], [3]]) == [[1, 4], [9]]
+
+
+def test_client_reuses_executor(mock_client: AlfalfaClient, mock_server: MockAlfalfaServer):
+    mock_server.add_run("run")
+    executor = mock_client.executor
+
+    mock_client.advance(["run", "run"])
+    with pytest.raises(AlfalfaBatchException) as exc_info:
+        mock_client.advance(["run", "0000"])
+
+    assert mock_client.executor is executor, "Client created a new executor between list calls"
+    assert isinstance(exc_info.value.errors[1], AlfalfaAPIException)
+    assert mock_server.runs["run"].time.minute == 3
+
+
+def test_injected_executor(mock_server: MockAlfalfaServer):
+    mock_server.add_run("run")
+    executor = ThreadPoolExecutor(max_workers=2)
+    client = AlfalfaClient(mock_server.url, executor=executor)
+
+    client.advance(["run", "run"])
+    client.close()
+
+    assert client.executor is executor
+    assert executor.submit(lambda: 1).result() == 1, "Injected executor was shut down by the client"
+    executor.shutdown()
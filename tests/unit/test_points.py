@@ -0,0 +1,123 @@
+import pytest
+
+from alfalfa_client.alfalfa_client import AlfalfaClient
+from alfalfa_client.lib import AlfalfaBatchException, AlfalfaClientException
+from alfalfa_client.points import PointCache
+from tests.mock_alfalfa import MockAlfalfaServer
+
+
+class FakeFetch:
+    def __init__(self):
+        self.calls = []
+        self.points = {}
+
+    def __call__(self, run_id):
+        self.calls.append(run_id)
+        return self.points.get(run_id, [{"id": f"{run_id}-0", "name": "Point_0"}])
+
+
+def test_lookup():
+    fetch = FakeFetch()
+    cache = PointCache(fetch)
+
+    assert cache.get_id("run", "Point_0") == "run-0"
+    assert cache.get_name("run", "run-0") == "Point_0"
+    assert fetch.calls == ["run"]
+    assert cache.stats() == {"hits": 1, "misses": 1, "negative_hits": 0, "fetches": 1, "evictions": 0, "runs": 1}
+
+
+def test_negative_cache():
+    fetch = FakeFetch()
+    cache = PointCache(fetch, negative_ttl=60)
+
+    assert cache.get_id("run", "Unknown") is None
+    assert cache.get_id("run", "Unknown") is None
+    assert cache.get_id("run", "Unknown") is None
+
+    assert fetch.calls == ["run"]
+    assert cache.stats()["negative_hits"] == 2
+
+
+def test_refetch_on_unknown_name():
+    fetch = FakeFetch()
+    cache = PointCache(fetch, negative_ttl=0)
+    cache.get_id("run", "Point_0")
+
+    fetch.points["run"] = [{"id": "run-0", "name": "Point_0"}, {"id": "run-1", "name": "Point_1"}]
+
+    assert cache.get_id("run", "Point_1") == "run-1"
+    assert fetch.calls == ["run", "run"]
+
+
+def test_lru_eviction():
+    fetch = FakeFetch()
+    cache = PointCache(fetch, max_runs=2)
+    cache.get_id("run_0", "Point_0")
+    cache.get_id("run_1", "Point_0")
+    cache.get_id("run_0", "Point_0")
+    cache.get_id("run_2", "Point_0")
+    cache.get_id("run_0", "Point_0")
+
+    assert fetch.calls == ["run_0", "run_1", "run_2"]
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["runs"] == 2
+
+
+def test_ttl():
+    fetch = FakeFetch()
+    cache = PointCache(fetch, ttl=0)
+    cache.get_id("run", "Point_0")
+    cache.get_id("run", "Point_0")
+
+    assert fetch.calls == ["run", "run"]
+
+
+def test_client_points(mock_client: AlfalfaClient, mock_server: MockAlfalfaServer):
+    mock_server.add_run("run")
+
+    mock_client.set_inputs("run", {"Input_0": 1, "Input_1": 2})
+    assert mock_client.get_outputs("run") == {"Output_0": 0.0, "Output_1": 1.0}
+    with pytest.raises(AlfalfaClientException):
+        mock_client.set_inputs("run", {"Unknown": 1})
+    assert mock_server.request_counts["get_points"] == 2
+
+    mock_client.stop("run", wait_for_status=False)
+    assert mock_client.points.stats()["runs"] == 0
+
+
+def test_point_handle(mock_client: AlfalfaClient, mock_server: MockAlfalfaServer):
+    mock_server.add_run("run")
+    handle = mock_client.compile_points("run", inputs=["Input_1", "Input_0"], outputs=["Output_1", "Output_0"])
+
+    handle.write([3, 4])
+    assert mock_server.runs["run"].values["run-1"] == 3
+    assert mock_server.runs["run"].values["run-0"] == 4
+
+    assert handle.read() == (1.0, 0.0)
+    assert handle.read(as_numpy=True).tolist() == [1.0, 0.0]
+    assert mock_server.request_counts["get_points"] == 1
+
+    with pytest.raises(AlfalfaClientException):
+        handle.write([1])
+    with pytest.raises(AlfalfaClientException):
+        mock_client.compile_points("run", outputs=["Unknown"])
+
+
+def test_many_runs(mock_client: AlfalfaClient, mock_server: MockAlfalfaServer):
+    run_ids = [f"run_{i}" for i in range(20)]
+    for run_id in run_ids:
+        mock_server.add_run(run_id)
+
+    mock_client.set_inputs_many({run_id: {"Input_0": i} for i, run_id in enumerate(run_ids)})
+    outputs = mock_client.get_outputs_many(run_ids)
+
+    assert list(outputs) == run_ids
+    assert all(run_outputs == {"Output_0": 0.0, "Output_1": 1.0} for run_outputs in outputs.values())
+    assert [mock_server.runs[run_id].values[f"{run_id}-0"] for run_id in run_ids] == list(range(20))
+    assert list(mock_client.get_outputs_many(run_id for run_id in run_ids)) == run_ids
+    mock_client.set_inputs_many((run_id, {"Input_0": -1}) for run_id in run_ids)
+    assert mock_server.runs[run_ids[-1]].values[f"{run_ids[-1]}-0"] == -1
+
+    with pytest.raises(AlfalfaBatchException) as exc_info:
+        mock_client.get_outputs_many(["run_0", "0000"])
+    assert exc_info.value.results[0] == {"Output_0": 0.0, "Output_1": 1.0}
@@ -0,0 +1,78 @@
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from alfalfa_client.alfalfa_client import AlfalfaClient
+from alfalfa_client.lib import AlfalfaClientException
+from alfalfa_client.recorder import OutputRecorder
+from tests.mock_alfalfa import MockAlfalfaServer
+
+
+def test_record(mock_client: AlfalfaClient, mock_server: MockAlfalfaServer):
+    mock_server.add_run("run")
+    recorder = OutputRecorder(mock_client, "run", capacity=2)
+
+    for _ in range(5):
+        mock_client.advance("run")
+        recorder.record()
+
+    assert recorder.points == ["Output_0", "Output_1"]
+    assert len(recorder) == 5
+    assert recorder.times[-1] == np.datetime64(datetime(2020, 1, 1, 0, 5))
+    assert recorder.values.tolist() == [[0.0, 1.0]] * 5
+    assert np.shares_memory(recorder.values, recorder._buffer), "values is not a view of the buffer"
+
+
+def test_append_missing_points(mock_client: AlfalfaClient, mock_server: MockAlfalfaServer):
+    mock_server.add_run("run")
+    recorder = OutputRecorder(mock_client, "run", points=["Output_1", "Unknown"])
+
+    recorder.append(datetime(2020, 1, 1), {"Output_1": 2.0})
+
+    assert recorder.values[0, 0] == 2.0
+    assert np.isnan(recorder.values[0, 1])
+
+
+def test_memory_mapped(mock_client: AlfalfaClient, mock_server: MockAlfalfaServer, tmp_path):
+    mock_server.add_run("run")
+    path = tmp_path / "outputs.bin"
+    recorder = OutputRecorder(mock_client, "run", capacity=1, path=path)
+
+    for minute in range(3):
+        recorder.append(datetime(2020, 1, 1, 0, minute), {"Output_0": minute, "Output_1": -minute})
+    recorder.close()
+    with pytest.raises(AlfalfaClientException, match="closed"):
+        recorder.append(datetime(2020, 1, 1, 0, 3), {"Output_0": 3})
+    assert isinstance(recorder._buffer, np.memmap)
+    assert recorder.values[:, 0].tolist() == [0, 1, 2]
+
+    loaded = OutputRecorder.load(path, recorder.points)
+    assert len(loaded) == 3
+    assert loaded["values"][:, 0].tolist() == [0, 1, 2]
+    assert loaded["time"][2] == np.datetime64(datetime(2020, 1, 1, 0, 2))
+
+
+def test_memory_mapped_empty(mock_client: AlfalfaClient, mock_server: MockAlfalfaServer, tmp_path):
+    mock_server.add_run("run")
+    path = tmp_path / "outputs.bin"
+    recorder = OutputRecorder(mock_client, "run", path=path)
+    recorder.close()
+
+    assert len(recorder.times) == 0
+    loaded = OutputRecorder.load(path, recorder.points)
+    assert len(loaded) == 0
+    assert loaded.dtype == recorder.dtype
+
+
+def test_to_dataframe(mock_client: AlfalfaClient, mock_server: MockAlfalfaServer):
+    pytest.importorskip("pandas")
+    mock_server.add_run("run")
+    recorder = OutputRecorder(mock_client, "run")
+    recorder.record()
+
+    df = recorder.to_dataframe()
+
+    assert list(df.columns) == ["Output_0", "Output_1"]
+    assert df.index[0] == datetime(2020, 1, 1)
+    assert np.shares_memory(df.to_numpy(), recorder._buffer), "dataframe copied the buffer"
@@ -0,0 +1,101 @@
+import pytest
+from requests.exceptions import ConnectionError
+from urllib3.exceptions import ProtocolError
+
+from alfalfa_client.alfalfa_client import AlfalfaClient
+from alfalfa_client.lib import AlfalfaAPIException, AlfalfaCircuitOpenException
+from alfalfa_client.metrics import RequestMetrics
+from alfalfa_client.retry import CircuitBreaker, RetryBudget, RetryPolicy
+from tests.mock_alfalfa import MockAlfalfaServer
+
+
+@pytest.fixture
+def retry_client(mock_server: MockAlfalfaServer):
+    policy = RetryPolicy(backoff=0.001, circuit_breaker=CircuitBreaker(failure_threshold=3, reset_timeout=0.1))
+    with AlfalfaClient(mock_server.url, retry_policy=policy, dedupe_uploads=False) as client:
+        yield client
+
+
+def test_idempotent_requests_retried(retry_client: AlfalfaClient, mock_server: MockAlfalfaServer):
+    mock_server.add_run("run")
+    mock_server.fail_next("get_time", 502, 504)
+    metrics = RequestMetrics()
+    retry_client.add_request_hook(metrics)
+
+    assert retry_client.get_sim_time("run").minute == 0
+    assert metrics.snapshot()["GET runs/{id}/time"]["retries"] == 2
+
+
+def test_connection_reset_retried(retry_client: AlfalfaClient, mock_server: MockAlfalfaServer):
+    mock_server.add_run("run")
+    mock_server.fail_next("get_time", 0)
+
+    assert retry_client.get_sim_time("run").minute == 0
+    assert mock_server.request_counts["get_time"] == 2
+    assert RetryPolicy().should_retry(1, "GET", "runs/{id}", error=ConnectionError(ProtocolError("Connection aborted.")))
+    assert not RetryPolicy().should_retry(1, "POST", "runs/{id}/advance", error=ConnectionError(ProtocolError("Connection aborted.")))
+
+
+def test_advance_not_retried_when_ambiguous(retry_client: AlfalfaClient, mock_server: MockAlfalfaServer):
+    mock_server.add_run("run")
+    mock_server.fail_next("advance", 502)
+
+    with pytest.raises(AlfalfaAPIException, match="HTTP 502 .*Service temporarily overloaded"):
+        retry_client.advance("run")
+    assert mock_server.request_counts["advance"] == 1
+
+
+def test_advance_retried_when_shed(retry_client: AlfalfaClient, mock_server: MockAlfalfaServer):
+    mock_server.add_run("run")
+    mock_server.fail_next("advance", 503, 429)
+
+    retry_client.advance("run")
+
+    assert mock_server.request_counts["advance"] == 3
+    assert mock_server.runs["run"].time.minute == 1
+
+
+def test_gives_up_after_max_attempts(retry_client: AlfalfaClient, mock_server: MockAlfalfaServer):
+    mock_server.add_run("run")
+    mock_server.fail_next("get_time", 429, 429, 429, 429, 429)
+
+    with pytest.raises(AlfalfaAPIException):
+        retry_client.get_sim_time("run")
+    assert mock_server.request_counts["get_time"] == 4
+
+
+def test_circuit_breaker(retry_client: AlfalfaClient, mock_server: MockAlfalfaServer):
+    mock_server.add_run("run")
+    mock_server.fail_next("advance", 500, 500, 500)
+    for _ in range(3):
+        with pytest.raises(AlfalfaAPIException):
+            retry_client.advance("run")
+
+    with pytest.raises(AlfalfaCircuitOpenException):
+        retry_client.advance("run")
+    assert mock_server.request_counts["advance"] == 3
+
+    retry_client.retry_policy.circuit_breaker.reset_timeout = 0
+    retry_client.advance("run")
+    assert not retry_client.retry_policy.circuit_breaker.open
+
+
+def test_retry_budget():
+    budget = RetryBudget(ratio=0.5, max_tokens=1)
+    assert budget.withdraw()
+    assert not budget.withdraw()
+    budget.deposit()
+    budget.deposit()
+    assert budget.withdraw()
+
+
+def test_connection_refused_retried():
+    policy = RetryPolicy(max_attempts=3, backoff=0.001)
+    metrics = RequestMetrics()
+    client = AlfalfaClient("http://127.0.0.1:1", retry_policy=policy)
+    client.add_request_hook(metrics)
+
+    with pytest.raises(Exception):
+        client.advance("run")
+
+    assert metrics.snapshot()["POST runs/{id}/advance"]["requests"] == 3
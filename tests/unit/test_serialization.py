@@ -0,0 +1,53 @@
+import importlib.util
+
+import numpy as np
+import pytest
+
+from alfalfa_client.alfalfa_client import AlfalfaClient
+from alfalfa_client.lib import AlfalfaClientException
+from alfalfa_client.serialization import CODECS, JSONCodec, get_codec
+from tests.mock_alfalfa import MockAlfalfaServer
+
+INSTALLED_CODECS = [name for name in CODECS if name == "json" or importlib.util.find_spec(name)]
+
+
+@pytest.mark.parametrize("name", INSTALLED_CODECS)
+def test_decode(name: str):
+    codec = get_codec(name)
+
+    run = codec.decode_run(b'{"payload": {"id": "run", "status": "RUNNING", "errorLog": "", "extra": [1, 2]}}')
+    assert (run.id, run.status, run.error_log) == ("run", "RUNNING", "")
+    run = codec.decode_run(b'{"payload": {"status": "ERROR", "errorLog": null}}', "requested")
+    assert (run.id, run.status, run.error_log) == ("requested", "ERROR", None)
+    assert codec.decode_time(b'{"payload": {"time": "2020-01-01 00:00:00"}}') == "2020-01-01 00:00:00"
+    assert codec.decode_values(b'{"payload": {"a": 1.5, "b": null}}') == {"a": 1.5, "b": None}
+    assert codec.decode_points(b'{"payload": [{"id": "a", "name": "A"}]}') == [{"id": "a", "name": "A"}]
+
+
+@pytest.mark.parametrize("name", INSTALLED_CODECS)
+def test_encode_numpy(name: str):
+    codec = get_codec(name)
+
+    assert codec.loads(codec.dumps({"a": np.float32(1.5), "b": np.int64(2), "c": np.arange(2)})) == {"a": 1.5, "b": 2, "c": [0, 1]}
+
+
+def test_get_codec():
+    codec = JSONCodec()
+    assert get_codec(codec) is codec
+    assert get_codec().name == INSTALLED_CODECS[0]
+
+    with pytest.raises(AlfalfaClientException):
+        get_codec("yaml")
+
+
+@pytest.mark.parametrize("name", INSTALLED_CODECS)
+def test_client_codec(name: str, mock_server: MockAlfalfaServer):
+    mock_server.add_run("run")
+
+    with AlfalfaClient(mock_server.url, json_codec=name, dedupe_uploads=False) as client:
+        client.set_inputs("run", {"Input_0": np.float64(2.0)})
+
+        assert client.codec.name == name
+        assert client.status("run") == "RUNNING"
+        assert client.get_outputs("run") == {"Output_0": 0.0, "Output_1": 1.0}
+        assert mock_server.runs["run"].values["run-0"] == 2.0
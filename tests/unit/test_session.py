@@ -0,0 +1,33 @@
+from alfalfa_client.alfalfa_client import AlfalfaClient
+from tests.mock_alfalfa import MockAlfalfaServer
+
+
+def test_session_is_reused(mock_client: AlfalfaClient, mock_server: MockAlfalfaServer):
+    mock_server.add_run("run")
+    session = mock_client.session
+
+    mock_client.advance("run")
+    mock_client.advance(["run", "run"])
+
+    assert mock_client.session is session, "Client opened a new session between requests"
+    assert mock_client.get_sim_time("run").minute == 3
+
+
+def test_pool_size():
+    client = AlfalfaClient("http://localhost", pool_size=3)
+    adapter = client.session.get_adapter("http://localhost")
+
+    assert adapter._pool_maxsize == 3
+    assert adapter._pool_connections == 3
+
+
+def test_close(mock_server: MockAlfalfaServer):
+    mock_server.add_run("run")
+    with AlfalfaClient(mock_server.url) as client:
+        client.advance("run")
+        session = client.session
+    assert client._session is None, "Session was not released on exit"
+
+    client.advance("run")
+    assert client.session is not session, "Client did not reopen a session after close"
+    client.close()
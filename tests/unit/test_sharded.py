@@ -0,0 +1,109 @@
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+from requests.exceptions import ConnectionError
+
+from alfalfa_client.lib import AlfalfaClientException
+from alfalfa_client.model_cache import ModelCache
+from alfalfa_client.sharded import ShardedAlfalfaClient
+from tests.mock_alfalfa import MockAlfalfaServer
+
+MODEL_PATH = Path(__file__).parents[1] / "integration" / "models" / "small_office"
+
+
+@pytest.fixture
+def servers():
+    servers = [MockAlfalfaServer(run_id_prefix="a").start(), MockAlfalfaServer(run_id_prefix="b").start()]
+    yield servers
+    for server in servers:
+        server.stop()
+
+
+@pytest.fixture
+def sharded_client(servers, tmp_path):
+    with ShardedAlfalfaClient([server.url for server in servers], model_cache=ModelCache(tmp_path / "models.json")) as client:
+        yield client
+
+
+def test_submit_spread_and_routed(sharded_client: ShardedAlfalfaClient, servers):
+    run_ids = sharded_client.submit([MODEL_PATH] * 4)
+
+    assert [len(server.runs) for server in servers] == [2, 2]
+    assert [shard.active_runs for shard in sharded_client.shards] == [2, 2]
+
+    sharded_client.start(run_ids, datetime(2020, 1, 1), datetime(2020, 1, 2), external_clock=True)
+    sharded_client.advance(run_ids)
+    results = sharded_client.step(run_ids, {run_id: {"Input_0": 1.0} for run_id in run_ids})
+
+    for run_id in run_ids:
+        server = next(server for server in servers if sharded_client.host_of(run_id) == server.url)
+        assert server.runs[run_id].time == datetime(2020, 1, 1, 0, 2)
+        assert results[run_id].outputs == {"Output_0": 0.0, "Output_1": 1.0}
+
+    sharded_client.stop(run_ids)
+    assert [shard.active_runs for shard in sharded_client.shards] == [0, 0]
+
+
+def test_placement_by_load(sharded_client: ShardedAlfalfaClient, servers):
+    for i in range(5):
+        sharded_client.shards[0].add_run(f"busy_{i}")
+    sharded_client.shards[0].latency = 0.0001
+    sharded_client.shards[1].latency = 10.0
+
+    run_id = sharded_client.submit(MODEL_PATH)
+
+    assert sharded_client.host_of(run_id) == servers[1].url
+    assert sharded_client.create_runs(sharded_client.upload_model(MODEL_PATH), 2) != []
+    assert len(servers[1].runs) == 3
+
+
+def test_latency_breaks_ties(sharded_client: ShardedAlfalfaClient, servers):
+    sharded_client.shards[0].latency = 10.0
+    sharded_client.shards[1].latency = 0.0001
+
+    sharded_client.upload_model(MODEL_PATH)
+
+    assert [len(server.models) for server in servers] == [0, 1]
+
+
+def test_finished_runs_not_active(sharded_client: ShardedAlfalfaClient, servers):
+    run_ids = sharded_client.submit([MODEL_PATH] * 2)
+    assert [shard.active_runs for shard in sharded_client.shards] == [1, 1]
+
+    for server in servers:
+        for run in server.runs.values():
+            run.set_status("COMPLETE")
+    sharded_client.wait(run_ids[0], "complete")
+    assert sum(shard.active_runs for shard in sharded_client.shards) == 1
+
+    assert sharded_client.status(run_ids[1]) == "COMPLETE"
+    assert [shard.active_runs for shard in sharded_client.shards] == [0, 0]
+
+
+def test_unknown_ids_found(sharded_client: ShardedAlfalfaClient, servers):
+    servers[1].add_run("existing")
+
+    assert sharded_client.status("existing") == "RUNNING"
+    assert sharded_client.host_of("existing") == servers[1].url
+
+    sharded_client.set_alias("my_alias", "existing")
+    assert sharded_client.get_alias("my_alias") == "existing"
+    assert sharded_client.get_sim_time("my_alias") == datetime(2020, 1, 1)
+
+    with pytest.raises(AlfalfaClientException):
+        sharded_client.status("missing")
+
+
+def test_unknown_ids_with_host_down(servers):
+    down = MockAlfalfaServer().start()
+    down.stop()
+    servers[1].add_run("existing")
+
+    with ShardedAlfalfaClient([down.url] + [server.url for server in servers]) as client:
+        assert client.status("existing") == "RUNNING"
+        assert client.host_of("existing") == servers[1].url
+
+    with ShardedAlfalfaClient([down.url]) as client:
+        with pytest.raises(ConnectionError):
+            client.status("existing")
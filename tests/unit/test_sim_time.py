@@ -0,0 +1,79 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from alfalfa_client.alfalfa_client import AlfalfaClient
+from alfalfa_client.sim_time import parse_sim_time
+from tests.mock_alfalfa import MockAlfalfaServer
+
+START = datetime(2020, 1, 1, 0, 0)
+END = datetime(2020, 1, 2, 0, 0)
+
+
+@pytest.fixture
+def predicting_client(mock_server: MockAlfalfaServer):
+    with AlfalfaClient(mock_server.url, sim_time_check_interval=3, dedupe_uploads=False) as client:
+        yield client
+
+
+def test_parse_sim_time():
+    assert parse_sim_time("2020-01-01 12:30:00") == datetime(2020, 1, 1, 12, 30)
+    assert parse_sim_time(START) is START
+
+
+def test_predicted_after_advance(predicting_client: AlfalfaClient, mock_server: MockAlfalfaServer):
+    mock_server.add_run("run", status="READY")
+    predicting_client.start("run", START, END, external_clock=True, wait_for_status=False)
+
+    assert predicting_client.get_sim_time("run") == START
+    predicting_client.advance("run")
+    assert predicting_client.get_sim_time("run") == START + timedelta(minutes=1)
+    assert predicting_client.sim_time.timestep("run") == timedelta(minutes=1)
+    assert predicting_client.sim_time.end_time("run") == END
+
+    for _ in range(2):
+        predicting_client.advance("run")
+        assert predicting_client.get_sim_time("run") == mock_server.runs["run"].time
+
+    assert predicting_client.sim_time.stats() == {"predicted": 2, "checks": 2, "mismatches": 0}
+    assert mock_server.request_counts["get_time"] == 2
+
+
+def test_mismatch_corrected(predicting_client: AlfalfaClient, mock_server: MockAlfalfaServer):
+    run = mock_server.add_run("run", status="READY")
+    predicting_client.start("run", START, END, external_clock=True, wait_for_status=False)
+    predicting_client.get_sim_time("run")
+    predicting_client.advance("run")
+    predicting_client.get_sim_time("run")
+
+    run.time += timedelta(minutes=5)
+    for _ in range(3):
+        predicting_client.advance("run")
+        predicting_client.get_sim_time("run")
+
+    assert predicting_client.get_sim_time("run") == run.time
+    assert predicting_client.sim_time.stats()["mismatches"] == 1
+
+
+def test_internal_clock_not_predicted(predicting_client: AlfalfaClient, mock_server: MockAlfalfaServer):
+    mock_server.add_run("run", status="READY")
+    predicting_client.start("run", START, END, wait_for_status=False)
+
+    for _ in range(3):
+        predicting_client.advance("run")
+        predicting_client.get_sim_time("run")
+
+    assert predicting_client.sim_time.stats()["predicted"] == 0
+    assert predicting_client.sim_time.timestep("run") is None
+
+
+def test_unparsed_end_time_not_tracked(predicting_client: AlfalfaClient, mock_server: MockAlfalfaServer):
+    mock_server.add_run("run", status="READY")
+    predicting_client.start("run", START, END, external_clock=True, wait_for_status=False)
+    predicting_client.sim_time.started("run", "01/02/2020 00:00", external_clock=True)
+
+    assert predicting_client.sim_time.end_time("run") is None
+    for _ in range(2):
+        predicting_client.advance("run")
+        assert predicting_client.get_sim_time("run") == mock_server.runs["run"].time
+    assert predicting_client.sim_time.stats()["predicted"] == 0
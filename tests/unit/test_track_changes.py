@@ -0,0 +1,58 @@
+import pytest
+
+from alfalfa_client.alfalfa_client import AlfalfaClient
+from alfalfa_client.lib import AlfalfaClientException
+from alfalfa_client.metrics import RequestMetrics
+from tests.mock_alfalfa import MockAlfalfaServer
+
+
+@pytest.fixture
+def tracking_client(mock_server: MockAlfalfaServer):
+    with AlfalfaClient(mock_server.url, track_changes=True, change_tolerance=0.01, dedupe_uploads=False) as client:
+        yield client
+
+
+def test_only_changed_inputs_sent(tracking_client: AlfalfaClient, mock_server: MockAlfalfaServer):
+    mock_server.add_run("run", num_inputs=3)
+    metrics = RequestMetrics()
+    tracking_client.add_request_hook(metrics)
+
+    tracking_client.set_inputs("run", {"Input_0": 1.0, "Input_1": 2.0, "Input_2": 3.0})
+    full_write = metrics.snapshot()["PUT runs/{id}/points/values"]["request_bytes"]
+    tracking_client.set_inputs("run", {"Input_0": 1.005, "Input_1": 2.0, "Input_2": 4.0})
+    tracking_client.set_inputs("run", {"Input_0": 1.0, "Input_1": 2.0, "Input_2": 4.0})
+
+    write = metrics.snapshot()["PUT runs/{id}/points/values"]
+    assert write["requests"] == 2
+    assert write["request_bytes"] - full_write < full_write
+    assert mock_server.runs["run"].values["run-2"] == 4.0
+    assert mock_server.runs["run"].values["run-0"] == 1.0
+
+
+def test_changed_outputs(tracking_client: AlfalfaClient, mock_server: MockAlfalfaServer):
+    run = mock_server.add_run("run")
+
+    assert tracking_client.get_outputs("run", changed_since_last_read=True) == {"Output_0": 0.0, "Output_1": 1.0}
+    assert tracking_client.get_outputs("run", changed_since_last_read=True) == {}
+
+    run.values["run-3"] = 5.0
+    assert tracking_client.get_outputs("run", changed_since_last_read=True) == {"Output_1": 5.0}
+    assert tracking_client.get_outputs("run") == {"Output_0": 0.0, "Output_1": 5.0}
+
+
+def test_stop_resets_tracking(tracking_client: AlfalfaClient, mock_server: MockAlfalfaServer):
+    mock_server.add_run("run")
+    tracking_client.set_inputs("run", {"Input_0": 1.0})
+    tracking_client.stop("run", wait_for_status=False)
+    mock_server.runs["run"].values.clear()
+
+    tracking_client.set_inputs("run", {"Input_0": 1.0})
+
+    assert mock_server.runs["run"].values["run-0"] == 1.0
+
+
+def test_requires_tracking(mock_client: AlfalfaClient, mock_server: MockAlfalfaServer):
+    mock_server.add_run("run")
+
+    with pytest.raises(AlfalfaClientException):
+        mock_client.get_outputs("run", changed_since_last_read=True)
@@ -0,0 +1,63 @@
+import io
+import zipfile
+from pathlib import Path
+
+from alfalfa_client.alfalfa_client import AlfalfaClient
+from alfalfa_client.lib import package_model
+from tests.mock_alfalfa import MockAlfalfaServer
+
+MODEL_PATH = Path(__file__).parents[1] / "integration" / "models" / "small_office"
+
+
+def test_package_model_directory():
+    with package_model(MODEL_PATH, compresslevel=1) as package:
+        assert package.filename == "small_office.zip"
+        assert len(package) == package.size
+        archive = zipfile.ZipFile(io.BytesIO(package.read()))
+
+    assert "workflow.osw" in archive.namelist()
+    assert package.file.closed
+
+
+def test_package_model_file(tmp_path: Path):
+    model_file = tmp_path / "model.zip"
+    model_file.write_bytes(b"model")
+
+    with package_model(model_file) as package:
+        assert package.filename == "model.zip"
+        assert package.read() == b"model"
+    assert package.file.closed
+
+
+def test_package_model_is_deterministic():
+    with package_model(MODEL_PATH) as first, package_model(MODEL_PATH) as second:
+        assert first.read() == second.read()
+
+
+def test_upload_model(mock_client: AlfalfaClient, mock_server: MockAlfalfaServer):
+    model_id = mock_client.upload_model(MODEL_PATH)
+
+    uploaded = zipfile.ZipFile(io.BytesIO(mock_server.models[model_id]["file"]))
+    assert "workflow.osw" in uploaded.namelist()
+
+    metrics = mock_client.upload_metrics[-1]
+    assert metrics.model_name == "small_office.zip"
+    assert metrics.packaging_throughput > 0
+    assert metrics.transfer_throughput > 0
+
+
+def test_submit(mock_client: AlfalfaClient, mock_server: MockAlfalfaServer):
+    run_id = mock_client.submit(str(MODEL_PATH))
+
+    assert mock_server.runs[run_id].status == "READY"
+
+
+def test_create_runs(mock_client: AlfalfaClient, mock_server: MockAlfalfaServer):
+    model_id = mock_client.upload_model(MODEL_PATH)
+
+    run_ids = mock_client.create_runs(model_id, 10)
+    assert len(set(run_ids)) == 10
+    assert all(mock_server.runs[run_id].status == "READY" for run_id in run_ids)
+
+    run_ids = mock_client.create_run_from_model([model_id, model_id], wait_for_status=False)
+    assert len(run_ids) == 2
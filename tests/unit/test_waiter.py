@@ -0,0 +1,109 @@
+import threading
+from time import monotonic, sleep
+
+import pytest
+
+from alfalfa_client.alfalfa_client import AlfalfaClient
+from alfalfa_client.lib import (
+    AlfalfaBatchException,
+    AlfalfaClientException,
+    AlfalfaException
+)
+from tests.mock_alfalfa import MockAlfalfaServer
+
+
+def set_status_later(mock_server: MockAlfalfaServer, run_id: str, status: str, delay: float):
+    def set_status():
+        with mock_server.lock:
+            mock_server.runs[run_id].status = status
+    timer = threading.Timer(delay, set_status)
+    timer.start()
+    return timer
+
+
+def test_wait_returns_promptly(mock_client: AlfalfaClient, mock_server: MockAlfalfaServer):
+    mock_server.add_run("run", status="READY")
+    set_status_later(mock_server, "run", "RUNNING", 0.3)
+
+    start = monotonic()
+    mock_client.wait("run", "running")
+
+    assert monotonic() - start < 1, "wait did not return soon after the status changed"
+
+
+def test_wait_many(mock_client: AlfalfaClient, mock_server: MockAlfalfaServer):
+    run_ids = [f"run_{i}" for i in range(20)]
+    for run_id in run_ids:
+        mock_server.add_run(run_id, status="READY")
+        set_status_later(mock_server, run_id, "RUNNING", 0.2)
+
+    assert mock_client.wait(run_ids, "running") == [None] * 20
+    assert mock_server.request_counts["get_run"] < 20 * 5
+
+
+def test_wait_error(mock_client: AlfalfaClient, mock_server: MockAlfalfaServer):
+    mock_server.add_run("run", status="READY")
+    mock_server.add_run("failed", status="ERROR").error_log = "Simulation crashed"
+
+    with pytest.raises(AlfalfaException, match="Simulation crashed"):
+        mock_client.wait("failed", "running")
+
+    with pytest.raises(AlfalfaBatchException) as exc_info:
+        mock_client.wait(["run", "failed"], "ready")
+    assert list(exc_info.value.errors) == [1]
+
+
+def test_wait_timeout(mock_client: AlfalfaClient, mock_server: MockAlfalfaServer):
+    mock_server.add_run("run", status="READY")
+
+    with pytest.raises(AlfalfaClientException, match="timed out"):
+        mock_client.wait("run", "running", timeout=0.3)
+
+
+def test_watch_callback(mock_client: AlfalfaClient, mock_server: MockAlfalfaServer):
+    mock_server.add_run("run", status="READY")
+    set_status_later(mock_server, "run", "RUNNING", 0.2)
+    statuses = []
+
+    future = mock_client.waiter.watch("run", "running", callback=lambda run_id, status: statuses.append(status))
+
+    assert future.result(timeout=5) == "RUNNING"
+    assert statuses == ["READY", "RUNNING"]
+
+
+def test_watch_callback_error(mock_client: AlfalfaClient, mock_server: MockAlfalfaServer):
+    mock_server.add_run("run", status="READY")
+    set_status_later(mock_server, "run", "RUNNING", 0.2)
+
+    def callback(run_id, status):
+        raise ValueError(status)
+
+    failing = mock_client.waiter.watch("run", "running", callback=callback)
+    future = mock_client.waiter.watch("run", "running")
+
+    with pytest.raises(ValueError, match="READY"):
+        failing.result(timeout=5)
+    assert future.result(timeout=5) == "RUNNING"
+
+
+def test_watch_keeps_status_on_not_found(mock_client: AlfalfaClient, mock_server: MockAlfalfaServer):
+    mock_server.add_run("run", status="READY")
+    statuses = []
+
+    future = mock_client.waiter.watch("run", "running", callback=lambda run_id, status: statuses.append(status))
+    while not statuses:
+        sleep(0.01)
+    mock_server.fail_next("get_run", 404)
+    set_status_later(mock_server, "run", "RUNNING", 0.3)
+
+    assert future.result(timeout=5) == "RUNNING"
+    assert statuses == ["READY", "RUNNING"]
+
+
+def test_wait_for_missing_run(mock_client: AlfalfaClient, mock_server: MockAlfalfaServer):
+    def create_run():
+        with mock_server.lock:
+            mock_server.add_run("run", status="READY")
+    threading.Timer(0.2, create_run).start()
+
+    mock_client.wait("run", "ready", timeout=5)